@@ -0,0 +1,495 @@
+#!/usr/bin/python3
+"""
+Benchmarks for TCPSendBuffer and TCPReceiveBuffer.
+
+suite: a reproducible set of send- and receive-side access patterns, each
+at MSS from 1 KB to 64 KB, reported in ns/op and bytes/sec.  With --compare
+REV, each case is also run against buffer.py as of git revision REV, in the
+same process, alternating between the two, and the best of --repeat runs of
+each is compared, so that a regression in either buffer shows up
+immediately, whatever the speed and load of the machine.  Without it, the
+results are compared against stored baselines (bench_buffer_baseline.json),
+which are machine-specific and drift with the load of the machine: they
+only flag a case that is twice as slow by default.  Regenerate them with
+--save-baseline after changing machines.
+
+send: pushes a bulk transfer through a send buffer the way TCPSocket does:
+the application writes in large chunks, segments of at most MSS bytes are
+taken from the buffer while the bytes outstanding are below cwnd, and each
+segment is then acknowledged (slide()) in turn.
+
+reorder: delivers segments to a receive buffer in a random order, calling
+get() after every put(), as TCPSocket.handle_data() does.
+
+holes: the cost of a put() into a receive buffer that already holds n
+segments beyond a hole (which get() cannot deliver), for n from a 64 KB
+window's worth of 1000-byte segments up to far more than a 1 MiB window
+holds.  Finding the place of a segment is O(log n), but inserting its
+starting sequence number into the sorted list is an O(n) memmove; the time
+of that insertion alone (and of the deletion that undoes it) is reported
+next to that of the whole put().
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+
+import buffer
+from buffer import TCPSendBuffer, TCPReceiveBuffer
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'bench_buffer_baseline.json')
+SUITE_MSS = (1024, 4096, 16384, 65536)
+
+# The default --tolerance of the suite: against a revision run alongside,
+# and against stored baselines
+SUITE_TOLERANCE_COMPARE = 0.25
+SUITE_TOLERANCE_BASELINE = 1.0
+
+
+class LegacyTCPSendBuffer(object):
+    """The original bytes-based send buffer, for comparison."""
+    def __init__(self, seq: int):
+        self.buffer = b''
+        self.base_seq = seq
+        self.next_seq = self.base_seq
+        self.last_seq = self.base_seq
+
+    def bytes_not_yet_sent(self) -> int:
+        return self.last_seq - self.next_seq
+
+    def bytes_outstanding(self) -> int:
+        return self.next_seq - self.base_seq
+
+    def put(self, data: bytes) -> int:
+        self.buffer += data
+        self.last_seq += len(data)
+        return self.last_seq
+
+    def get(self, size: int) -> tuple[bytes, int]:
+        idx_next_seq = self.next_seq-self.base_seq
+        if idx_next_seq + size > len(self.buffer):
+            size = len(self.buffer) - idx_next_seq
+        data = self.buffer[idx_next_seq:idx_next_seq + size]
+        starting_seq = self.next_seq
+        self.next_seq += size
+        return (data, starting_seq)
+
+    def slide(self, sequence: int) -> None:
+        self.buffer = self.buffer[sequence-self.base_seq:]
+        self.base_seq = sequence
+
+
+class LegacyTCPReceiveBuffer(object):
+    """The original dict-based receive buffer, for comparison."""
+    def __init__(self, seq: int):
+        self.buffer = {}
+        self.base_seq = seq
+
+    def put(self, data: bytes, sequence: int) -> None:
+        if sequence + len(data) <= self.base_seq:
+            return
+        if sequence < self.base_seq:
+            data = data[self.base_seq-sequence:]
+            sequence = self.base_seq
+        if (segment := self.buffer.get(sequence)):
+            self.buffer[sequence] = segment if len(segment) > len(data) else data
+        else:
+            self.buffer[sequence] = data
+        prev_seq_end = -1
+        for cur_seq_start in sorted(self.buffer.keys()):
+            if cur_seq_start < prev_seq_end:
+                overlapping_segment = self.buffer.pop(cur_seq_start)
+                trimmed_segment = overlapping_segment[prev_seq_end-cur_seq_start:]
+                if existing_segment := self.buffer.get(prev_seq_end):
+                    self.buffer[prev_seq_end] = existing_segment if len(existing_segment) > len(trimmed_segment) else trimmed_segment
+                else:
+                    self.buffer[prev_seq_end] = trimmed_segment
+                    prev_seq_end = prev_seq_end + len(trimmed_segment)
+            else:
+                prev_seq_end = cur_seq_start + len(self.buffer[cur_seq_start])
+
+    def get(self) -> tuple[bytes, int]:
+        initial_base_seq = self.base_seq
+        prev_seq_end = self.base_seq
+        data = b''
+        for cur_seq_start in sorted(self.buffer.keys()):
+            if prev_seq_end == cur_seq_start:
+                data += self.buffer.pop(cur_seq_start)
+                prev_seq_end = self.base_seq + len(data)
+            else:
+                break
+        self.base_seq = prev_seq_end
+        return (data, initial_base_seq)
+
+
+def bulk_transfer(buf_cls: type, total: int, write_size: int, mss: int,
+        cwnd: int) -> float:
+    """
+    Push total bytes through a buf_cls instance, keeping up to two windows
+    of application data queued.  Return the elapsed time in seconds.
+    """
+    buf = buf_cls(0)
+    chunk = b'x' * write_size
+    written = 0
+    start = time.perf_counter()
+    while buf.base_seq < total:
+        # the application keeps the buffer topped up
+        while written < total and buf.last_seq - buf.base_seq < 2 * cwnd:
+            buf.put(chunk)
+            written += write_size
+
+        # send a window's worth of segments...
+        acks = []
+        while buf.bytes_outstanding() < cwnd and buf.bytes_not_yet_sent():
+            data, seq = buf.get(mss)
+            acks.append(seq + len(data))
+
+        # ...and acknowledge each of them
+        for ack in acks:
+            buf.slide(ack)
+    return time.perf_counter() - start
+
+def reorder(buf_cls: type, segments: int, mss: int, seed: int) -> float:
+    """
+    Deliver segments MSS-sized segments to a buf_cls instance in a random
+    permutation, calling get() after each put().  Return the elapsed time
+    in seconds.
+    """
+    order = list(range(segments))
+    random.Random(seed).shuffle(order)
+    payload = b'x' * mss
+    buf = buf_cls(0)
+    received = 0
+    start = time.perf_counter()
+    for i in order:
+        buf.put(payload, i * mss)
+        data, seq = buf.get()
+        received += len(data)
+    elapsed = time.perf_counter() - start
+    assert received == segments * mss
+    return elapsed
+
+def holes(held: int, mss: int, seed: int) -> tuple[float, float]:
+    """
+    Put held MSS-sized segments, a segment apart, in a receive buffer whose
+    first segment is missing, then fill the gaps between them in a random
+    order.  Return the time per put() while filling the gaps, and the time
+    per insertion and deletion, in the middle, of a list as long as the
+    buffer's list of starting sequence numbers.
+    """
+    payload = b'x' * mss
+    buf = TCPReceiveBuffer(0)
+    for i in range(held):
+        buf.put(payload, (2 * i + 1) * mss)
+    gaps = [2 * i * mss for i in range(1, held)]
+    random.Random(seed).shuffle(gaps)
+    start = time.perf_counter()
+    for seq in gaps:
+        buf.put(payload, seq)
+    put_time = (time.perf_counter() - start) / len(gaps)
+
+    starts = list(range(held + len(gaps) // 2))
+    middle = len(starts) // 2
+    repeat = max(len(gaps), 1000)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        starts.insert(middle, middle)
+        del starts[middle]
+    list_time = (time.perf_counter() - start) / repeat
+    return put_time, list_time
+
+def send_bulk(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """Bulk put/get/slide cycles with a 64-segment window."""
+    elapsed = bulk_transfer(buffers.TCPSendBuffer, total, 64 * 1024, mss,
+            64 * mss)
+    return -(-total // mss), elapsed
+
+def send_resend(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """
+    Retransmit-heavy: each segment is sent, retransmitted with
+    get_for_resend(), and only then acknowledged.
+    """
+    buf = buffers.TCPSendBuffer(0)
+    chunk = b'x' * (64 * 1024)
+    written = 0
+    ops = 0
+    cwnd = 64 * mss
+    start = time.perf_counter()
+    while buf.base_seq < total:
+        while written < total and buf.last_seq - buf.base_seq < 2 * cwnd:
+            buf.put(chunk)
+            written += len(chunk)
+        while buf.bytes_outstanding() < cwnd and buf.bytes_not_yet_sent():
+            buf.get(mss)
+        while buf.bytes_outstanding():
+            data, seq = buf.get_for_resend(mss)
+            buf.slide(seq + min(len(data), buf.bytes_outstanding()))
+            ops += 1
+    return ops, time.perf_counter() - start
+
+def receive_segments(buffers: types.ModuleType,
+        segments: list[tuple[bytes, int]], base_seq: int,
+        total: int) -> tuple[int, float]:
+    """Put each (data, seq) in a receive buffer, with a get() after each."""
+    buf = buffers.TCPReceiveBuffer(base_seq)
+    received = 0
+    start = time.perf_counter()
+    for data, seq in segments:
+        buf.put(data, seq)
+        received += len(buf.get()[0])
+    elapsed = time.perf_counter() - start
+    assert received == total, (received, total)
+    return len(segments), elapsed
+
+def split(payload: bytes, mss: int) -> list[tuple[bytes, int]]:
+    return [(payload[i:i + mss], i) for i in range(0, len(payload), mss)]
+
+def receive_inorder(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """Segments arrive in order."""
+    payload = b'x' * total
+    return receive_segments(buffers, split(payload, mss), 0, total)
+
+def receive_reversed(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """Segments arrive in reverse order, so all are delivered at the end."""
+    payload = b'x' * total
+    return receive_segments(buffers, split(payload, mss)[::-1], 0, total)
+
+def receive_random(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """Segments arrive in a random (but reproducible) order."""
+    payload = b'x' * total
+    segments = split(payload, mss)
+    random.Random(0).shuffle(segments)
+    return receive_segments(buffers, segments, 0, total)
+
+def receive_duplicates(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """Every segment arrives twice, in a random order."""
+    payload = b'x' * total
+    segments = split(payload, mss) * 2
+    random.Random(0).shuffle(segments)
+    return receive_segments(buffers, segments, 0, total)
+
+def receive_overlap(buffers: types.ModuleType, mss: int,
+        total: int) -> tuple[int, float]:
+    """
+    Every fourth segment is lost, and each is then retransmitted with
+    different boundaries, overlapping half of each of its neighbors.
+    """
+    payload = b'x' * total
+    segments = split(payload, mss)
+    lost = segments[::4]
+    del segments[::4]
+    for data, seq in lost:
+        start = max(seq - mss // 2, 0)
+        segments.append((payload[start:seq + len(data) + mss // 2], start))
+    return receive_segments(buffers, segments, 0, total)
+
+SUITE = (
+    ('send_bulk', send_bulk),
+    ('send_resend', send_resend),
+    ('receive_inorder', receive_inorder),
+    ('receive_reversed', receive_reversed),
+    ('receive_random', receive_random),
+    ('receive_duplicates', receive_duplicates),
+    ('receive_overlap', receive_overlap),
+)
+
+def load_buffers(rev: str) -> types.ModuleType:
+    """Return buffer.py as of git revision rev, as a module."""
+    source = subprocess.run(['git', 'show', f'{rev}:./buffer.py'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(f'buffer@{rev}')
+    exec(compile(source, f'buffer.py@{rev}', 'exec'), module.__dict__)
+    return module
+
+def run_case(func: callable, mss: int, args: argparse.Namespace,
+        old: types.ModuleType, best: tuple[int, float]=None,
+        best_old: tuple[int, float]=None) -> tuple[tuple, tuple]:
+    """
+    Run a case of SUITE --repeat times, with buffer.py and (alternately)
+    with old, if given.  Return the (ops, elapsed) of the fastest run of
+    each (or None), counting those given as best and best_old.
+    """
+    if old is not None:
+        # warm up (the allocator, and the CPU's clock), and then take turns
+        # at going first, so that neither side gets the better conditions
+        func(buffer, mss, args.suite_bytes)
+    for i in range(args.repeat):
+        for buffers in ((buffer, old) if i % 2 else (old, buffer)):
+            if buffers is None:
+                continue
+            ops, elapsed = func(buffers, mss, args.suite_bytes)
+            if buffers is buffer:
+                if best is None or elapsed < best[1]:
+                    best = ops, elapsed
+            elif best_old is None or elapsed < best_old[1]:
+                best_old = ops, elapsed
+    return best, best_old
+
+def bench_suite(args: argparse.Namespace) -> int:
+    """
+    Run every case in SUITE at every MSS in SUITE_MSS, keeping the best of
+    --repeat runs.  Compare against buffer.py as of --compare (run
+    alternately with the current one; a case that is slower by more than
+    --tolerance is run --repeat times more, to confirm it), or against (or
+    save) the stored baselines, and return non-zero if any case is slower
+    by more than --tolerance.
+    """
+    old = None
+    baseline = {}
+    if args.compare:
+        old = load_buffers(args.compare)
+    elif not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+    tolerance = args.tolerance
+    if tolerance is None:
+        tolerance = SUITE_TOLERANCE_COMPARE if old is not None \
+                else SUITE_TOLERANCE_BASELINE
+    against = args.compare or 'base'
+
+    results = {}
+    regressions = []
+    print(f'{"case":<20} {"mss":>6} {"ns/op":>10} {"MB/s":>9} ' + \
+            (f'{against + " ns/op":>16} ' if old is not None else '') + \
+            f'{"vs " + against:>8}')
+    for name, func in SUITE:
+        for mss in SUITE_MSS:
+            key = f'{name}/{mss}'
+            best, best_old = run_case(func, mss, args, old)
+            if old is not None and best[1] / best[0] > \
+                    (1 + tolerance) * best_old[1] / best_old[0]:
+                # make sure that it was not a spike of load on the machine
+                best, best_old = run_case(func, mss, args, old, best,
+                        best_old)
+            ops, elapsed = best
+            ns_per_op = elapsed / ops * 1e9
+            results[key] = {
+                'ns_per_op': round(ns_per_op, 1),
+                'bytes_per_sec': round(args.suite_bytes / elapsed),
+            }
+
+            old_ns_per_op = None
+            if best_old is not None:
+                old_ns_per_op = best_old[1] / best_old[0] * 1e9
+            elif key in baseline:
+                old_ns_per_op = baseline[key]['ns_per_op']
+            ratio = ''
+            if old_ns_per_op is not None:
+                change = ns_per_op / old_ns_per_op
+                ratio = f'{change:7.2f}x'
+                if change > 1 + tolerance:
+                    regressions.append(key)
+                    ratio += ' !'
+            print(f'{name:<20} {mss:>6} {ns_per_op:>10.0f} ' + \
+                    f'{args.suite_bytes / elapsed / 1e6:>9.1f} ' + \
+                    (f'{old_ns_per_op:>16.0f} ' if old is not None else '') + \
+                    ratio)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump({
+                'python': sys.version.split()[0],
+                'suite_bytes': args.suite_bytes,
+                'results': results,
+            }, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'Regressions (> {tolerance:.0%} slower than {against}): ' + \
+                ', '.join(regressions))
+        return 1
+    return 0
+
+def bench_send(args: argparse.Namespace) -> None:
+    """Bulk transfer through TCPSendBuffer, and the original for comparison."""
+    runs = [('TCPSendBuffer', TCPSendBuffer, args.bytes)]
+    if args.legacy_bytes:
+        runs.append(('legacy', LegacyTCPSendBuffer, args.legacy_bytes))
+
+    for name, buf_cls, total in runs:
+        elapsed = bulk_transfer(buf_cls, total, args.write_size, args.mss,
+                args.cwnd)
+        segments = -(-total // args.mss)
+        print(f'{name:>16}: {total / elapsed / 1e6:8.1f} MB/s, ' + \
+                f'{elapsed / segments * 1e9:6.0f} ns/segment ' + \
+                f'({total:,} bytes in {elapsed:.2f}s)')
+
+def bench_reorder(args: argparse.Namespace) -> None:
+    """Random reordering through TCPReceiveBuffer and the original."""
+    for name, buf_cls in (('TCPReceiveBuffer', TCPReceiveBuffer),
+            ('legacy', LegacyTCPReceiveBuffer)):
+        elapsed = reorder(buf_cls, args.segments, args.mss, args.seed)
+        print(f'{name:>16}: {args.segments:,} reordered segments in ' + \
+                f'{elapsed:.2f}s, {elapsed / args.segments * 1e6:8.1f} us/segment')
+
+def bench_holes(args: argparse.Namespace) -> None:
+    """put() into a receive buffer holding more and more segments."""
+    print(f'{"segments held":>14} {"data held":>10} {"us/put":>7} ' + \
+            f'{"us/list insert+del":>19}')
+    for held in (64, 256, 1024, 4096, 16384, 65536):
+        put_time, list_time = min(holes(held, args.mss, args.seed)
+                for _ in range(3))
+        print(f'{held:>14} {held * args.mss / 1e6:>8.3g}MB ' + \
+                f'{put_time * 1e6:>7.2f} {list_time * 1e6:>19.3f}')
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', nargs='?', default='suite',
+            choices=('suite', 'send', 'reorder', 'holes'),
+            help='Which benchmark to run (default: suite)')
+    parser.add_argument('--suite-bytes', type=int, default=32 << 20,
+            help='Bytes pushed through the buffer by each suite case')
+    parser.add_argument('--repeat', type=int, default=5,
+            help='Runs of each suite case; the fastest is kept')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+            help='File holding the suite baselines')
+    parser.add_argument('--save-baseline', action='store_true',
+            help='Save the suite results as the new baselines')
+    parser.add_argument('--compare', metavar='REV',
+            help='Git revision whose buffer.py the suite is compared ' + \
+                    'against, in the same run (instead of the baselines)')
+    parser.add_argument('--tolerance', type=float,
+            help='Allowed slowdown (0.25 = 25%%; default: ' + \
+                    f'{SUITE_TOLERANCE_COMPARE * 100:.0f}%% with --compare, ' + \
+                    f'{SUITE_TOLERANCE_BASELINE * 100:.0f}%% against the baselines)')
+    parser.add_argument('--bytes', '-b', type=int, default=1 << 30,
+            help='Total bytes to push through the send buffer (default: 1 GiB)')
+    parser.add_argument('--write-size', '-w', type=int, default=65536,
+            help='Size of each application write (put)')
+    parser.add_argument('--mss', '-m', type=int, default=1000,
+            help='Maximum segment size')
+    parser.add_argument('--cwnd', '-c', type=int, default=64000,
+            help='Congestion window in bytes')
+    parser.add_argument('--legacy-bytes', type=int, default=16 << 20,
+            help='Total bytes for the original send buffer, which is ' + \
+                    'too slow for --bytes (0 to skip)')
+    parser.add_argument('--segments', '-n', type=int, default=10000,
+            help='Number of segments delivered out of order')
+    parser.add_argument('--seed', type=int, default=0,
+            help='Seed for the random permutation of segments')
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        sys.exit(bench_suite(args))
+    elif args.benchmark == 'send':
+        bench_send(args)
+    elif args.benchmark == 'reorder':
+        bench_reorder(args)
+    elif args.benchmark == 'holes':
+        bench_holes(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+"""
+Benchmark for checksum.py.
+
+Reports the throughput (MB/s) of the ones' complement sum at several buffer
+sizes, compared with a straightforward word-at-a-time loop, and the cost of
+an RFC 1624 incremental update versus recomputing an IPv4 header checksum
+after a TTL decrement.
+"""
+
+import argparse
+import os
+import timeit
+
+import checksum
+
+
+def reference_sum(data: bytes) -> int:
+    """The textbook RFC 1071 loop, one 16-bit word at a time."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = 0
+    for i in range(0, len(data), 2):
+        total += (data[i] << 8) | data[i + 1]
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+def throughput(func, data: bytes, seconds: float) -> float:
+    """Return the throughput of func(data) in MB/s."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(lambda: func(data), number=number)
+        if elapsed >= seconds:
+            return len(data) * number / elapsed / 1e6
+        number *= 2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', '-s', type=int, nargs='+',
+            default=[20, 40, 576, 1500, 9000, 65536, 1 << 20],
+            help='Buffer sizes in bytes')
+    parser.add_argument('--seconds', type=float, default=0.2,
+            help='Minimum time to spend on each measurement')
+    args = parser.parse_args()
+
+    print(f'NumPy: {"yes" if checksum.numpy is not None else "no"}')
+    print(f'{"bytes":>8} {"reference MB/s":>15} {"checksum.py MB/s":>17}')
+    for size in args.sizes:
+        data = os.urandom(size)
+        assert checksum.ones_complement_sum(data) == reference_sum(data)
+        ref = throughput(reference_sum, data, args.seconds) \
+                if size <= 65536 else float('nan')
+        fast = throughput(checksum.ones_complement_sum, data, args.seconds)
+        print(f'{size:>8} {ref:>15.1f} {fast:>17.1f}')
+
+    # forwarding: fix up the IP header checksum after a TTL decrement
+    hdr = bytearray(checksum.fill_packet(bytes.fromhex(
+        '45000421000000004011000080bb52fe80aa333f')))
+    number = 200000
+    def incremental():
+        hdr[8] = 64
+        checksum.decrement_ttl(hdr)
+    def recompute():
+        hdr[8] = 63
+        hdr[10:12] = b'\x00\x00'
+        hdr[10:12] = checksum.internet_checksum(hdr).to_bytes(2, 'big')
+    for name, func in (('incremental', incremental), ('recompute', recompute)):
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print(f'TTL decrement, {name:>11}: {elapsed / number * 1e9:7.0f} ns/packet')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+"""
+Connection churn benchmark for TCPSocket teardown.
+
+Opens --connections short connections, --concurrency at a time, to an
+EchoServerTCP over the in-memory Link of bench_transfer.py.  Each client
+sends a short request, closes the connection once the echo has come back,
+and lingers in TIME_WAIT for --time-wait seconds.  Sockets remove
+themselves from the socket table (the Link's, standing in for
+TransportHost.socket_mapping_tcp) when their connection closes, and a new
+connection is opened whenever one does.
+
+Every --interval connections, reports the sockets in the table, the memory
+allocated by Python (tracemalloc), and the connection rate, which should all
+stay flat.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from bench_transfer import Link
+from echoserver import EchoServerTCP
+from mysocket import TCPSocket
+from timerwheel import TimerWheel
+
+SERVER_ADDR = '10.0.0.2'
+SERVER_PORT = 7
+CLIENT_ADDR = '10.0.0.1'
+# the ephemeral ports that the clients use, in turn
+CLIENT_PORTS = range(1024, 65536)
+
+
+def churn(args: argparse.Namespace) -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    link = Link(loop, args.delay)
+    timer_wheel = TimerWheel()
+    request = b'x' * args.request_size
+    opened = closed = 0
+    done = loop.create_future()
+    start = last = time.perf_counter()
+
+    def install(local_addr, local_port, remote_addr, remote_port, sock):
+        link.sockets[(local_addr, local_port, remote_addr, remote_port)] = sock
+
+    def remove(local_addr, local_port, remote_addr, remote_port, sock):
+        nonlocal closed, last
+        key = (local_addr, local_port, remote_addr, remote_port)
+        if link.sockets.get(key) is sock:
+            del link.sockets[key]
+        if local_addr != CLIENT_ADDR:
+            return
+        closed += 1
+        if closed % args.interval == 0:
+            now = time.perf_counter()
+            current, _ = tracemalloc.get_traced_memory()
+            print(f'{closed:>12} {len(link.sockets):>8} ' + \
+                    f'{current / 1024:>12.0f} ' + \
+                    f'{args.interval / (now - last):>10.0f}')
+            last = now
+        if closed == args.connections:
+            done.set_result(None)
+        elif opened < args.connections:
+            open_connection()
+
+    socket_args = dict(timer_wheel=timer_wheel, time_wait=args.time_wait,
+            remove_socket_func=remove)
+    server = EchoServerTCP(SERVER_ADDR, SERVER_PORT, install, link.send,
+            **socket_args)
+    link.sockets[(SERVER_ADDR, SERVER_PORT, None, None)] = server.sock
+
+    def open_connection():
+        nonlocal opened
+        port = CLIENT_PORTS[opened % len(CLIENT_PORTS)]
+        opened += 1
+        received = 0
+
+        def notify():
+            nonlocal received
+            received += len(sock.recv(args.request_size))
+            if received == args.request_size:
+                sock.close()
+
+        sock = TCPSocket.connect(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT,
+                link.send, notify, **socket_args)
+        install(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT, sock)
+        # the request goes out once the connection is established
+        sock.send(request)
+
+    print(f'{"connections":>12} {"sockets":>8} {"memory KiB":>12} ' + \
+            f'{"conn/s":>10}')
+    tracemalloc.start()
+    for _ in range(min(args.concurrency, args.connections)):
+        open_connection()
+    loop.run_until_complete(done)
+    loop.run_until_complete(asyncio.sleep(args.time_wait + 2 * args.delay))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    loop.close()
+    print(f'{closed} connections in {time.perf_counter() - start:.1f} s; ' + \
+            f'{len(link.sockets) - 1} sockets left, ' + \
+            f'peak memory {peak / 1024:.0f} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=100000,
+            help='Connections to open and close')
+    parser.add_argument('--concurrency', type=int, default=100,
+            help='Connections open at a time')
+    parser.add_argument('--request-size', type=int, default=100,
+            help='Bytes sent (and echoed) per connection')
+    parser.add_argument('--delay', type=float, default=0.001,
+            help='One-way link delay in seconds')
+    parser.add_argument('--time-wait', type=float, default=0.1,
+            help='Time in TIME_WAIT, in seconds')
+    parser.add_argument('--interval', type=int, default=10000,
+            help='Connections between reports')
+    churn(parser.parse_args())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""
+TCP Fast Open benchmark: the latency of one-request connections.
+
+A client opens --connections connections, one after the other, to an
+EchoServerTCP over the in-memory Link of bench_transfer.py; each sends a
+--request-size request right after connect(), and closes the connection
+once the echo has come back.  Reports the median and 90th percentile time
+from connect() to the whole echo, without Fast Open, with it (the first
+connection gets the cookie, the others send their request in the SYN), and
+with an invalid cookie in the cache before each connection (the server
+rejects it, and the request is retransmitted once the handshake completes).
+"""
+
+import argparse
+import asyncio
+import statistics
+
+from bench_transfer import Link
+from echoserver import EchoServerTCP
+from mysocket import TCPSocket, TCP_MSS_DEFAULT, TCP_FAST_OPEN_COOKIE_LEN
+from timerwheel import TimerWheel
+
+SERVER_ADDR = '10.0.0.2'
+SERVER_PORT = 7
+CLIENT_ADDR = '10.0.0.1'
+# the ephemeral ports that the clients use, in turn
+CLIENT_PORTS = range(1024, 65536)
+
+
+def run(args: argparse.Namespace, fast_open: bool,
+        invalid_cookie: bool) -> tuple[list[float], EchoServerTCP]:
+    """
+    Open args.connections connections, with Fast Open if fast_open is set
+    (with an invalid cookie if invalid_cookie is set), and return their
+    latencies and the server.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    link = Link(loop, args.delay)
+    timer_wheel = TimerWheel()
+    request = b'x' * args.request_size
+    cookies = {}
+
+    def install(local_addr, local_port, remote_addr, remote_port, sock):
+        link.sockets[(local_addr, local_port, remote_addr, remote_port)] = sock
+
+    def remove(local_addr, local_port, remote_addr, remote_port, sock):
+        key = (local_addr, local_port, remote_addr, remote_port)
+        if link.sockets.get(key) is sock:
+            del link.sockets[key]
+
+    socket_args = dict(timer_wheel=timer_wheel, time_wait=args.time_wait,
+            remove_socket_func=remove, fast_open=fast_open,
+            fast_open_cookies=cookies)
+    server = EchoServerTCP(SERVER_ADDR, SERVER_PORT, install, link.send,
+            **socket_args)
+    link.sockets[(SERVER_ADDR, SERVER_PORT, None, None)] = server.sock
+
+    async def one_request(port: int) -> float:
+        received = 0
+        done = loop.create_future()
+
+        def notify():
+            nonlocal received
+            data = sock.recv(args.request_size)
+            received += len(data)
+            if data and received == args.request_size:
+                sock.close()
+                done.set_result(None)
+
+        if invalid_cookie:
+            cookies[SERVER_ADDR] = (bytes(TCP_FAST_OPEN_COOKIE_LEN),
+                    TCP_MSS_DEFAULT)
+        start = loop.time()
+        sock = TCPSocket.connect(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT,
+                link.send, notify, **socket_args)
+        install(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT, sock)
+        sock.send(request)
+        await done
+        return loop.time() - start
+
+    async def main():
+        latencies = []
+        for i in range(args.connections):
+            latencies.append(await one_request(
+                CLIENT_PORTS[i % len(CLIENT_PORTS)]))
+        return latencies
+
+    try:
+        return loop.run_until_complete(main()), server
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=200,
+            help='Connections to open, one after the other')
+    parser.add_argument('--request-size', type=int, default=100,
+            help='Bytes sent (and echoed) per connection')
+    parser.add_argument('--delay', type=float, default=0.01,
+            help='One-way link delay in seconds')
+    parser.add_argument('--time-wait', type=float, default=0.1,
+            help='Time in TIME_WAIT, in seconds')
+    args = parser.parse_args()
+
+    print(f'rtt {2 * args.delay * 1000:g} ms')
+    print(f'{"fast open":>14} {"median ms":>10} {"p90 ms":>7} ' + \
+            f'{"accepted":>9} {"rejected":>9}')
+    for name, fast_open, invalid_cookie in (('off', False, False),
+            ('on', True, False), ('invalid cookie', True, True)):
+        latencies, server = run(args, fast_open, invalid_cookie)
+        latencies = sorted(latency * 1000 for latency in latencies)
+        print(f'{name:>14} {statistics.median(latencies):>10.1f} ' + \
+                f'{latencies[len(latencies) * 9 // 10]:>7.1f} ' + \
+                f'{server.sock.fast_open_accepted:>9} ' + \
+                f'{server.sock.fast_open_rejected:>9}')
+
+if __name__ == '__main__':
+    main()
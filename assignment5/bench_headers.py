@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""
+Microbenchmark for header encoding and decoding.
+
+Compares the original field-by-field struct.pack()/struct.unpack() codecs
+("before") with the precompiled struct.Struct codecs in headers.py
+("after"), reporting packets per second for one IPv4+TCP header encode and
+decode per packet.
+"""
+
+import argparse
+import struct
+import timeit
+
+from cougarnet.util import \
+        ip_str_to_binary, ip_binary_to_str
+
+from headers import IPv4Header, TCPHeader, \
+        IP_HEADER_LEN, TCPIP_HEADER_LEN, TCP_RECEIVE_WINDOW
+
+
+def legacy_ipv4_to_bytes(hdr: IPv4Header) -> bytes:
+    b = b''
+    b += struct.pack('!B', 0b01000101)
+    b += struct.pack('!B', 0)
+    b += struct.pack('!H', hdr.length)
+    b += struct.pack('!I', 0)
+    b += struct.pack('!B', hdr.ttl)
+    b += struct.pack('!B', hdr.protocol)
+    b += struct.pack('!H', hdr.checksum)
+    b += struct.pack('!I', int.from_bytes(ip_str_to_binary(hdr.src), 'big'))
+    b += struct.pack('!I', int.from_bytes(ip_str_to_binary(hdr.dst), 'big'))
+    return b
+
+def legacy_ipv4_from_bytes(b: bytes) -> IPv4Header:
+    length, = struct.unpack('!H', b[2:4])
+    ttl, = struct.unpack('!B', b[8:9])
+    protocol, = struct.unpack('!B', b[9:10])
+    checksum, = struct.unpack('!H', b[10:12])
+    src = ip_binary_to_str(b[12:16])
+    dst = ip_binary_to_str(b[16:20])
+    return IPv4Header(length, ttl, protocol, checksum, src, dst)
+
+def legacy_tcp_to_bytes(hdr: TCPHeader) -> bytes:
+    b = b''
+    b += struct.pack('!H', hdr.sport)
+    b += struct.pack('!H', hdr.dport)
+    b += struct.pack('!I', hdr.seq)
+    b += struct.pack('!I', hdr.ack)
+    b += struct.pack('!H', 0b0101000000000000 | hdr.flags)
+    b += struct.pack('!H', TCP_RECEIVE_WINDOW)
+    b += struct.pack('!H', hdr.checksum)
+    b += struct.pack('!H', 0)
+    return b
+
+def legacy_tcp_from_bytes(b: bytes) -> TCPHeader:
+    sport, = struct.unpack('!H', b[0:2])
+    dport, = struct.unpack('!H', b[2:4])
+    seq, = struct.unpack('!I', b[4:8])
+    ack, = struct.unpack('!I', b[8:12])
+    flag_data, = struct.unpack('!B', b[13:14])
+    checksum, = struct.unpack('!H', b[16:18])
+    return TCPHeader(sport, dport, seq, ack, flag_data & 0b111111, checksum)
+
+
+def bench_before(ip_hdr: IPv4Header, tcp_hdr: TCPHeader, payload: bytes):
+    def run():
+        pkt = legacy_ipv4_to_bytes(ip_hdr) + legacy_tcp_to_bytes(tcp_hdr) + payload
+        legacy_ipv4_from_bytes(pkt[:IP_HEADER_LEN])
+        legacy_tcp_from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
+    return run
+
+def bench_after(ip_hdr: IPv4Header, tcp_hdr: TCPHeader, payload: bytes):
+    buf = bytearray(TCPIP_HEADER_LEN + len(payload))
+    buf[TCPIP_HEADER_LEN:] = payload
+    def run():
+        ip_hdr.pack_into(buf)
+        tcp_hdr.pack_into(buf, IP_HEADER_LEN)
+        IPv4Header.unpack_from(buf)
+        TCPHeader.unpack_from(buf, IP_HEADER_LEN)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packets', '-n', type=int, default=200000,
+            help='Number of packets to encode and decode per run')
+    parser.add_argument('--payload', '-p', type=int, default=1000,
+            help='Payload size in bytes')
+    args = parser.parse_args()
+
+    payload = b'x' * args.payload
+    ip_hdr = IPv4Header(TCPIP_HEADER_LEN + len(payload), 64, 6, 0,
+            '10.0.0.2', '10.0.2.2')
+    tcp_hdr = TCPHeader(34567, 4567, 123456, 654321, 0x10, 0)
+
+    # make sure both codecs agree before timing them
+    assert legacy_ipv4_to_bytes(ip_hdr) == ip_hdr.to_bytes()
+    assert legacy_tcp_to_bytes(tcp_hdr) == tcp_hdr.to_bytes()
+
+    results = {}
+    for name, factory in (('before', bench_before), ('after', bench_after)):
+        run = factory(ip_hdr, tcp_hdr, payload)
+        elapsed = min(timeit.repeat(run, number=args.packets, repeat=3))
+        results[name] = args.packets / elapsed
+        print(f'{name:>6}: {results[name]:12,.0f} packets/sec')
+
+    print(f'speedup: {results["after"] / results["before"]:.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""
+Benchmark for the streams API (streams.py) over TCPSocket.
+
+A client opens a connection with open_connection() to a server started with
+start_server(), over the in-memory Link of bench_transfer.py with a
+bottleneck of --rate Mbit/s, and writes --bytes in --write-size writes, as
+fast as it can.  The server reads everything, and echoes back a line
+reporting how much it received.  With drain() after each write, the data
+not yet sent stays near the high-water mark; without it, the application's
+data piles up in the send buffer.  Reports the goodput and the largest send
+buffer (all the data not yet acknowledged) for each.
+"""
+
+import argparse
+import asyncio
+
+from bench_transfer import Link
+from streams import open_connection, start_server
+
+SERVER_ADDR = '10.0.0.2'
+SERVER_PORT = 4567
+CLIENT_ADDR = '10.0.0.1'
+CLIENT_PORT = 34567
+
+
+def run(args: argparse.Namespace, drain: bool) -> tuple[float, int]:
+    """
+    Send args.bytes through the streams, calling drain() after each write
+    if drain is set, and return the time taken and the largest send buffer.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    link = Link(loop, args.delay, rate=args.rate * 1e6 / 8, queue=args.queue)
+
+    def install(local_addr, local_port, remote_addr, remote_port, sock):
+        link.sockets[(local_addr, local_port, remote_addr, remote_port)] = sock
+
+    async def handle_client(reader, writer):
+        received = 0
+        while data := await reader.read(65536):
+            received += len(data)
+        writer.write(f'{received}\n'.encode())
+        writer.close()
+
+    async def main():
+        server = await start_server(handle_client, SERVER_ADDR, SERVER_PORT,
+                install, link.send, send_ip_packets_func=link.send_packets,
+                congestion_control='cubic')
+        link.sockets[(SERVER_ADDR, SERVER_PORT, None, None)] = server.sock
+        reader, writer = await open_connection(CLIENT_ADDR, CLIENT_PORT,
+                SERVER_ADDR, SERVER_PORT, install, link.send,
+                send_ip_packets_func=link.send_packets,
+                congestion_control='cubic')
+
+        data = b'x' * args.write_size
+        peak = 0
+        start = loop.time()
+        for i in range(0, args.bytes, args.write_size):
+            writer.write(data[:args.bytes - i])
+            send_buffer = writer.sock.send_buffer
+            peak = max(peak, send_buffer.last_seq - send_buffer.base_seq)
+            if drain:
+                await writer.drain()
+        writer.write_eof()
+        line = await reader.readline()
+        elapsed = loop.time() - start
+        assert int(line) == args.bytes
+        await writer.wait_closed()
+        return elapsed, peak
+
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bytes', type=int, default=4 << 20,
+            help='Bytes to write')
+    parser.add_argument('--write-size', type=int, default=16384,
+            help='Size of each write')
+    parser.add_argument('--delay', type=float, default=0.01,
+            help='One-way link delay in seconds')
+    parser.add_argument('--rate', type=float, default=20,
+            help='Bottleneck rate in Mbit/s')
+    parser.add_argument('--queue', type=int, default=64000,
+            help='Bottleneck queue size in bytes')
+    args = parser.parse_args()
+
+    print(f'{"drain":>6} {"goodput Mbit/s":>15} {"peak send buffer KiB":>21}')
+    for drain in (False, True):
+        elapsed, peak = run(args, drain)
+        print(f'{"yes" if drain else "no":>6} ' + \
+                f'{args.bytes * 8 / elapsed / 1e6:>15.2f} ' + \
+                f'{peak / 1024:>21.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+"""
+SYN flood benchmark for TCPListenerSocket.
+
+Legitimate clients open --rate connections per second to an EchoServerTCP
+over the in-memory Link of bench_transfer.py; each sends a short request and
+closes the connection once the echo has come back.  Meanwhile, an attacker
+sends --flood SYNs per second from spoofed addresses, which never answer
+the SYNACK.  The clients do not retransmit their SYN, so a SYN dropped by
+the listener is a connection lost.
+
+Runs for --duration seconds without the flood, then with it against the SYN
+queue alone (--backlog half-open connections), then with SYN cookies, and
+reports for each the connections the clients completed, and the sockets the
+server held at most.
+"""
+
+import argparse
+import asyncio
+import random
+
+from bench_transfer import Link
+from echoserver import EchoServerTCP
+from mysocket import TCPSocket, TCP_FLAGS_SYN
+from timerwheel import TimerWheel
+
+SERVER_ADDR = '10.0.0.2'
+SERVER_PORT = 7
+CLIENT_ADDR = '10.0.0.1'
+# the ephemeral ports that the clients use, in turn
+CLIENT_PORTS = range(1024, 65536)
+# the flood is sent in bursts, this many seconds apart
+FLOOD_INTERVAL = 0.001
+
+
+def run(args: argparse.Namespace, flood: bool,
+        syn_cookies: bool) -> tuple[int, int, int, EchoServerTCP]:
+    """
+    Run the clients (and the flood, if flood is set) for args.duration
+    seconds, and return the connections attempted and completed, the most
+    sockets the server held at once, and the server.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    link = Link(loop, args.delay)
+    timer_wheel = TimerWheel()
+    rand = random.Random(0)
+    request = b'x' * args.request_size
+    attempted = completed = server_sockets = peak = 0
+
+    def install(local_addr, local_port, remote_addr, remote_port, sock):
+        nonlocal server_sockets, peak
+        link.sockets[(local_addr, local_port, remote_addr, remote_port)] = sock
+        if local_addr == SERVER_ADDR:
+            server_sockets += 1
+            peak = max(peak, server_sockets)
+
+    def remove(local_addr, local_port, remote_addr, remote_port, sock):
+        nonlocal server_sockets
+        key = (local_addr, local_port, remote_addr, remote_port)
+        if link.sockets.get(key) is sock:
+            del link.sockets[key]
+        if local_addr == SERVER_ADDR:
+            server_sockets -= 1
+
+    socket_args = dict(timer_wheel=timer_wheel, time_wait=args.time_wait,
+            remove_socket_func=remove)
+    server = EchoServerTCP(SERVER_ADDR, SERVER_PORT, install, link.send,
+            syn_backlog=args.backlog, syn_cookies=syn_cookies, **socket_args)
+    link.sockets[(SERVER_ADDR, SERVER_PORT, None, None)] = server.sock
+
+    def open_connection():
+        nonlocal attempted
+        port = CLIENT_PORTS[attempted % len(CLIENT_PORTS)]
+        attempted += 1
+        received = 0
+
+        def notify():
+            nonlocal received, completed
+            data = sock.recv(args.request_size)
+            received += len(data)
+            if data and received == args.request_size:
+                completed += 1
+                sock.close()
+
+        sock = TCPSocket.connect(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT,
+                link.send, notify, **socket_args)
+        install(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT, sock)
+        sock.send(request)
+
+    async def clients():
+        for _ in range(int(args.duration * args.rate)):
+            open_connection()
+            await asyncio.sleep(1 / args.rate)
+
+    async def attacker():
+        burst = args.flood * FLOOD_INTERVAL
+        sent = 0
+        while True:
+            sent += burst
+            while sent >= 1:
+                sent -= 1
+                src = f'198.18.{rand.randrange(256)}.{rand.randrange(256)}'
+                link.send(TCPSocket.create_packet(src,
+                    rand.randrange(1024, 65536), SERVER_ADDR, SERVER_PORT,
+                    rand.randrange(65536), 0, TCP_FLAGS_SYN))
+            await asyncio.sleep(FLOOD_INTERVAL)
+
+    async def main():
+        if flood:
+            flooding = asyncio.ensure_future(attacker())
+        await clients()
+        # let the last connections finish
+        await asyncio.sleep(args.time_wait + 1)
+        if flood:
+            flooding.cancel()
+
+    loop.run_until_complete(main())
+    loop.close()
+    return attempted, completed, peak, server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10,
+            help='Time during which clients connect, in seconds')
+    parser.add_argument('--rate', type=float, default=50,
+            help='Connections opened by the clients per second')
+    parser.add_argument('--flood', type=float, default=2000,
+            help='SYNs sent by the attacker per second')
+    parser.add_argument('--backlog', type=int, default=128,
+            help='Size of the SYN queue')
+    parser.add_argument('--request-size', type=int, default=100,
+            help='Bytes sent (and echoed) per connection')
+    parser.add_argument('--delay', type=float, default=0.001,
+            help='One-way link delay in seconds')
+    parser.add_argument('--time-wait', type=float, default=0.1,
+            help='Time in TIME_WAIT, in seconds')
+    args = parser.parse_args()
+
+    print(f'{"flood":>6} {"cookies":>8} {"attempted":>10} ' + \
+            f'{"completed":>10} {"conn/s":>8} {"peak sockets":>13} ' + \
+            f'{"SYNs dropped":>13} {"cookies sent":>13} ' + \
+            f'{"accepted":>9}')
+    for flood, syn_cookies in ((False, False), (True, False), (True, True)):
+        attempted, completed, peak, server = run(args, flood, syn_cookies)
+        print(f'{"yes" if flood else "no":>6} ' + \
+                f'{"yes" if syn_cookies else "no":>8} {attempted:>10} ' + \
+                f'{completed:>10} {completed / args.duration:>8.1f} ' + \
+                f'{peak:>13} {server.sock.syn_dropped:>13} ' + \
+                f'{server.sock.syn_cookies_sent:>13} ' + \
+                f'{server.sock.syn_cookies_accepted:>9}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Benchmark for the retransmission timers of many TCPSockets.
+
+Each of --sockets sockets restarts its retransmission timer once per ACK,
+as TCPSocket.handle_ack() does, for --acks ACKs each, interleaved across the
+sockets, with the event loop running between rounds.  The timers are either
+scheduled on the event loop (a call_later() and a cancel() per restart) or
+on a timer wheel shared by all the sockets (one re-arm per restart).
+Reports the time per restart and the largest number of handles in the event
+loop's heap, most of them cancelled.
+"""
+
+import argparse
+import asyncio
+import time
+
+from mysocket import TCPSocket, TCP_STATE_ESTABLISHED
+from timerwheel import TimerWheel
+
+
+def restarts(num_sockets: int, acks: int, wheel: bool) -> tuple[float, int]:
+    """
+    Restart the retransmission timers of num_sockets sockets acks times
+    each, and return the time per restart and the peak number of handles
+    scheduled on the event loop.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    timer_wheel = TimerWheel() if wheel else None
+    sockets = [TCPSocket('10.0.0.1', 1024 + i, '10.0.0.2', 80,
+            TCP_STATE_ESTABLISHED, lambda pkt: None, lambda: None,
+            timer_wheel=timer_wheel) for i in range(num_sockets)]
+    peak = 0
+
+    async def run():
+        nonlocal peak
+        elapsed = 0
+        for _ in range(acks):
+            start = time.perf_counter()
+            for sock in sockets:
+                sock.restart_timer()
+            elapsed += time.perf_counter() - start
+            peak = max(peak, len(loop._scheduled))
+            await asyncio.sleep(0)
+        for sock in sockets:
+            sock.cancel_timer()
+        return elapsed
+
+    try:
+        elapsed = loop.run_until_complete(run())
+    finally:
+        loop.close()
+    return elapsed / (num_sockets * acks), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sockets', type=int, nargs='+',
+            default=[100, 1000, 10000],
+            help='Numbers of sockets')
+    parser.add_argument('--acks', type=int, default=100,
+            help='ACKs (timer restarts) per socket')
+    args = parser.parse_args()
+
+    print(f'{"sockets":>8} {"timers":>6} {"ns/restart":>11} ' + \
+            f'{"peak loop handles":>18}')
+    for num_sockets in args.sockets:
+        for wheel in (False, True):
+            per_restart, peak = restarts(num_sockets, args.acks, wheel)
+            print(f'{num_sockets:>8} {"wheel" if wheel else "loop":>6} ' + \
+                    f'{per_restart * 1e9:>11.0f} {peak:>18}')
+
+if __name__ == '__main__':
+    main()
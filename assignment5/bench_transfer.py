@@ -0,0 +1,464 @@
+#!/usr/bin/python3
+"""
+Goodput benchmark for TCPSocket.
+
+Transfers data between a TCPSocket client and a TCPListenerSocket server over
+an in-memory link with a configurable one-way delay, jitter and random loss,
+driven by the asyncio event loop (no network namespaces are needed), and
+reports the goodput of each configuration.
+
+rto: compares the adaptive RTO (SRTT/RTTVAR, with Karn's rule and backoff)
+with the original fixed 1-second timeout, and summarizes the RTT samples
+taken by the sender.
+
+sack: compares retransmission with and without selective acknowledgments.
+
+ack: compares ACKing every segment with delayed ACKs, by goodput and by the
+number of packets sent each way.
+
+nagle: sends the data in many small writes, and compares the number of
+packets and of calls into the link with Nagle's algorithm off and on.
+
+cc: compares the congestion control algorithms (see congestion.py) under the
+same loss profiles, averaging the goodput over --runs seeds, optionally over a
+bottleneck link (--rate, --queue), where the number of packets dropped shows
+how far each overshoots in slow start.
+
+bbr: compares BBR with Tahoe, each with and without SACK, at 0.1%, 1% and 5%
+random loss (unless --loss is given) over a bottleneck link (--rate, --queue),
+by goodput and by the number of packets dropped and sent.
+
+window: compares receive buffers of 64 KB (the most a TCP header can
+advertise without window scaling) and --receive-buffer bytes (advertised
+with window scaling), each with and without timestamps, by goodput, the
+largest window advertised, and the number of RTT samples taken.
+
+pacing: compares each congestion control algorithm (--algorithms; Reno and
+CUBIC by default) without and with pacing, over a bottleneck link (--rate,
+--queue), by goodput, the number of packets dropped, the median and 99th
+percentile RTT (sampled on every ACK, with timestamps), and the mean pacing
+rate.
+
+probe: transfers with CUBIC and SACK over a bottleneck link (--rate,
+--queue), without and with a TCPProbe (see probe.py) on the sender, and
+compares the CPU time taken, to show the cost of recording every ACK.  The
+sender's get_info() at the end of each transfer is summarized, and with
+--trace, the records of the last transfer are written to a CSV file.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from congestion import CONGESTION_CONTROL
+from headers import IPv4View, TCPView
+from mysocket import TCPSocket, TCPListenerSocket, TCP_RTO_INITIAL, \
+        TCP_WINDOW_MAX
+from probe import TCPProbe
+
+# The default bottleneck rate (Mbit/s) for bbr and pacing
+BBR_BOTTLENECK_RATE = 20
+
+# The default congestion control algorithms for pacing
+PACING_ALGORITHMS = ('reno', 'cubic')
+
+
+class FixedRTOTCPSocket(TCPSocket):
+    """A TCPSocket whose RTO is always TCP_RTO_INITIAL (no RTT estimation)."""
+    def set_rto(self) -> None:
+        self.timeout = TCP_RTO_INITIAL
+
+
+class Link:
+    """
+    A pair of in-memory links between hosts, with the given one-way delay
+    (plus up to jitter seconds) and loss rate, in each direction.  Like a
+    real link, it never reorders packets.  Packets are handed to the socket
+    mapped to their destination address and port, or to the listener on
+    their destination port.
+
+    If rate (bytes/second) is given, each direction is a bottleneck that
+    transmits one packet at a time at that rate, with a drop-tail queue of
+    queue bytes (unlimited if None) in front of it.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, delay: float,
+            jitter: float=0, loss: float=0, seed: int=0, rate: float=None,
+            queue: int=None) -> None:
+        self.loop = loop
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.rate = rate
+        self.queue = queue
+        self.random = random.Random(seed)
+        self.sockets = {}
+        # when the last packet in each direction (by source address) arrives
+        self._last_arrival = {}
+        # when the bottleneck in each direction finishes its last packet
+        self._busy_until = {}
+        self.packets = 0
+        self.dropped = 0
+        # the number of packets sent from each address
+        self.packets_from = {}
+        # the number of calls to send() or send_packets()
+        self.calls = 0
+
+    def send_packets(self, pkts: list[bytes]) -> None:
+        self.calls += 1
+        for pkt in pkts:
+            self._send(pkt)
+
+    def send(self, pkt: bytes) -> None:
+        self.calls += 1
+        self._send(pkt)
+
+    def _send(self, pkt: bytes) -> None:
+        self.packets += 1
+        src = IPv4View(pkt).src
+        self.packets_from[src] = self.packets_from.get(src, 0) + 1
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        now = self.loop.time()
+        if self.rate:
+            start = max(now, self._busy_until.get(src, 0))
+            if self.queue is not None and \
+                    (start - now) * self.rate > self.queue:
+                # the queue is full
+                self.dropped += 1
+                return
+            self._busy_until[src] = start + len(pkt) / self.rate
+            now = self._busy_until[src]
+        arrival = max(now + self.delay +
+                self.random.random() * self.jitter,
+                # the event loop does not order callbacks due at the
+                # same time, so keep them apart
+                self._last_arrival.get(src, 0) + 1e-6)
+        self._last_arrival[src] = arrival
+        self.loop.call_at(arrival, self.deliver, pkt)
+
+    def deliver(self, pkt: bytes) -> None:
+        ip_hdr = IPv4View(pkt)
+        tcp_hdr = TCPView(ip_hdr.payload)
+        sock = self.sockets.get((ip_hdr.dst, tcp_hdr.dport,
+                ip_hdr.src, tcp_hdr.sport))
+        if sock is None:
+            sock = self.sockets.get((ip_hdr.dst, tcp_hdr.dport, None, None))
+        if sock is not None:
+            sock.handle_packet(pkt)
+
+
+def transfer(nbytes: int, delay: float, jitter: float=0, loss: float=0,
+        seed: int=0, socket_cls: type=TCPSocket, write_size: int=65536,
+        rate: float=None, queue: int=None, probe: TCPProbe=None,
+        **socket_args) -> tuple[float, TCPSocket, Link]:
+    """
+    Send nbytes from a client socket to a server over a Link, and return the
+    time taken from the first send() until the server has received
+    everything, along with the client socket and the Link.  socket_args are
+    passed to both sockets.  probe, if given, is attached to the client.
+    """
+    loop = asyncio.new_event_loop()
+    link = Link(loop, delay, jitter, loss, seed, rate, queue)
+    received = 0
+    done = loop.create_future()
+
+    def add_server(local_addr, local_port, remote_addr, remote_port, sock):
+        def notify():
+            nonlocal received
+            received += len(sock.recv(sock.ready_buffer_size))
+            if received >= nbytes and not done.done():
+                done.set_result(None)
+        sock._notify_on_data = notify
+        link.sockets[(local_addr, local_port, remote_addr, remote_port)] = sock
+
+    async def run():
+        link.sockets[('10.0.0.2', 4567, None, None)] = TCPListenerSocket(
+                '10.0.0.2', 4567, add_server, link.send, lambda: None,
+                socket_cls=socket_cls, send_ip_packets_func=link.send_packets,
+                **socket_args)
+        client = socket_cls.connect('10.0.0.1', 34567, '10.0.0.2', 4567,
+                link.send, lambda: None,
+                send_ip_packets_func=link.send_packets, **socket_args)
+        link.sockets[('10.0.0.1', 34567, '10.0.0.2', 4567)] = client
+        if probe is not None:
+            probe.attach(client)
+        await asyncio.sleep(4 * (delay + jitter))
+
+        data = b'x' * write_size
+        start = loop.time()
+        for i in range(0, nbytes, write_size):
+            client.send(data[:nbytes - i])
+        await done
+        return loop.time() - start, client, link
+
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def bench_rto(args: argparse.Namespace) -> None:
+    print(f'{"loss":>6} {"rto":>9} {"goodput Mbit/s":>15} {"rtt samples":>12}' + \
+            f' {"min/mean/max rtt ms":>21} {"final rto ms":>13}')
+    for loss in args.loss:
+        for name, socket_cls in (('fixed', FixedRTOTCPSocket),
+                ('adaptive', TCPSocket)):
+            elapsed, sock, _ = transfer(args.bytes, args.delay, args.jitter,
+                    loss, args.seed, socket_cls,
+                    fast_retransmit=True, congestion_control='tahoe')
+            rtts = [rtt * 1000 for _, rtt in sock.rtt_samples]
+            summary = f'{min(rtts):.1f}/{statistics.mean(rtts):.1f}/' + \
+                    f'{max(rtts):.1f}' if rtts else '-'
+            print(f'{loss:>6.1%} {name:>9} ' + \
+                    f'{args.bytes * 8 / elapsed / 1e6:>15.2f} {len(rtts):>12} ' + \
+                    f'{summary:>21} {sock.timeout * 1000:>13.0f}')
+
+
+def bench_sack(args: argparse.Namespace) -> None:
+    print(f'{"loss":>6} {"sack":>5} {"goodput Mbit/s":>15} {"packets":>8}')
+    for loss in args.loss:
+        for sack in (False, True):
+            elapsed, _, link = transfer(args.bytes, args.delay, args.jitter,
+                    loss, args.seed, fast_retransmit=True,
+                    congestion_control='tahoe', sack=sack)
+            print(f'{loss:>6.1%} {"on" if sack else "off":>5} ' + \
+                    f'{args.bytes * 8 / elapsed / 1e6:>15.2f} {link.packets:>8}')
+
+
+def bench_ack(args: argparse.Namespace) -> None:
+    print(f'{"loss":>6} {"delayed ack":>11} {"goodput Mbit/s":>15} ' + \
+            f'{"data pkts":>10} {"ack pkts":>9}')
+    for loss in args.loss:
+        for delayed_ack in (False, True):
+            elapsed, _, link = transfer(args.bytes, args.delay, args.jitter,
+                    loss, args.seed, fast_retransmit=True,
+                    congestion_control='tahoe', delayed_ack=delayed_ack)
+            print(f'{loss:>6.1%} {"on" if delayed_ack else "off":>11} ' + \
+                    f'{args.bytes * 8 / elapsed / 1e6:>15.2f} ' + \
+                    f'{link.packets_from["10.0.0.1"]:>10} ' + \
+                    f'{link.packets_from["10.0.0.2"]:>9}')
+
+
+def bench_nagle(args: argparse.Namespace) -> None:
+    print(f'{"write size":>10} {"nagle":>6} {"goodput Mbit/s":>15} ' + \
+            f'{"data pkts":>10} {"link calls":>11}')
+    for write_size in args.write_sizes:
+        for nagle in (False, True):
+            elapsed, _, link = transfer(args.bytes, args.delay, args.jitter,
+                    0, args.seed, write_size=write_size,
+                    fast_retransmit=True, congestion_control='tahoe',
+                    nagle=nagle)
+            print(f'{write_size:>10} {"on" if nagle else "off":>6} ' + \
+                    f'{args.bytes * 8 / elapsed / 1e6:>15.2f} ' + \
+                    f'{link.packets_from["10.0.0.1"]:>10} {link.calls:>11}')
+
+
+def bench_cc(args: argparse.Namespace) -> None:
+    names = args.algorithms or list(CONGESTION_CONTROL)
+    rate = args.rate * 1e6 / 8 if args.rate else None
+    print(f'{"loss":>6} ' + ' '.join(f'{name:>10}' for name in names) + \
+            '   (goodput, Mbit/s / packets dropped)')
+    for loss in args.loss:
+        results = []
+        for name in names:
+            goodput = []
+            dropped = 0
+            for seed in range(args.seed, args.seed + args.runs):
+                elapsed, _, link = transfer(args.bytes, args.delay,
+                        args.jitter, loss, seed, rate=rate, queue=args.queue,
+                        fast_retransmit=True, congestion_control=name,
+                        sack=args.sack)
+                goodput.append(args.bytes * 8 / elapsed / 1e6)
+                dropped += link.dropped
+            results.append(f'{statistics.mean(goodput):.2f}/' + \
+                    f'{dropped / args.runs:.0f}')
+        print(f'{loss:>6.1%} ' + ' '.join(f'{r:>10}' for r in results))
+
+
+def bench_bbr(args: argparse.Namespace) -> None:
+    if args.rate is None:
+        args.rate = BBR_BOTTLENECK_RATE
+    rate = args.rate * 1e6 / 8
+    print(f'bottleneck {args.rate:g} Mbit/s, queue {args.queue} bytes, ' + \
+            f'rtt {2 * args.delay * 1000:g} ms')
+    print(f'{"loss":>6} {"cc":>6} {"sack":>5} {"goodput Mbit/s":>15} ' + \
+            f'{"dropped":>8} {"sent":>8}')
+    losses = args.loss if args.loss_given else [0.001, 0.01, 0.05]
+    for loss in losses:
+        for name in ('tahoe', 'bbr'):
+            for sack in (False, True):
+                goodput = []
+                dropped = sent = 0
+                for seed in range(args.seed, args.seed + args.runs):
+                    elapsed, _, link = transfer(args.bytes, args.delay,
+                            args.jitter, loss, seed, rate=rate,
+                            queue=args.queue, fast_retransmit=True,
+                            congestion_control=name, sack=sack)
+                    goodput.append(args.bytes * 8 / elapsed / 1e6)
+                    dropped += link.dropped
+                    sent += link.packets_from['10.0.0.1']
+                print(f'{loss:>6.1%} {name:>6} {"on" if sack else "off":>5} ' + \
+                        f'{statistics.mean(goodput):>15.2f} ' + \
+                        f'{dropped / args.runs:>8.0f} {sent / args.runs:>8.0f}')
+
+
+def bench_window(args: argparse.Namespace) -> None:
+    print(f'{"loss":>6} {"buffer":>8} {"timestamps":>10} ' + \
+            f'{"goodput Mbit/s":>15} {"max rwnd":>9} {"rtt samples":>12}')
+    for loss in args.loss:
+        for receive_buffer_size in (TCP_WINDOW_MAX, args.receive_buffer):
+            for timestamps in (False, True):
+                elapsed, sock, _ = transfer(args.bytes, args.delay,
+                        args.jitter, loss, args.seed, fast_retransmit=True,
+                        congestion_control='cubic', sack=True,
+                        receive_buffer_size=receive_buffer_size,
+                        timestamps=timestamps)
+                print(f'{loss:>6.1%} {receive_buffer_size:>8} ' + \
+                        f'{"on" if timestamps else "off":>10} ' + \
+                        f'{args.bytes * 8 / elapsed / 1e6:>15.2f} ' + \
+                        f'{sock.max_rwnd:>9} {len(sock.rtt_samples):>12}')
+
+
+def bench_pacing(args: argparse.Namespace) -> None:
+    if args.rate is None:
+        args.rate = BBR_BOTTLENECK_RATE
+    rate = args.rate * 1e6 / 8
+    print(f'bottleneck {args.rate:g} Mbit/s, queue {args.queue} bytes, ' + \
+            f'rtt {2 * args.delay * 1000:g} ms')
+    print(f'{"loss":>6} {"cc":>6} {"pacing":>6} {"goodput Mbit/s":>15} ' + \
+            f'{"dropped":>8} {"p50/p99 rtt ms":>15} {"pacing Mbit/s":>14}')
+    for loss in args.loss:
+        for name in args.algorithms or PACING_ALGORITHMS:
+            for pacing in (False, True):
+                goodput = []
+                rtts = []
+                rates = []
+                dropped = 0
+                for seed in range(args.seed, args.seed + args.runs):
+                    elapsed, sock, link = transfer(args.bytes, args.delay,
+                            args.jitter, loss, seed, rate=rate,
+                            queue=args.queue, fast_retransmit=True,
+                            congestion_control=name, sack=True,
+                            timestamps=True, pacing=pacing)
+                    goodput.append(args.bytes * 8 / elapsed / 1e6)
+                    dropped += link.dropped
+                    rtts.extend(rtt * 1000 for _, rtt in sock.rtt_samples)
+                    rates.extend(r * 8 / 1e6 for _, r in
+                            sock.pacing_rate_samples if r)
+                rtts.sort()
+                rtt_summary = f'{rtts[len(rtts) // 2]:.1f}/' + \
+                        f'{rtts[len(rtts) * 99 // 100]:.1f}' if rtts else '-'
+                rate_summary = f'{statistics.mean(rates):.2f}' if rates \
+                        else '-'
+                print(f'{loss:>6.1%} {name:>6} ' + \
+                        f'{"on" if pacing else "off":>6} ' + \
+                        f'{statistics.mean(goodput):>15.2f} ' + \
+                        f'{dropped / args.runs:>8.0f} {rtt_summary:>15} ' + \
+                        f'{rate_summary:>14}')
+
+
+def bench_probe(args: argparse.Namespace) -> None:
+    if args.rate is None:
+        args.rate = BBR_BOTTLENECK_RATE
+    rate = args.rate * 1e6 / 8
+    print(f'bottleneck {args.rate:g} Mbit/s, queue {args.queue} bytes, ' + \
+            f'rtt {2 * args.delay * 1000:g} ms')
+    print(f'{"loss":>6} {"probe":>6} {"goodput Mbit/s":>15} ' + \
+            f'{"cpu ms":>7} {"records":>8} {"retransmits":>12} ' + \
+            f'{"timeouts":>9} {"dup acks":>9} {"srtt ms":>8} ' + \
+            f'{"delivery Mbit/s":>16}')
+    probe = None
+    for loss in args.loss:
+        for probing in (False, True):
+            probe = TCPProbe() if probing else None
+            cpu = time.process_time()
+            elapsed, sock, _ = transfer(args.bytes, args.delay, args.jitter,
+                    loss, args.seed, rate=rate, queue=args.queue,
+                    probe=probe, fast_retransmit=True,
+                    congestion_control='cubic', sack=True)
+            cpu = time.process_time() - cpu
+            info = sock.get_info()
+            print(f'{loss:>6.1%} {"on" if probing else "off":>6} ' + \
+                    f'{args.bytes * 8 / elapsed / 1e6:>15.2f} ' + \
+                    f'{cpu * 1000:>7.0f} ' + \
+                    f'{len(probe) if probe else "-":>8} ' + \
+                    f'{info.retransmits:>12} {info.timeouts:>9} ' + \
+                    f'{info.dup_acks_received:>9} ' + \
+                    f'{info.srtt * 1000:>8.1f} ' + \
+                    f'{info.delivery_rate * 8 / 1e6:>16.2f}')
+    if args.trace:
+        with open(args.trace, 'w', newline='') as file:
+            probe.to_csv(file)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', nargs='?', default='rto',
+            choices=('rto', 'sack', 'ack', 'nagle', 'cc', 'bbr', 'window',
+                'pacing', 'probe'),
+            help='Which benchmark to run')
+    parser.add_argument('--bytes', type=int, default=1 << 20,
+            help='Bytes to transfer')
+    parser.add_argument('--delay', type=float, default=0.01,
+            help='One-way link delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.002,
+            help='Maximum additional (random) one-way delay in seconds')
+    parser.add_argument('--loss', type=float, nargs='+',
+            help='Packet loss rates (default: 0, 1%% and 5%%; for bbr, ' + \
+                    '0.1%%, 1%% and 5%%)')
+    parser.add_argument('--seed', type=int, default=0,
+            help='Seed for the random loss and jitter')
+    parser.add_argument('--write-sizes', type=int, nargs='+',
+            default=[10, 100, 1000],
+            help='Sizes of the application writes, for nagle')
+    parser.add_argument('--algorithms', nargs='+',
+            choices=tuple(CONGESTION_CONTROL),
+            help='Congestion control algorithms to compare, for cc ' + \
+                    '(default: all) and pacing (default: ' + \
+                    f'{", ".join(PACING_ALGORITHMS)})')
+    parser.add_argument('--runs', type=int, default=3,
+            help='Runs (with different seeds) per configuration, for cc, ' + \
+                    'bbr and pacing')
+    parser.add_argument('--sack', action='store_true',
+            help='Use SACK, for cc')
+    parser.add_argument('--rate', type=float,
+            help='Bottleneck rate in Mbit/s, for cc (default: none), ' + \
+                    'bbr, pacing and probe (default: ' + \
+                    f'{BBR_BOTTLENECK_RATE})')
+    parser.add_argument('--queue', type=int, default=64000,
+            help='Bottleneck queue size in bytes, for cc, bbr, pacing ' + \
+                    'and probe')
+    parser.add_argument('--receive-buffer', type=int, default=1 << 20,
+            help='Receive buffer size in bytes, for window')
+    parser.add_argument('--trace',
+            help='CSV file to write the records of the last transfer ' + \
+                    'to, for probe')
+    args = parser.parse_args()
+    args.loss_given = args.loss is not None
+    if args.loss is None:
+        args.loss = [0, 0.01, 0.05]
+
+    if args.benchmark == 'rto':
+        bench_rto(args)
+    elif args.benchmark == 'sack':
+        bench_sack(args)
+    elif args.benchmark == 'ack':
+        bench_ack(args)
+    elif args.benchmark == 'nagle':
+        bench_nagle(args)
+    elif args.benchmark == 'cc':
+        bench_cc(args)
+    elif args.benchmark == 'bbr':
+        bench_bbr(args)
+    elif args.benchmark == 'window':
+        bench_window(args)
+    elif args.benchmark == 'pacing':
+        bench_pacing(args)
+    elif args.benchmark == 'probe':
+        bench_probe(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,51 @@
 """TCP Send and Receive Buffer"""
+import bisect
+import collections
+import time
+
+
+# A delivery rate sample, taken when an ACK (or a SACK) delivers new data:
+#   delivery_rate: bytes delivered per second over the sampled interval
+#   rtt: the RTT of the most recently sent segment delivered (None if it was
+#       a retransmission)
+#   delivered: the bytes delivered during the interval
+#   prior_delivered: the total bytes delivered when that segment was sent
+#   interval: the length of the interval, in seconds
+#   app_limited: whether the application, rather than the network, limited
+#       the sending rate during the interval
+RateSample = collections.namedtuple('RateSample',
+        ('delivery_rate', 'rtt', 'delivered', 'prior_delivered', 'interval',
+            'app_limited'))
+
+
 class TCPSendBuffer(object):
     """
     A buffer that tracks all the bytes that need to be sent, and 
     which of those bytes have been sent but not acknolwedged.
 
+    The data is held as a list of chunks (one per put()) rather than one
+    contiguous bytes object, so that put() only appends a chunk and slide()
+    only advances past fully-acknowledged chunks; neither copies the
+    backlog of unacknowledged data.
+
+    With copy=False (scatter-gather mode), put() keeps a reference to the
+    caller's buffer even if it is mutable, and the caller must not modify it
+    until it has been acknowledged.  get_vectors() then returns the pieces
+    of a segment without joining them, so the only copy of the data is made
+    when the segment is assembled.
+
+    The buffer also keeps a SACK scoreboard (RFC 6675): the ranges that the
+    receiver has selectively acknowledged (see sack()).  Unacknowledged bytes
+    with enough SACKed bytes above them that have not been retransmitted are
+    presumed lost, and get_vectors_for_hole() returns them, hole by hole.
+
+    For delivery rate estimation, each transmission is recorded (see
+    record_send()) along with the number of bytes delivered (cumulatively or
+    selectively acknowledged) at that point; an ACK then yields a RateSample
+    (see rate_sample()), as in draft-cheng-iccrg-delivery-rate-estimation.
+    Of the segments a SACK covers, only the one ending at the right edge of
+    its first block (the most recently received, per RFC 2018) is sampled.
+
     Attr:
         base_seq : int
             the sequence number of the first unacknolwedged byte in the window
@@ -11,12 +53,54 @@ class TCPSendBuffer(object):
             the sequence number of the first yet-to-be sent byte in the window
         last_seq : int
             the sequence number of the byte after the last byte in the buffer
+        resend_seq : int
+            the sequence number of the byte after the last byte retransmitted
+            (HighRxt in RFC 6675)
+        delivered : int
+            the total number of bytes delivered
+        delivered_time : float
+            when delivered last increased
+        first_sent_time : float
+            when the segment that starts the current sampling interval was
+            sent
+        app_limited : int
+            if non-zero, the value of delivered up to which rate samples are
+            application-limited
     """
-    def __init__(self, seq: int):
-        self.buffer = b''
+    def __init__(self, seq: int, copy: bool=True):
+        self.copy = copy
+        # chunks of data, in sequence order, and the sequence number of the
+        # first byte of each
+        self._chunks = []
+        self._starts = []
+        # index of the first chunk that has not been fully acknowledged;
+        # chunks before it are dropped lazily by slide()
+        self._first = 0
         self.base_seq = seq
         self.next_seq = self.base_seq
         self.last_seq = self.base_seq
+        # the SACKed (start, end) ranges above base_seq, disjoint and sorted
+        self._sacked = []
+        self.resend_seq = self.base_seq
+        # unSACKed bytes below this sequence number are presumed lost
+        self._lost_seq = self.base_seq
+
+        # delivery rate estimation: a record of each transmission, in the
+        # order sent and by the sequence number that ends it, and the record
+        # of the most recently sent segment delivered since the last rate
+        # sample
+        self.delivered = 0
+        self.delivered_time = None
+        self.first_sent_time = None
+        self.app_limited = 0
+        self._send_records = collections.deque()
+        self._send_records_by_end = {}
+        self._acked_record = None
+
+    @property
+    def buffer(self) -> bytes:
+        """All the unacknowledged bytes, whether or not they have been sent."""
+        return bytes(self._read(self.base_seq, self.last_seq - self.base_seq))
 
     def bytes_not_yet_sent(self) -> int:
         """The number of bytes not-yet-sent in the buffer."""
@@ -26,6 +110,40 @@ class TCPSendBuffer(object):
         """The number of bytes sent but not yet acknowledged."""
         return self.next_seq - self.base_seq
 
+    def bytes_sacked(self) -> int:
+        """The number of bytes outstanding that have been SACKed."""
+        return sum(end - start for start, end in self._sacked)
+
+    def bytes_lost(self) -> int:
+        """
+        The number of bytes outstanding that are presumed lost (see sack())
+        and that have been neither SACKed nor retransmitted.
+        """
+        start = max(self.resend_seq, self.base_seq)
+        high = self._lost_seq
+        if start >= high:
+            return 0
+        return high - start - sum(min(end, high) - max(s, start)
+                for s, end in self._sacked if end > start and s < high)
+
+    def in_loss(self) -> bool:
+        """
+        Return whether any of the bytes outstanding are presumed lost (see
+        sack() and mark_lost()), whether or not they have since been
+        retransmitted.
+        """
+        return self._lost_seq > self.base_seq
+
+    def bytes_in_flight(self) -> int:
+        """
+        The number of bytes presumed to be in the network (the "pipe"):
+        those outstanding, less those SACKed or presumed lost.
+        """
+        if not self._sacked and self._lost_seq <= self.base_seq:
+            return self.next_seq - self.base_seq
+        return self.next_seq - self.base_seq - self.bytes_sacked() - \
+                self.bytes_lost()
+
     def put(self, data: bytes) -> int:
         """
         Add data to the buffer.
@@ -34,11 +152,45 @@ class TCPSendBuffer(object):
             data : bytes
                 raw bytes to be sent across a TCP connection
         """
-        self.buffer += data
-        self.last_seq += len(data)
+        if data:
+            if self.copy:
+                # bytes(data) is a no-op for bytes; anything mutable is copied
+                data = bytes(data)
+            self._chunks.append(memoryview(data).cast('B'))
+            self._starts.append(self.last_seq)
+            self.last_seq += len(data)
         return self.last_seq
 
-    def get(self, size: int) -> tuple[bytes, int]:
+    def _read_vectors(self, seq: int, size: int) -> list[memoryview]:
+        """
+        Return views of the chunks holding the size bytes starting at
+        sequence number seq, trimmed to exactly those bytes.
+        """
+        if size <= 0:
+            return []
+        i = bisect.bisect_right(self._starts, seq, self._first) - 1
+        chunk = self._chunks[i]
+        offset = seq - self._starts[i]
+        pieces = [chunk[offset:offset + size]]
+        remaining = size - len(pieces[0])
+        while remaining > 0:
+            i += 1
+            pieces.append(self._chunks[i][:remaining])
+            remaining -= len(pieces[-1])
+        return pieces
+
+    def _read(self, seq: int, size: int) -> memoryview:
+        """
+        Return the size bytes starting at sequence number seq.  If they all
+        lie within one chunk, the result is a view of that chunk; otherwise
+        the pieces are joined.
+        """
+        pieces = self._read_vectors(seq, size)
+        if len(pieces) == 1:
+            return pieces[0]
+        return memoryview(b''.join(pieces))
+
+    def get(self, size: int) -> tuple[memoryview, int]:
         """
         Retrieve (at most) the next size bytes of data that have not been sent. 
         
@@ -49,14 +201,12 @@ class TCPSendBuffer(object):
                 if size exceeds amount of data in the buffer, then only remaining bytes are sent
 
         Returns:
-            A tuple of (bytes, int), where the first element is the bytes themselves and 
+            A tuple of (memoryview, int), where the first element is the bytes themselves and 
             the second is the starting seqeunce number.
         """
-        idx_next_seq = self.next_seq-self.base_seq
         # if size exceeds amount of data in the buffer, return remaining
-        if idx_next_seq + size > len(self.buffer):
-            size = len(self.buffer) - idx_next_seq
-        data = self.buffer[idx_next_seq:idx_next_seq + size]
+        size = min(size, self.last_seq - self.next_seq)
+        data = self._read(self.next_seq, size)
         starting_seq = self.next_seq
 
         # shift next_seq
@@ -64,7 +214,18 @@ class TCPSendBuffer(object):
 
         return (data, starting_seq)
 
-    def get_for_resend(self, size: int) -> tuple[bytes, int]:
+    def get_vectors(self, size: int) -> tuple[list[memoryview], int]:
+        """
+        Like get(), but return the data as a list of views of the buffered
+        chunks, which is never copied.
+        """
+        size = min(size, self.last_seq - self.next_seq)
+        pieces = self._read_vectors(self.next_seq, size)
+        starting_seq = self.next_seq
+        self.next_seq += size
+        return (pieces, starting_seq)
+
+    def get_for_resend(self, size: int) -> tuple[memoryview, int]:
         """
         Retrieve the next size bytes of data that have previously been sent
         but not yet acknowledged.  
@@ -76,12 +237,183 @@ class TCPSendBuffer(object):
                 if size exceeds amount of data in the buffer, then only remaining bytes are sent
 
         Returns:
-            A tuple of (bytes, int), where the first element is the bytes themselves and 
+            A tuple of (memoryview, int), where the first element is the bytes themselves and 
             the second is the starting seqeunce number.
         """
-        return (self.buffer[:size], self.base_seq)
+        size = self._resend_size(size)
+        return (self._read(self.base_seq, size), self.base_seq)
+
+    def get_vectors_for_resend(self, size: int) -> tuple[list[memoryview], int]:
+        """
+        Like get_for_resend(), but return the data as a list of views of the
+        buffered chunks, which is never copied.
+        """
+        size = self._resend_size(size)
+        return (self._read_vectors(self.base_seq, size), self.base_seq)
+
+    def _resend_size(self, size: int) -> int:
+        """
+        Return the number of bytes (at most size) to retransmit from
+        base_seq, stopping short of any SACKed range, and note that they have
+        been retransmitted.
+        """
+        size = min(size, self.last_seq - self.base_seq)
+        if self._sacked:
+            size = min(size, self._sacked[0][0] - self.base_seq)
+        self.resend_seq = self.base_seq + size
+        return size
 
-    def slide(self, sequence: int) -> None:
+    def get_vectors_for_hole(self, size: int) -> tuple[list[memoryview], int]:
+        """
+        Retrieve (at most) size bytes from the first hole in the SACK
+        scoreboard (bytes presumed lost) that has not yet been retransmitted,
+        as a list of views of the buffered chunks.  If there is no such hole,
+        the list is empty.
+
+        Returns:
+            A tuple of (list, int), where the first element is the data and
+            the second is its starting sequence number.
+        """
+        seq = max(self.resend_seq, self.base_seq)
+        for start, end in self._sacked:
+            if end <= seq:
+                continue
+            if start > seq:
+                break
+            # skip over the SACKed range
+            seq = end
+        else:
+            start = self.next_seq
+        if seq >= self._lost_seq:
+            # nothing is presumed lost beyond seq
+            return ([], seq)
+        size = min(size, start - seq, self._lost_seq - seq)
+        self.resend_seq = seq + size
+        return (self._read_vectors(seq, size), seq)
+
+    def mark_lost(self) -> None:
+        """
+        Presume all the bytes outstanding that have not been SACKed lost (as
+        after a retransmission timeout, or when a SYNACK does not acknowledge
+        the data sent in the SYN), so that get_vectors_for_hole() returns
+        them all again, from the start (go-back-N).
+        """
+        self._lost_seq = self.next_seq
+        self.resend_seq = self.base_seq
+
+    def sack(self, blocks: list[tuple[int, int]],
+            lost_threshold: int=0, now: float=None) -> None:
+        """
+        Record the (left, right) blocks of a SACK option in the scoreboard.
+        Anything outside the outstanding bytes is ignored.
+
+        Args:
+            blocks : list
+                the (left, right) sequence numbers of each block, where right
+                is the sequence number after the last byte of the block
+            lost_threshold : int
+                an unSACKed byte is presumed lost once at least this many
+                bytes above it have been SACKed (typically DupThresh
+                segments, as in RFC 6675), so that reordering is not taken
+                for loss
+            now : float
+                the time the SACK arrived (default: now), for delivery rate
+                estimation
+        """
+        ranges = self._sacked
+        sacked = self.bytes_sacked()
+        for left, right in blocks:
+            left = max(left, self.base_seq)
+            right = min(right, self.next_seq)
+            if left >= right:
+                continue
+            # merge the block with any ranges it overlaps or touches
+            i = bisect.bisect_left(ranges, (left,))
+            if i and ranges[i-1][1] >= left:
+                i -= 1
+                left = ranges[i][0]
+            j = i
+            while j < len(ranges) and ranges[j][0] <= right:
+                right = max(right, ranges[j][1])
+                j += 1
+            ranges[i:j] = [(left, right)]
+        newly_sacked = self.bytes_sacked() - sacked
+        if newly_sacked:
+            self._deliver(newly_sacked,
+                    time.monotonic() if now is None else now)
+            record = self._send_records_by_end.pop(blocks[0][1], None)
+            if record is not None:
+                self._sample_record(record)
+
+        above = 0
+        for start, end in reversed(ranges):
+            above += end - start
+            if above >= lost_threshold:
+                self._lost_seq = max(self._lost_seq,
+                        start + above - lost_threshold)
+                break
+
+    def record_send(self, seq: int, size: int, now: float,
+            retransmit: bool=False) -> None:
+        """
+        Record that the size bytes at sequence number seq were sent (or, if
+        retransmit, resent) at time now, for delivery rate estimation.
+        """
+        if not self._send_records:
+            # nothing in flight: start a new sampling interval
+            self.first_sent_time = now
+            self.delivered_time = now
+        record = (seq + size, now, self.delivered, self.delivered_time,
+                self.first_sent_time, self.app_limited != 0, retransmit)
+        self._send_records.append(record)
+        self._send_records_by_end[seq + size] = record
+
+    def _sample_record(self, record: tuple) -> None:
+        """Sample record's segment, if it was sent after the last one."""
+        if self._acked_record is None or record[1] >= self._acked_record[1]:
+            self._acked_record = record
+
+    def mark_app_limited(self) -> None:
+        """
+        Note that the sender has run out of data to send with room left in
+        its window, so rate samples until everything now in flight has been
+        delivered reflect the application, not the network.
+        """
+        self.app_limited = (self.delivered + self.bytes_in_flight()) or 1
+
+    def rate_sample(self, now: float) -> RateSample:
+        """
+        Return the RateSample for the segments acknowledged since the last
+        call (at time now), or None if there is none.
+        """
+        record = self._acked_record
+        if record is None:
+            return None
+        self._acked_record = None
+        _, sent_time, prior_delivered, prior_delivered_time, \
+                first_sent_time, app_limited, retransmit = record
+        # the next interval starts with the segment just acknowledged
+        self.first_sent_time = sent_time
+        # the interval is the longer of the send and the ACK intervals, so
+        # that neither a burst of sends nor of ACKs inflates the rate
+        interval = max(sent_time - first_sent_time,
+                now - prior_delivered_time)
+        delivered = self.delivered - prior_delivered
+        if interval <= 0:
+            return None
+        return RateSample(delivered / interval,
+                None if retransmit else now - sent_time,
+                delivered, prior_delivered, interval, app_limited)
+
+    def _deliver(self, size: int, now: float) -> None:
+        """Count size more bytes as delivered at time now."""
+        if size > 0:
+            self.delivered += size
+            self.delivered_time = now
+            if self.app_limited and self.delivered > self.app_limited:
+                self.app_limited = 0
+
+    def slide(self, sequence: int, now: float=None) -> None:
         """
         Acknowledges bytes from the buffer that have previously been sent but not acknowledged.
         Updates base_seq to the sequence provided and changes the buffer to start there.
@@ -89,18 +421,93 @@ class TCPSendBuffer(object):
         Args:  
             sequence : int
                 the sequence number returned in the ACK field of a TCP packet.
+            now : float
+                the time the ACK arrived (default: now), for delivery rate
+                estimation
         """
-        # Remove sent+acknolwedged bytes from buffer
-        
-        self.buffer = self.buffer[sequence-self.base_seq:]
-        self.base_seq = sequence
+        # ignore old (or duplicate) acknowledgments
+        if sequence <= self.base_seq:
+            return
+        if now is None:
+            now = time.monotonic()
+
+        # Remove sent+acknolwedged chunks from buffer
+        chunks, starts = self._chunks, self._starts
+        while self._first < len(chunks) and \
+                starts[self._first] + len(chunks[self._first]) <= sequence:
+            chunks[self._first] = None
+            self._first += 1
 
+        # compact the lists once at least half of them is acknowledged, so
+        # the cost is amortized over the chunks dropped
+        if self._first >= 64 and self._first * 2 >= len(chunks):
+            del chunks[:self._first]
+            del starts[:self._first]
+            self._first = 0
+
+        # drop acknowledged ranges from the scoreboard; they were counted as
+        # delivered when they were SACKed
+        newly_delivered = sequence - self.base_seq
+        ranges = self._sacked
+        if ranges:
+            i = 0
+            while i < len(ranges) and ranges[i][1] <= sequence:
+                newly_delivered -= ranges[i][1] - ranges[i][0]
+                i += 1
+            del ranges[:i]
+            if ranges and ranges[0][0] < sequence:
+                newly_delivered -= sequence - ranges[0][0]
+                ranges[0] = (sequence, ranges[0][1])
+        self._deliver(newly_delivered, now)
+
+        # the acknowledged segment sent most recently determines the rate
+        # sample
+        records = self._send_records
+        by_end = self._send_records_by_end
+        while records and records[0][0] <= sequence:
+            record = records.popleft()
+            if by_end.get(record[0]) is record:
+                del by_end[record[0]]
+                self._sample_record(record)
+
+        self.base_seq = sequence
 
 
 class TCPReceiveBuffer(object):
+    """
+    A buffer that holds received segments until the bytes before them have
+    arrived, trimming any overlap between segments.
+
+    Segments are kept disjoint, keyed by their starting sequence number in
+    buffer, with the starting sequence numbers also kept in sorted order in
+    a list, so that the neighbors of a new segment are found by bisection
+    instead of by sorting the whole buffer.
+
+    With n segments held, finding the place of a new one is O(log n), but
+    inserting its starting sequence number into the list (or deleting one
+    it covers) is an O(n) memmove, so put() is O(n) in the worst case.  The
+    memmove is of n pointers, which is cheap: up to the thousand or so
+    segments that a 1 MiB window holds, it takes a fraction of the rest of
+    put() (see bench_buffer.py holes).
+
+    Attr:
+        buffer : dict
+            maps the starting sequence number of each segment to its data
+        base_seq : int
+            the sequence number of the next in-order byte expected
+        last_put_seq : int
+            the starting sequence number of the most recently received
+            segment (or None), which the first SACK block must cover
+        size : int
+            the number of bytes held (kept as segments come and go, so that
+            it is not summed over the buffer)
+    """
     def __init__(self, seq: int):
         self.buffer = {}
+        self._starts = []
         self.base_seq = seq
+        self.last_put_seq = None
+        self.size = 0
 
     def put(self, data: bytes, sequence: int) -> None:
         """
@@ -112,44 +519,106 @@ class TCPReceiveBuffer(object):
             `sequence`: int
                 the sequence number associated with the first byte of the data
         """
-        # ignore old data
-        if sequence + len(data) <= self.base_seq:
+        end = sequence + len(data)
+
+        # ignore old (or empty) data
+        if end <= self.base_seq or not data:
             return
-        
+
+        # trimming a view does not copy the data
+        data = memoryview(data)
+        self.last_put_seq = sequence
+
         # ignore partial old data
         if sequence < self.base_seq:
             data = data[self.base_seq-sequence:]
             sequence = self.base_seq
 
-        # if sequence already exists 
-        if (segment := self.buffer.get(sequence)):
-            # keep only the longest segment
-            self.buffer[sequence] = segment if len(segment) > len(data) else data
+        starts = self._starts
+        # starts[i-1] < sequence <= starts[i]
+        i = bisect.bisect_left(starts, sequence)
+
+        # when overlapping the previous segment, trim the beginning of the
+        # new segment
+        if i:
+            prev_seq_end = starts[i-1] + len(self.buffer[starts[i-1]])
+            if prev_seq_end >= end:
+                # nothing new
+                return
+            if prev_seq_end > sequence:
+                data = data[prev_seq_end-sequence:]
+                sequence = prev_seq_end
+
+        if i < len(starts) and starts[i] == sequence:
+            # if sequence already exists, keep only the longest segment
+            if len(self.buffer[sequence]) >= len(data):
+                return
+            self.size -= len(self.buffer[sequence])
         else:
-            # insert data into buffer
-            self.buffer[sequence] = data
-
-        # trim overlaps
-        prev_seq_end = -1
-        for cur_seq_start in sorted(self.buffer.keys()):
-            if cur_seq_start < prev_seq_end:
-                # when overlap, trim the beginning of the segment
-                overlapping_segment = self.buffer.pop(cur_seq_start)
-                trimmed_segment = overlapping_segment[prev_seq_end-cur_seq_start:]
-
-                # add trimmed segment
-                if existing_segment := self.buffer.get(prev_seq_end): 
-                    # if there already exist a segment at the new sequence start, keep the longer one, and don't update `prev_seq_end`
-                    self.buffer[prev_seq_end] = existing_segment if len(existing_segment) > len(trimmed_segment) else trimmed_segment
-                else:
-                    # insert trimmed segment at the new sequence start and update `prev_seq_end`
-                    self.buffer[prev_seq_end] = trimmed_segment
-                    prev_seq_end = prev_seq_end + len(trimmed_segment)
-            else:
-                # no overlap, just update `prev_seq_end`
-                prev_seq_end = cur_seq_start + len(self.buffer[cur_seq_start])
-                
+            starts.insert(i, sequence)
+        self.buffer[sequence] = data
+        self.size += len(data)
+
+        # when the new segment overlaps the segments after it, trim their
+        # beginnings (dropping any that are entirely covered)
+        i += 1
+        while i < len(starts) and starts[i] < end:
+            cur_seq_start = starts[i]
+            overlapping_segment = self.buffer.pop(cur_seq_start)
+            if cur_seq_start + len(overlapping_segment) <= end:
+                self.size -= len(overlapping_segment)
+                del starts[i]
+                continue
+            self.size -= end - cur_seq_start
+            self.buffer[end] = overlapping_segment[end-cur_seq_start:]
+            starts[i] = end
+            break
+
+    def get_chunks(self) -> tuple[list[memoryview], int]:
+        """
+        Like get(), but return the contiguous data as the list of segments
+        it is made of, without joining them.
+        """
+        initial_base_seq = self.base_seq
+        prev_seq_end = self.base_seq
+        chunks = []
+        # take segments, in sequence order, up to the first hole
+        starts = self._starts
+        n = 0
+        while n < len(starts) and starts[n] == prev_seq_end:
+            # add contiguous data and remove from buffer
+            chunk = self.buffer.pop(prev_seq_end)
+            chunks.append(chunk)
+            prev_seq_end += len(chunk)
+            n += 1
+        del starts[:n]
+        self.size -= prev_seq_end - initial_base_seq
 
+        # update base_seq
+        self.base_seq = prev_seq_end
+        return (chunks, initial_base_seq)
+
+    def sack_blocks(self, max_blocks: int) -> list[tuple[int, int]]:
+        """
+        Return (at most) max_blocks (left, right) blocks of contiguous data
+        held beyond the first hole, for a SACK option.  As RFC 2018
+        requires, the first block is the one holding the most recently
+        received segment; the rest follow in sequence order.
+        """
+        blocks = []
+        first = None
+        for start in self._starts:
+            end = start + len(self.buffer[start])
+            if blocks and blocks[-1][1] == start:
+                blocks[-1] = (blocks[-1][0], end)
+            else:
+                blocks.append((start, end))
+            if first is None and self.last_put_seq is not None and \
+                    self.last_put_seq < end:
+                first = len(blocks) - 1
+        if first:
+            blocks.insert(0, blocks.pop(first))
+        return blocks[:max_blocks]
 
     def get(self) -> tuple[bytes, int]:
         """
@@ -161,19 +630,6 @@ class TCPReceiveBuffer(object):
             A tuple of `(bytes, int)` where the first element is the data and the second 
             is the sequence number of the starting sequence of bytes.
         """
-        initial_base_seq = self.base_seq
-        prev_seq_end = self.base_seq
-        data = b''
-        # iterate the segments in sequence order
-        for cur_seq_start in sorted(self.buffer.keys()):
-            if prev_seq_end == cur_seq_start:
-                # add contiguous data and remove from buffer
-                data += self.buffer.pop(cur_seq_start)
-                prev_seq_end = self.base_seq + len(data)
-            else:
-                # there is a hole
-                break
-
-        # update base_seq
-        self.base_seq = prev_seq_end
-        return (data, initial_base_seq)
+        chunks, initial_base_seq = self.get_chunks()
+        # join once, rather than concatenating segment by segment
+        return (b''.join(chunks), initial_base_seq)
@@ -0,0 +1,200 @@
+"""Internet checksum (RFC 1071) with incremental updates (RFC 1624)."""
+from __future__ import annotations
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#From /usr/include/linux/in.h:
+IPPROTO_ICMP = 1 # Internet Control Message Protocol
+IPPROTO_TCP = 6 # Transmission Control Protocol
+IPPROTO_UDP = 17 # User Datagram Protocol
+
+# Offset of the checksum field within each transport header
+CHECKSUM_OFFSET = {
+    IPPROTO_ICMP: 2,
+    IPPROTO_TCP: 16,
+    IPPROTO_UDP: 6,
+}
+IPV4_CHECKSUM_OFFSET = 10
+
+# a 16-bit checksum field (or any other 16-bit word)
+WORD_STRUCT = struct.Struct('!H')
+
+# Buffers at least this long are summed with NumPy (when it is installed).
+# Below this, the call overhead of NumPy outweighs its speed.
+NUMPY_MIN_BYTES = 512
+
+# Whether checksums are computed for packets being sent and verified for
+# packets being received.  Both are off by default, in which case checksum
+# fields are written as 0 and ignored on receipt.
+FILL_ON_SEND = False
+VERIFY_ON_RECEIVE = False
+
+
+def set_mode(fill_on_send: bool=None, verify_on_receive: bool=None) -> None:
+    """Switch fill-on-send and/or verify-on-receive on or off."""
+    global FILL_ON_SEND, VERIFY_ON_RECEIVE
+    if fill_on_send is not None:
+        FILL_ON_SEND = fill_on_send
+    if verify_on_receive is not None:
+        VERIFY_ON_RECEIVE = verify_on_receive
+
+def fold(total: int) -> int:
+    """
+    Fold an arbitrarily large sum of 16-bit words into a 16-bit ones'
+    complement sum (i.e., add back all the carries).
+    """
+    # 2^16 = 1 (mod 2^16 - 1), so end-around carries are equivalent to
+    # reduction modulo 0xffff, except that a non-zero sum is never 0.
+    if not total:
+        return 0
+    return total % 0xffff or 0xffff
+
+def ones_complement_sum(data: bytes, initial: int=0) -> int:
+    """
+    Return the 16-bit ones' complement sum of data, taken as big-endian
+    16-bit words (a trailing odd byte is padded with zero), plus initial.
+
+    initial is typically the (unfolded) sum of preceding even-length data,
+    such as a pseudo-header.
+    """
+    mv = memoryview(data)
+    if mv.format != 'B' or mv.ndim != 1:
+        mv = mv.cast('B')
+    n = len(mv)
+    total = initial
+    if numpy is not None and n >= NUMPY_MIN_BYTES:
+        # sum 32-bit words into 64-bit lanes; each word is congruent to the
+        # sum of its two 16-bit halves, modulo 0xffff
+        n4 = n & ~3
+        total += int(numpy.frombuffer(mv[:n4], dtype='>u4').sum(
+            dtype=numpy.uint64))
+        mv = mv[n4:]
+        n -= n4
+    if n:
+        # treat the whole buffer as one wide big-endian word; its value
+        # modulo 0xffff is the sum of its 16-bit words
+        total += int.from_bytes(mv, 'big') << (8 * (n & 1))
+    return fold(total)
+
+def ones_complement_sum_vectors(pieces: list[bytes], initial: int=0) -> int:
+    """
+    Return the 16-bit ones' complement sum of the concatenation of pieces,
+    plus initial, without concatenating them.
+    """
+    total = initial
+    odd = False
+    for piece in pieces:
+        piece_sum = ones_complement_sum(piece)
+        if odd:
+            # a piece starting at an odd offset has its bytes in the
+            # opposite halves of each word, which swaps its sum (RFC 1071)
+            piece_sum = ((piece_sum & 0xff) << 8) | (piece_sum >> 8)
+        total += piece_sum
+        odd ^= bool(len(piece) & 1)
+    return fold(total)
+
+def internet_checksum(data: bytes, initial: int=0) -> int:
+    """Return the Internet checksum (complemented sum) of data."""
+    return ~ones_complement_sum(data, initial) & 0xffff
+
+def pseudo_header_sum(src: bytes, dst: bytes, protocol: int,
+        length: int) -> int:
+    """
+    Return the (unfolded) sum of the IPv4 pseudo-header used by the TCP and
+    UDP checksums.  src and dst are the 4-byte binary addresses.
+    """
+    src = int.from_bytes(src, 'big')
+    dst = int.from_bytes(dst, 'big')
+    return (src >> 16) + (src & 0xffff) + (dst >> 16) + (dst & 0xffff) + \
+            protocol + length
+
+def transport_checksum(src: bytes, dst: bytes, protocol: int,
+        segment: bytes) -> int:
+    """
+    Return the TCP or UDP checksum of segment (header, with its checksum
+    field zeroed, and payload) between binary addresses src and dst.
+    """
+    cksum = internet_checksum(segment,
+            pseudo_header_sum(src, dst, protocol, len(segment)))
+    if protocol == IPPROTO_UDP and cksum == 0:
+        # 0 means "no checksum" in UDP, so it is sent as all ones
+        return 0xffff
+    return cksum
+
+def checksum_update16(cksum: int, old: int, new: int) -> int:
+    """
+    Return the checksum updated for a 16-bit word of the checksummed data
+    changing from old to new, without recomputing it (RFC 1624, eqn. 3):
+
+        HC' = ~(~HC + ~m + m')
+    """
+    return ~fold((~cksum & 0xffff) + (~old & 0xffff) + new) & 0xffff
+
+def decrement_ttl(pkt: bytearray) -> int:
+    """
+    Decrement the TTL of the IPv4 packet pkt in place, incrementally fixing
+    up the header checksum.  Return the new TTL.
+
+    The checksum is always updated: 0 is a valid header checksum, so it
+    cannot be told apart from one that the sender did not fill in (which is
+    ignored on receipt anyway).
+    """
+    old = WORD_STRUCT.unpack_from(pkt, 8)[0] # TTL and protocol
+    pkt[8] -= 1
+    cksum = WORD_STRUCT.unpack_from(pkt, IPV4_CHECKSUM_OFFSET)[0]
+    WORD_STRUCT.pack_into(pkt, IPV4_CHECKSUM_OFFSET,
+            checksum_update16(cksum, old, old - 0x100))
+    return pkt[8]
+
+def fill_packet(pkt: bytes) -> bytes:
+    """
+    Return a copy of the IPv4 packet pkt with its IP header checksum and its
+    ICMP, TCP or UDP checksum filled in.
+    """
+    buf = bytearray(pkt)
+    ihl = (buf[0] & 0x0f) * 4
+    protocol = buf[9]
+    offset = CHECKSUM_OFFSET.get(protocol)
+    if offset is not None and len(buf) >= ihl + offset + 2:
+        segment = memoryview(buf)[ihl:]
+        WORD_STRUCT.pack_into(segment, offset, 0)
+        if protocol == IPPROTO_ICMP:
+            cksum = internet_checksum(segment)
+        else:
+            cksum = transport_checksum(buf[12:16], buf[16:20], protocol,
+                    segment)
+        WORD_STRUCT.pack_into(segment, offset, cksum)
+        segment.release()
+    WORD_STRUCT.pack_into(buf, IPV4_CHECKSUM_OFFSET, 0)
+    WORD_STRUCT.pack_into(buf, IPV4_CHECKSUM_OFFSET,
+            internet_checksum(memoryview(buf)[:ihl]))
+    return bytes(buf)
+
+def verify_ipv4_header(pkt: bytes) -> bool:
+    """Return True if the IPv4 header checksum of pkt is correct."""
+    mv = memoryview(pkt)
+    return ones_complement_sum(mv[:(mv[0] & 0x0f) * 4]) == 0xffff
+
+def verify_transport(pkt: bytes) -> bool:
+    """
+    Return True if the ICMP, TCP or UDP checksum of the IPv4 packet pkt is
+    correct (or, for UDP, was not computed by the sender).
+    """
+    mv = memoryview(pkt)
+    ihl = (mv[0] & 0x0f) * 4
+    protocol = mv[9]
+    length = min(WORD_STRUCT.unpack_from(mv, 2)[0], len(mv))
+    segment = mv[ihl:length]
+    if protocol == IPPROTO_ICMP:
+        return ones_complement_sum(segment) == 0xffff
+    if protocol == IPPROTO_UDP and \
+            WORD_STRUCT.unpack_from(segment, CHECKSUM_OFFSET[protocol])[0] == 0:
+        return True
+    return ones_complement_sum(segment,
+            pseudo_header_sum(mv[12:16], mv[16:20], protocol,
+                len(segment))) == 0xffff
@@ -0,0 +1,623 @@
+"""Congestion control algorithms for TCPSocket."""
+from __future__ import annotations
+
+import collections
+import math
+import random
+import time
+
+# The number of duplicate ACKs (or, with SACK, of segments SACKed above a
+# hole) taken as a sign of loss
+TCP_DUP_THRESH = 3
+
+# In slow start, cwnd grows by at most this many segments per ACK, however
+# much it acknowledges (L in RFC 3465)
+TCP_ABC_LIMIT = 2
+
+# CUBIC parameters (RFC 9438)
+CUBIC_C = 0.4 # scales the cubic function, in segments/second^3
+CUBIC_BETA = 0.7 # the factor cwnd is reduced to on loss
+# the additive increase of the Reno-friendly estimate, per RTT, in segments
+CUBIC_ALPHA = 3 * (1 - CUBIC_BETA) / (1 + CUBIC_BETA)
+
+# HyStart (delay increase, as in RFC 9406) parameters.  Times are in
+# seconds.  Slow start ends once the min RTT of a round trip's first
+# HYSTART_RTT_SAMPLES ACKs exceeds the last round trip's by
+# min(max(its min RTT / 8, HYSTART_MIN_ETA), HYSTART_MAX_ETA), with cwnd at
+# least HYSTART_LOW_WINDOW segments.
+HYSTART_RTT_SAMPLES = 8
+HYSTART_MIN_ETA = 0.004
+HYSTART_MAX_ETA = 0.016
+HYSTART_LOW_WINDOW = 16
+
+# BBR parameters.  Times are in seconds.
+BBR_HIGH_GAIN = 2 / math.log(2) # the smallest gain that doubles the rate
+                                # every round trip, for STARTUP
+BBR_DRAIN_GAIN = 1 / BBR_HIGH_GAIN
+BBR_CWND_GAIN = 2
+BBR_PACING_GAIN_CYCLE = (5/4, 3/4, 1, 1, 1, 1, 1, 1)
+BBR_BW_FILTER_ROUNDS = 10 # round trips over which the max bandwidth is taken
+BBR_MIN_RTT_WINDOW = 10 # time over which the min RTT is taken
+BBR_PROBE_RTT_DURATION = 0.2
+BBR_MIN_CWND_SEGMENTS = 4
+# the pipe is full once the bandwidth has grown by less than this factor for
+# this many round trips
+BBR_FULL_BW_THRESH = 5/4
+BBR_FULL_BW_ROUNDS = 3
+
+
+class CongestionControl:
+    """
+    The interface between a TCPSocket and its congestion control algorithm.
+    The socket calls the on_*() hooks as ACKs arrive and timers expire, and
+    the algorithm adjusts the socket's cwnd and ssthresh in response.
+
+    This class is also the 'none' algorithm: cwnd never changes, and the
+    third duplicate ACK triggers a fast retransmit.
+
+    Attr:
+        sock : TCPSocket
+            the socket whose congestion window is controlled
+        in_recovery : bool
+            whether the socket is in fast recovery
+        recover : int
+            the sequence number that ends fast recovery once it is
+            acknowledged (the highest sequence number sent when loss was
+            detected)
+    """
+    name = 'none'
+    # whether the algorithm does fast recovery after a fast retransmit, which
+    # a socket cannot do without, so a socket with such an algorithm does
+    # fast retransmit whether or not it was asked to
+    fast_recovery = False
+
+    def __init__(self, sock) -> CongestionControl:
+        self.sock = sock
+        self.in_recovery = False
+        self.recover = None
+
+    def on_ack(self, bytes_acked: int) -> None:
+        """New data was acknowledged, outside of fast recovery."""
+        pass
+
+    def on_rate_sample(self, sample) -> None:
+        """
+        An ACK (of new data, or a SACK) yielded a delivery rate sample (see
+        buffer.RateSample).  This is called before any of the other hooks
+        for the ACK.
+        """
+        pass
+
+    def on_dupack(self, num_dup_acks: int) -> bool:
+        """
+        A duplicate ACK arrived, the num_dup_acks-th in a row.  Return True
+        if the first unacknowledged segment should be retransmitted.
+        """
+        return num_dup_acks == TCP_DUP_THRESH
+
+    def on_partial_ack(self, bytes_acked: int) -> bool:
+        """
+        During fast recovery, new data was acknowledged, but not all the
+        data up to recover.  Return True if the (new) first unacknowledged
+        segment should be retransmitted.
+        """
+        return False
+
+    def on_recovery_exit(self) -> None:
+        """All the data up to recover has been acknowledged."""
+        self.in_recovery = False
+
+    def on_timeout(self) -> None:
+        """The retransmission timer expired."""
+        self.in_recovery = False
+
+    def flight_size(self) -> int:
+        """
+        Return the amount of data in flight from which ssthresh is computed
+        on loss: the bytes outstanding, but no more than cwnd (with SACK,
+        much more may be outstanding, most of it already SACKed).
+        """
+        return min(self.sock.send_buffer.bytes_outstanding(), self.sock.cwnd)
+
+    def pacing_rate(self) -> float | None:
+        """
+        Return the rate (bytes/second) at which segments should be sent, or
+        None to send them as soon as cwnd allows.
+        """
+        return None
+
+
+class Tahoe(CongestionControl):
+    """
+    TCP Tahoe: slow start and congestion avoidance (RFC 5681), with cwnd
+    reset to one segment on any loss, whether detected by duplicate ACKs or
+    by a timeout.
+    """
+    name = 'tahoe'
+
+    def __init__(self, sock) -> Tahoe:
+        super().__init__(sock)
+        # bytes acknowledged in congestion avoidance since cwnd last grew
+        self.bytes_acked = 0
+
+    def on_ack(self, bytes_acked: int) -> None:
+        sock = self.sock
+        if sock.cwnd < sock.ssthresh:
+            # slow start: grow by the number of bytes acknowledged, up to
+            # TCP_ABC_LIMIT segments
+            sock.cwnd += min(bytes_acked, TCP_ABC_LIMIT * sock.mss)
+        else:
+            # congestion avoidance: grow by one MSS per cwnd's worth of bytes
+            # acknowledged (appropriate byte counting, RFC 3465)
+            self.bytes_acked += bytes_acked
+            if self.bytes_acked >= sock.cwnd:
+                self.bytes_acked -= sock.cwnd
+                sock.cwnd += sock.mss
+
+    def reduce_ssthresh(self) -> None:
+        """Set ssthresh to half the data in flight (but at least 2 MSS)."""
+        sock = self.sock
+        sock.ssthresh = max(self.flight_size() // 2, 2 * sock.mss)
+        self.bytes_acked = 0
+
+    def on_dupack(self, num_dup_acks: int) -> bool:
+        if num_dup_acks != TCP_DUP_THRESH:
+            return False
+        self.reduce_ssthresh()
+        self.sock.cwnd = self.sock.mss
+        return True
+
+    def on_timeout(self) -> None:
+        super().on_timeout()
+        self.reduce_ssthresh()
+        self.sock.cwnd = self.sock.mss
+        self.recover = self.sock.send_buffer.next_seq
+
+
+class Reno(Tahoe):
+    """
+    TCP Reno: Tahoe, with fast recovery (RFC 5681) after a fast retransmit,
+    instead of slow start.  Any ACK of new data ends fast recovery.
+
+    With SACK, cwnd is not inflated during fast recovery: the bytes SACKed
+    are already left out of the data in flight (RFC 6675).
+    """
+    name = 'reno'
+    fast_recovery = True
+
+    def on_dupack(self, num_dup_acks: int) -> bool:
+        sock = self.sock
+        if self.in_recovery:
+            if not sock.sack:
+                # inflate cwnd by the segment that has left the network
+                sock.cwnd += sock.mss
+            return False
+        if num_dup_acks != TCP_DUP_THRESH:
+            return False
+        self.reduce_ssthresh()
+        sock.cwnd = sock.ssthresh
+        if not sock.sack:
+            sock.cwnd += TCP_DUP_THRESH * sock.mss
+        self.in_recovery = True
+        self.recover = sock.send_buffer.next_seq
+        return True
+
+    def on_partial_ack(self, bytes_acked: int) -> bool:
+        self.on_recovery_exit()
+        return False
+
+    def on_recovery_exit(self) -> None:
+        super().on_recovery_exit()
+        # deflate cwnd
+        self.sock.cwnd = self.sock.ssthresh
+
+
+class NewReno(Reno):
+    """
+    TCP NewReno: Reno, except that fast recovery lasts until all the data
+    sent before loss was detected is acknowledged, and each partial ACK
+    retransmits the next hole (RFC 6582).
+    """
+    name = 'newreno'
+
+    def on_dupack(self, num_dup_acks: int) -> bool:
+        if not self.in_recovery and self.recover is not None and \
+                self.sock.send_buffer.base_seq < self.recover:
+            # the duplicate ACKs may be for segments retransmitted after a
+            # timeout, so do not start another fast retransmit
+            return False
+        return super().on_dupack(num_dup_acks)
+
+    def on_partial_ack(self, bytes_acked: int) -> bool:
+        sock = self.sock
+        if not sock.sack:
+            # deflate cwnd by the amount acknowledged, then add back one MSS
+            sock.cwnd = max(sock.cwnd - bytes_acked, 0)
+            if bytes_acked >= sock.mss:
+                sock.cwnd += sock.mss
+        return True
+
+
+class Cubic(NewReno):
+    """
+    CUBIC (RFC 9438): in congestion avoidance, cwnd follows a cubic
+    function of the time since the last loss, which is flat around the cwnd
+    where that loss happened (w_max) and grows quickly away from it.  It
+    never grows more slowly than Reno would (the Reno-friendly region).  On
+    loss, cwnd is reduced to CUBIC_BETA times the data in flight, and fast
+    recovery is as in NewReno.
+
+    Slow start ends early, before loss, if HyStart sees the RTT grow by
+    more than a threshold within a round trip (a queue building up).
+
+    The cube root is only taken once per congestion epoch (when it starts),
+    so each ACK costs the same.
+
+    Attr:
+        w_max : float
+            cwnd just before the last reduction (less, with fast convergence,
+            if it had not grown back to the one before)
+        k : float
+            the time the cubic function takes to grow back to w_max
+        epoch_start : float
+            when the current congestion avoidance epoch started (None outside
+            of one)
+        w_est : float
+            the Reno-friendly estimate of cwnd
+    """
+    name = 'cubic'
+
+    def __init__(self, sock) -> Cubic:
+        super().__init__(sock)
+        self.w_max = 0
+        self.k = 0
+        self.epoch_start = None
+        self.w_est = 0
+        # growth of cwnd, in bytes, not yet added to it
+        self._cwnd_increase = 0
+
+        # HyStart: the sequence number that ends the current round trip, the
+        # min RTT over the last one, and the min and number of RTT samples in
+        # the current one
+        self._round_end = None
+        self._last_round_min_rtt = None
+        self._round_min_rtt = None
+        self._round_samples = 0
+
+    def on_rate_sample(self, sample) -> None:
+        sock = self.sock
+        if sample.rtt is None or sock.cwnd >= sock.ssthresh:
+            return
+        # HyStart
+        send_buffer = sock.send_buffer
+        if self._round_end is None or send_buffer.base_seq >= self._round_end:
+            if self._round_samples >= HYSTART_RTT_SAMPLES:
+                self._last_round_min_rtt = self._round_min_rtt
+            self._round_end = send_buffer.next_seq
+            self._round_min_rtt = sample.rtt
+            self._round_samples = 0
+        self._round_min_rtt = min(self._round_min_rtt, sample.rtt)
+        self._round_samples += 1
+        last = self._last_round_min_rtt
+        if last is not None and self._round_samples >= HYSTART_RTT_SAMPLES \
+                and sock.cwnd >= HYSTART_LOW_WINDOW * sock.mss:
+            eta = min(max(last / 8, HYSTART_MIN_ETA), HYSTART_MAX_ETA)
+            if self._round_min_rtt >= last + eta:
+                # the queue is building: leave slow start
+                sock.ssthresh = sock.cwnd
+
+    def on_ack(self, bytes_acked: int) -> None:
+        sock = self.sock
+        if sock.cwnd < sock.ssthresh:
+            # slow start, as in Tahoe
+            super().on_ack(bytes_acked)
+            return
+        mss = sock.mss
+        now = time.monotonic()
+        if self.epoch_start is None:
+            self.epoch_start = now
+            if sock.cwnd < self.w_max:
+                self.k = ((self.w_max - sock.cwnd) / mss / CUBIC_C) ** (1/3)
+            else:
+                self.k = 0
+                self.w_max = sock.cwnd
+            self.w_est = sock.cwnd
+            self._cwnd_increase = 0
+
+        # where the cubic function will be an RTT from now, clamped so that
+        # cwnd grows by at most half per RTT
+        t = now - self.epoch_start + (sock.srtt or 0)
+        target = self.w_max + CUBIC_C * (t - self.k) ** 3 * mss
+        target = min(max(target, sock.cwnd), 1.5 * sock.cwnd)
+
+        # what Reno would have grown cwnd to since the epoch started
+        alpha = CUBIC_ALPHA if self.w_est < self.w_max else 1
+        self.w_est += alpha * mss * bytes_acked / sock.cwnd
+
+        if self.w_est > target:
+            # the Reno-friendly region
+            sock.cwnd = max(sock.cwnd, int(self.w_est))
+            return
+        self._cwnd_increase += (target - sock.cwnd) * bytes_acked / sock.cwnd
+        if self._cwnd_increase >= 1:
+            increase = int(self._cwnd_increase)
+            sock.cwnd += increase
+            self._cwnd_increase -= increase
+
+    def reduce_ssthresh(self) -> None:
+        sock = self.sock
+        if sock.cwnd < self.w_max:
+            # fast convergence: the available bandwidth has dropped, so
+            # give some up to other flows
+            self.w_max = sock.cwnd * (1 + CUBIC_BETA) / 2
+        else:
+            self.w_max = sock.cwnd
+        sock.ssthresh = max(int(self.flight_size() * CUBIC_BETA), 2 * sock.mss)
+        self.bytes_acked = 0
+        self.epoch_start = None
+
+
+class BBR(CongestionControl):
+    """
+    BBR (version 1; draft-cardwell-iccrg-bbr-congestion-control): instead of
+    treating loss as congestion, model the path by its bottleneck bandwidth
+    (the max delivery rate over the last BBR_BW_FILTER_ROUNDS round trips)
+    and its propagation delay (the min RTT over the last BBR_MIN_RTT_WINDOW
+    seconds), pace segments at about that bandwidth, and keep about twice
+    their product (the BDP) in flight.
+
+    STARTUP doubles the sending rate each round trip until the bandwidth
+    stops growing, DRAIN empties the queue that built up, and PROBE_BW then
+    cycles the pacing gain through BBR_PACING_GAIN_CYCLE, probing for more
+    bandwidth and then draining what it queued.  If the min RTT has not been
+    seen again for BBR_MIN_RTT_WINDOW seconds, PROBE_RTT cuts cwnd to
+    BBR_MIN_CWND_SEGMENTS for BBR_PROBE_RTT_DURATION to measure it afresh.
+
+    Losses are retransmitted (fast retransmit, or on timeout) but do not
+    reduce cwnd, except that a timeout restarts it from one segment.
+    Delivery rates come from the rate samples taken by the socket (see
+    TCPSendBuffer.rate_sample()).
+
+    Attr:
+        state : int
+            STARTUP, DRAIN, PROBE_BW or PROBE_RTT
+        btl_bw : float
+            the estimated bottleneck bandwidth, in bytes/second
+        min_rtt : float
+            the estimated propagation delay (None until measured)
+        pacing_gain : float
+            the factor of btl_bw at which segments are paced
+        cwnd_gain : float
+            the factor of the BDP allowed in flight
+        round_count : int
+            the number of round trips so far
+        filled_pipe : bool
+            whether STARTUP has found the bottleneck bandwidth
+    """
+    name = 'bbr'
+
+    STARTUP = 0
+    DRAIN = 1
+    PROBE_BW = 2
+    PROBE_RTT = 3
+
+    def __init__(self, sock) -> BBR:
+        super().__init__(sock)
+        self.state = self.STARTUP
+        self.pacing_gain = BBR_HIGH_GAIN
+        self.cwnd_gain = BBR_HIGH_GAIN
+
+        # the max filter: (round, delivery rate) pairs with decreasing
+        # rates, so that the first is the max over the window
+        self._bw_filter = collections.deque()
+        self.btl_bw = 0
+        self.min_rtt = None
+        self._min_rtt_stamp = None
+
+        # a round trip ends when a segment sent after it began is delivered
+        self.round_count = 0
+        self._next_round_delivered = 0
+        self._round_start = False
+
+        self.filled_pipe = False
+        self._full_bw = 0
+        self._full_bw_count = 0
+
+        self._cycle_index = 0
+        self._cycle_stamp = None
+        # whether a loss was detected in this gain cycle phase
+        self._loss = False
+
+        self._probe_rtt_done_stamp = None
+        self._probe_rtt_round_done = False
+        self._prior_cwnd = 0
+
+    def bdp(self, gain: float=1) -> int:
+        """
+        Return gain times the estimated BDP (or None if there is no estimate
+        yet), but at least BBR_MIN_CWND_SEGMENTS.
+        """
+        if not self.btl_bw or self.min_rtt is None:
+            return None
+        return max(int(gain * self.btl_bw * self.min_rtt),
+                BBR_MIN_CWND_SEGMENTS * self.sock.mss)
+
+    def on_rate_sample(self, sample) -> None:
+        now = time.monotonic()
+        self._round_start = False
+        self.update_round(sample)
+        self.update_btl_bw(sample)
+        self.check_full_pipe(sample)
+        min_rtt_expired = self.update_min_rtt(sample, now)
+        self.update_state(now, min_rtt_expired)
+
+    def on_ack(self, bytes_acked: int) -> None:
+        self.set_cwnd(bytes_acked)
+
+    def update_round(self, sample) -> None:
+        if sample.prior_delivered >= self._next_round_delivered:
+            self._next_round_delivered = self.sock.send_buffer.delivered
+            self.round_count += 1
+            self._round_start = True
+
+    def update_btl_bw(self, sample) -> None:
+        rate = sample.delivery_rate
+        # an application-limited sample only shows a lower bound
+        if sample.app_limited and rate < self.btl_bw:
+            return
+        bw_filter = self._bw_filter
+        while bw_filter and bw_filter[-1][1] <= rate:
+            bw_filter.pop()
+        bw_filter.append((self.round_count, rate))
+        while bw_filter[0][0] <= self.round_count - BBR_BW_FILTER_ROUNDS:
+            bw_filter.popleft()
+        self.btl_bw = bw_filter[0][1]
+
+    def update_min_rtt(self, sample, now: float) -> bool:
+        """
+        Update min_rtt with the sample's RTT, and return whether the min RTT
+        had expired (so that PROBE_RTT is due).
+        """
+        expired = self._min_rtt_stamp is not None and \
+                now > self._min_rtt_stamp + BBR_MIN_RTT_WINDOW
+        rtt = sample.rtt
+        if rtt is not None and (self.min_rtt is None or rtt <= self.min_rtt
+                or expired):
+            self.min_rtt = rtt
+            self._min_rtt_stamp = now
+        return expired
+
+    def check_full_pipe(self, sample) -> None:
+        if self.filled_pipe or not self._round_start or sample.app_limited:
+            return
+        if self.btl_bw >= self._full_bw * BBR_FULL_BW_THRESH:
+            self._full_bw = self.btl_bw
+            self._full_bw_count = 0
+            return
+        self._full_bw_count += 1
+        if self._full_bw_count >= BBR_FULL_BW_ROUNDS:
+            self.filled_pipe = True
+
+    def update_state(self, now: float, min_rtt_expired: bool) -> None:
+        inflight = self.sock.send_buffer.bytes_in_flight()
+        if self.state == self.STARTUP and self.filled_pipe:
+            self.state = self.DRAIN
+            self.pacing_gain = BBR_DRAIN_GAIN
+            self.cwnd_gain = BBR_HIGH_GAIN
+        if self.state == self.DRAIN and self.bdp() is not None and \
+                inflight <= self.bdp():
+            self.enter_probe_bw(now)
+        if self.state == self.PROBE_BW:
+            self.update_cycle_phase(now, inflight)
+
+        if min_rtt_expired and self.state != self.PROBE_RTT:
+            self.state = self.PROBE_RTT
+            self.pacing_gain = 1
+            self.cwnd_gain = 1
+            self._prior_cwnd = self.sock.cwnd
+            self._probe_rtt_done_stamp = None
+        if self.state == self.PROBE_RTT:
+            self.handle_probe_rtt(now, inflight)
+
+    def enter_probe_bw(self, now: float) -> None:
+        self.state = self.PROBE_BW
+        self.cwnd_gain = BBR_CWND_GAIN
+        # start anywhere in the cycle but the draining phase
+        self._cycle_index = random.choice([i for i in
+            range(len(BBR_PACING_GAIN_CYCLE)) if i != 1])
+        self.pacing_gain = BBR_PACING_GAIN_CYCLE[self._cycle_index]
+        self._cycle_stamp = now
+        self._loss = False
+
+    def update_cycle_phase(self, now: float, inflight: int) -> None:
+        full_length = now - self._cycle_stamp > self.min_rtt
+        if self.pacing_gain > 1:
+            # probe until the extra data is in flight, or is lost
+            advance = full_length and \
+                    (self._loss or inflight >= self.bdp(self.pacing_gain))
+        elif self.pacing_gain < 1:
+            # drain until the queue is (probably) empty
+            advance = full_length or inflight <= self.bdp()
+        else:
+            advance = full_length
+        if advance:
+            self._cycle_index = \
+                    (self._cycle_index + 1) % len(BBR_PACING_GAIN_CYCLE)
+            self.pacing_gain = BBR_PACING_GAIN_CYCLE[self._cycle_index]
+            self._cycle_stamp = now
+            self._loss = False
+
+    def handle_probe_rtt(self, now: float, inflight: int) -> None:
+        sock = self.sock
+        if self._probe_rtt_done_stamp is None:
+            if inflight <= BBR_MIN_CWND_SEGMENTS * sock.mss:
+                # hold cwnd down for a while, and at least a round trip
+                self._probe_rtt_done_stamp = now + BBR_PROBE_RTT_DURATION
+                self._probe_rtt_round_done = False
+                self._next_round_delivered = sock.send_buffer.delivered
+            return
+        if self._round_start:
+            self._probe_rtt_round_done = True
+        if self._probe_rtt_round_done and now > self._probe_rtt_done_stamp:
+            self._min_rtt_stamp = now
+            sock.cwnd = max(sock.cwnd, self._prior_cwnd)
+            if self.filled_pipe:
+                self.enter_probe_bw(now)
+            else:
+                self.state = self.STARTUP
+                self.pacing_gain = BBR_HIGH_GAIN
+                self.cwnd_gain = BBR_HIGH_GAIN
+
+    def set_cwnd(self, bytes_acked: int) -> None:
+        sock = self.sock
+        min_cwnd = BBR_MIN_CWND_SEGMENTS * sock.mss
+        if self.state == self.PROBE_RTT:
+            sock.cwnd = min(sock.cwnd, min_cwnd)
+            return
+        target = self.bdp(self.cwnd_gain)
+        if target is None or (not self.filled_pipe and sock.cwnd < target):
+            # grow as in slow start until the pipe is full
+            sock.cwnd += bytes_acked
+        else:
+            sock.cwnd = min(sock.cwnd + bytes_acked, target)
+        sock.cwnd = max(sock.cwnd, min_cwnd)
+
+    def on_dupack(self, num_dup_acks: int) -> bool:
+        if num_dup_acks != TCP_DUP_THRESH:
+            return False
+        self._loss = True
+        return True
+
+    def on_timeout(self) -> None:
+        super().on_timeout()
+        self._loss = True
+        self.sock.cwnd = self.sock.mss
+
+    def pacing_rate(self) -> float | None:
+        if self.btl_bw:
+            return self.pacing_gain * self.btl_bw
+        sock = self.sock
+        if sock.srtt:
+            # no bandwidth estimate yet: pace at the STARTUP gain times the
+            # rate cwnd allows
+            return self.pacing_gain * sock.cwnd / sock.srtt
+        return None
+
+
+# congestion_control= names, and the algorithm each selects
+CONGESTION_CONTROL = {
+    cls.name: cls for cls in (CongestionControl, Tahoe, Reno, NewReno, Cubic,
+        BBR)
+}
+
+def create(name: str, sock) -> CongestionControl:
+    """
+    Return a new instance of the congestion control algorithm called name,
+    for sock.
+    """
+    try:
+        cls = CONGESTION_CONTROL[name]
+    except KeyError:
+        raise ValueError(f'Unknown congestion control algorithm: {name!r} ' + \
+                f'(expected one of {", ".join(CONGESTION_CONTROL)})') from None
+    return cls(sock)
@@ -29,3 +29,6 @@ class EchoServerTCP:
         data = sock.recv(65536)
         if data:
             sock.send(data)
+        elif sock.fin_received:
+            # the client has closed its side of the connection
+            sock.close()
@@ -5,6 +5,8 @@ import struct
 from cougarnet.util import \
         ip_str_to_binary, ip_binary_to_str
 
+import checksum
+
 
 IP_HEADER_LEN = 20
 UDP_HEADER_LEN = 8
@@ -13,8 +15,123 @@ ICMP_HEADER_LEN = 8
 TCPIP_HEADER_LEN = IP_HEADER_LEN + TCP_HEADER_LEN
 UDPIP_HEADER_LEN = IP_HEADER_LEN + UDP_HEADER_LEN
 
+# The window advertised by a TCPHeader that is not given one
 TCP_RECEIVE_WINDOW = 64
 
+# Precompiled codecs for each fixed-size header.  Each encodes or decodes a
+# whole header with a single pack_into()/unpack_from() call.
+IPV4_HEADER_STRUCT = struct.Struct('!BBHIBBH4s4s')
+UDP_HEADER_STRUCT = struct.Struct('!HHHH')
+TCP_HEADER_STRUCT = struct.Struct('!HHIIHHHH')
+ICMP_HEADER_STRUCT = struct.Struct('!BBHI')
+UINT16_STRUCT = struct.Struct('!H')
+UINT32_STRUCT = struct.Struct('!I')
+# seq, ack, data offset/flags, and window, starting at byte 4 of the TCP
+# header
+TCP_SEQ_ACK_FLAGS_STRUCT = struct.Struct('!IIHH')
+# the left and right edges of a SACK block
+TCP_SACK_BLOCK_STRUCT = struct.Struct('!II')
+# the timestamp value and echo reply of a timestamps option
+TCP_TIMESTAMP_STRUCT = struct.Struct('!II')
+
+# TCP option kinds
+TCP_OPTION_EOL = 0 # end of option list
+TCP_OPTION_NOP = 1 # no operation (padding)
+TCP_OPTION_MSS = 2 # maximum segment size (RFC 9293)
+TCP_OPTION_WSCALE = 3 # window scale (RFC 7323)
+TCP_OPTION_SACK_PERMITTED = 4 # SACK may be used (RFC 2018)
+TCP_OPTION_SACK = 5 # selective acknowledgment (RFC 2018)
+TCP_OPTION_TIMESTAMP = 8 # timestamps (RFC 7323)
+TCP_OPTION_FASTOPEN = 34 # TCP Fast Open cookie (RFC 7413)
+
+# The most bytes of options a TCP header can hold
+TCP_OPTIONS_MAX_LEN = 40
+# The most SACK blocks that fit in the options, alone or with timestamps
+TCP_SACK_MAX_BLOCKS = 4
+TCP_SACK_MAX_BLOCKS_WITH_TIMESTAMPS = 3
+# The largest window scale shift (RFC 7323)
+TCP_WSCALE_MAX = 14
+
+
+def pack_tcp_options(options: dict) -> bytes:
+    """
+    Encode TCP options, given as a dict that maps each option kind to its
+    value, padded with EOL to a multiple of four bytes.
+
+    The value of TCP_OPTION_MSS is the MSS, that of TCP_OPTION_WSCALE the
+    shift count, that of TCP_OPTION_SACK_PERMITTED is ignored (its presence
+    is what counts), that of TCP_OPTION_SACK a list of (left, right) blocks,
+    that of TCP_OPTION_TIMESTAMP a (value, echo reply) tuple, and that of
+    TCP_OPTION_FASTOPEN the cookie (bytes; empty to request one).  NOPs keep
+    multi-byte values aligned, as in the layouts suggested by RFC 7323.
+    """
+    b = bytearray()
+    for kind, value in options.items():
+        if kind == TCP_OPTION_MSS:
+            b += bytes((kind, 4)) + UINT16_STRUCT.pack(value)
+        elif kind == TCP_OPTION_WSCALE:
+            b += bytes((TCP_OPTION_NOP, kind, 3, value))
+        elif kind == TCP_OPTION_SACK_PERMITTED:
+            b += bytes((TCP_OPTION_NOP, TCP_OPTION_NOP, kind, 2))
+        elif kind == TCP_OPTION_SACK:
+            # two NOPs keep the blocks aligned on four-byte boundaries
+            b += bytes((TCP_OPTION_NOP, TCP_OPTION_NOP,
+                kind, 2 + TCP_SACK_BLOCK_STRUCT.size * len(value)))
+            for left, right in value:
+                b += TCP_SACK_BLOCK_STRUCT.pack(left, right)
+        elif kind == TCP_OPTION_TIMESTAMP:
+            b += bytes((TCP_OPTION_NOP, TCP_OPTION_NOP,
+                kind, 2 + TCP_TIMESTAMP_STRUCT.size))
+            b += TCP_TIMESTAMP_STRUCT.pack(*value)
+        elif kind == TCP_OPTION_FASTOPEN:
+            b += bytes((TCP_OPTION_NOP, TCP_OPTION_NOP, kind, 2 + len(value)))
+            b += value
+        else:
+            raise ValueError(f'Unsupported TCP option: {kind}')
+    b += bytes(-len(b) % 4)
+    if len(b) > TCP_OPTIONS_MAX_LEN:
+        raise ValueError(f'TCP options too long: {len(b)} bytes')
+    return bytes(b)
+
+def unpack_tcp_options(buf: bytes, offset: int=0, end: int=None) -> dict:
+    """
+    Decode the TCP options in buf from offset to end (default: the end of
+    buf) into a dict that maps each option kind to its value.  Unknown
+    options are skipped, and decoding stops at a malformed option.
+    """
+    if end is None:
+        end = len(buf)
+    options = {}
+    while offset < end:
+        kind = buf[offset]
+        if kind == TCP_OPTION_EOL:
+            break
+        if kind == TCP_OPTION_NOP:
+            offset += 1
+            continue
+        if offset + 1 >= end:
+            break
+        length = buf[offset + 1]
+        if length < 2 or offset + length > end:
+            break
+        if kind == TCP_OPTION_SACK:
+            options[kind] = [TCP_SACK_BLOCK_STRUCT.unpack_from(buf, i)
+                    for i in range(offset + 2, offset + length - 7,
+                        TCP_SACK_BLOCK_STRUCT.size)]
+        elif kind == TCP_OPTION_MSS and length == 4:
+            options[kind] = UINT16_STRUCT.unpack_from(buf, offset + 2)[0]
+        elif kind == TCP_OPTION_WSCALE and length == 3:
+            options[kind] = min(buf[offset + 2], TCP_WSCALE_MAX)
+        elif kind == TCP_OPTION_SACK_PERMITTED and length == 2:
+            options[kind] = True
+        elif kind == TCP_OPTION_TIMESTAMP and length == 10:
+            options[kind] = TCP_TIMESTAMP_STRUCT.unpack_from(buf, offset + 2)
+        elif kind == TCP_OPTION_FASTOPEN:
+            options[kind] = bytes(buf[offset + 2:offset + length])
+        offset += length
+    return options
+
+
 class IPv4Header:
     def __init__(self, length: int, ttl: int, protocol: int, checksum: int,
         src: str, dst: str) -> IPv4Header:
@@ -48,36 +165,48 @@ class IPv4Header:
     def __str__(self) -> str:
         return repr(self)
     
+    @classmethod
+    def unpack_from(cls, buf: bytes, offset: int=0) -> IPv4Header:
+        """
+        Initialize a IPv4Header from the IP_HEADER_LEN bytes of buf starting
+        at offset, without slicing buf.
+        """
+        _, _, length, _, ttl, protocol, checksum, src, dst = \
+                IPV4_HEADER_STRUCT.unpack_from(buf, offset)
+
+        return cls(length=length, ttl=ttl, protocol=protocol, checksum=checksum,
+                src=ip_binary_to_str(src), dst=ip_binary_to_str(dst))
+
+    def _fields(self) -> tuple:
+        """Return the values for IPV4_HEADER_STRUCT, in wire order."""
+        return (0b01000101, # version (always 4) and IHL (always 5)
+                0, # differentiated services (always 0)
+                self.length,
+                0, # identification, flags, fragment offset (N/A, so 0)
+                self.ttl,
+                self.protocol,
+                self.checksum,
+                ip_str_to_binary(self.src),
+                ip_str_to_binary(self.dst))
+
+    def pack_into(self, buf: bytearray, offset: int=0) -> None:
+        """
+        Write this IPv4Header into the caller-supplied buffer buf at offset.
+        """
+        IPV4_HEADER_STRUCT.pack_into(buf, offset, *self._fields())
+
     @classmethod
     def from_bytes(cls, hdr: bytes) -> IPv4Header:
         """
         Initialize a IPv4 from raw byte instance
         """
-        length, = struct.unpack('!H', hdr[2:4])
-        ttl, = struct.unpack('!B', hdr[8:9])
-        protocol, = struct.unpack('!B', hdr[9:10])
-        checksum, = struct.unpack('!H', hdr[10:12])
-        src = ip_binary_to_str(hdr[12:16])
-        dst = ip_binary_to_str(hdr[16:20])
-        
-        return cls(length=length, ttl=ttl, protocol=protocol, checksum=checksum, src=src, dst=dst)
+        return cls.unpack_from(hdr)
 
     def to_bytes(self) -> bytes:
         """
         Return bytes of this IPv4 instance with some defaults. 
         """
-        hdr = b''
-        hdr += struct.pack('!B', 0b01000101) # version (always 4) and IHL (always 5)
-        hdr += struct.pack('!B', 0) # differentiated services (always 0)
-        hdr += struct.pack('!H', self.length) 
-        hdr += struct.pack('!I', 0) # identification, flags, fragment offset (N/A, so 0)
-        hdr += struct.pack('!B', self.ttl)
-        hdr += struct.pack('!B', self.protocol)
-        hdr += struct.pack('!H', self.checksum)
-        hdr += struct.pack('!I', int.from_bytes(ip_str_to_binary(self.src)))
-        hdr += struct.pack('!I', int.from_bytes(ip_str_to_binary(self.dst)))
-
-        return hdr
+        return IPV4_HEADER_STRUCT.pack(*self._fields())
 
 
 class UDPHeader:
@@ -101,32 +230,40 @@ class UDPHeader:
         self.checksum = checksum
         self.length = length
 
+    @classmethod
+    def unpack_from(cls, buf: bytes, offset: int=0) -> UDPHeader:
+        """
+        Initialize a UDPHeader from the UDP_HEADER_LEN bytes of buf starting
+        at offset, without slicing buf.
+        """
+        return cls(*UDP_HEADER_STRUCT.unpack_from(buf, offset))
+
+    def pack_into(self, buf: bytearray, offset: int=0) -> None:
+        """
+        Write this UDPHeader into the caller-supplied buffer buf at offset.
+        """
+        UDP_HEADER_STRUCT.pack_into(buf, offset,
+                self.sport, self.dport, self.length, self.checksum)
+
     @classmethod
     def from_bytes(cls, hdr: bytes) -> UDPHeader:
         """
         Initialize a UDPHeader from raw byte instance
         """
-        sport, = struct.unpack('!H', hdr[:2])
-        dport, = struct.unpack('!H', hdr[2:4])
-        length, = struct.unpack('!H', hdr[4:6])
-        checksum, = struct.unpack('!H', hdr[6:8])
-        return cls(sport, dport, length, checksum)
+        return cls.unpack_from(hdr)
 
     def to_bytes(self) -> bytes:
         """
         Return bytes of this UDPHeader instance.
         """
-        hdr = b''
-        hdr += struct.pack('!H', self.sport)
-        hdr += struct.pack('!H', self.dport)
-        hdr += struct.pack('!H', self.length)
-        hdr += struct.pack('!H', self.checksum)
-        return hdr
+        return UDP_HEADER_STRUCT.pack(
+                self.sport, self.dport, self.length, self.checksum)
 
 
 class TCPHeader:
     def __init__(self, sport: int, dport: int, seq: int, ack: int,
-            flags: int, checksum: int) -> TCPHeader:
+            flags: int, checksum: int, options: dict=None,
+            window: int=TCP_RECEIVE_WINDOW) -> TCPHeader:
         """
         Represents a TCP header.
 
@@ -143,6 +280,11 @@ class TCPHeader:
                 control bits (flags can be URG, ACK, PSH, RST, SYN, or FIN)
             checksum : int            
                 checksum of a pseudo IPv4 header (N/A in this lab)
+            options : dict
+                TCP options, mapping each option kind to its value (see
+                pack_tcp_options())
+            window : int
+                the receive window advertised
         """
         self.sport = sport
         self.dport = dport
@@ -150,46 +292,74 @@ class TCPHeader:
         self.ack = ack
         self.flags = flags
         self.checksum = checksum
+        self.options = options or {}
+        self.window = window
 
     def __repr__(self) -> str:
-        return f'TCPHeader(sport={self.sport}, dport={self.dport}, seq={self.seq}, ack={self.ack}, flags={self.flags}, checksum={self.checksum})'
+        return f'TCPHeader(sport={self.sport}, dport={self.dport}, seq={self.seq}, ack={self.ack}, flags={self.flags}, checksum={self.checksum}, window={self.window})'
 
     def __str__(self) -> str:
         return repr(self)
     
     @classmethod
-    def from_bytes(cls, hdr: bytes) -> TCPHeader:
+    def unpack_from(cls, buf: bytes, offset: int=0) -> TCPHeader:
         """
-        Initialize a TCPHeader from raw byte instance
+        Initialize a TCPHeader from the TCP_HEADER_LEN bytes of buf starting
+        at offset, without slicing buf.
         """
-        sport, = struct.unpack('!H', hdr[0:2])
-        dport, = struct.unpack('!H', hdr[2:4])
-        seq, = struct.unpack('!I', hdr[4:8])
-        ack, = struct.unpack('!I', hdr[8:12])
+        sport, dport, seq, ack, offset_flags, window, checksum, _ = \
+                TCP_HEADER_STRUCT.unpack_from(buf, offset)
 
         # get the control bits (6 bits)
-        flag_data, = struct.unpack('!B', hdr[13:14])
-        flags = flag_data & 0b111111
+        flags = offset_flags & 0b111111
 
-        checksum, = struct.unpack('!H', hdr[16:18])
+        # decode any options (those that are in buf)
+        header_len = (offset_flags >> 12) * 4
+        options = None
+        if header_len > TCP_HEADER_LEN:
+            options = unpack_tcp_options(buf, offset + TCP_HEADER_LEN,
+                    min(offset + header_len, len(buf)))
 
-        return cls(sport, dport, seq, ack, flags, checksum)
+        return cls(sport, dport, seq, ack, flags, checksum, options, window)
+
+    def _fields(self, options_len: int=0) -> tuple:
+        """
+        Return the values for TCP_HEADER_STRUCT, in wire order, for a header
+        followed by options_len bytes of options.
+        """
+        return (self.sport,
+                self.dport,
+                self.seq,
+                self.ack,
+                # data offset (5 + options), reserved (0), ECN (0), and Control Bits
+                ((5 + options_len // 4) << 12) | self.flags,
+                self.window,
+                self.checksum,
+                0) # urgent pointer
+
+    def pack_into(self, buf: bytearray, offset: int=0) -> None:
+        """
+        Write this TCPHeader (and its options) into the caller-supplied
+        buffer buf at offset.
+        """
+        options = pack_tcp_options(self.options)
+        TCP_HEADER_STRUCT.pack_into(buf, offset, *self._fields(len(options)))
+        buf[offset + TCP_HEADER_LEN:offset + TCP_HEADER_LEN + len(options)] = \
+                options
+
+    @classmethod
+    def from_bytes(cls, hdr: bytes) -> TCPHeader:
+        """
+        Initialize a TCPHeader from raw byte instance
+        """
+        return cls.unpack_from(hdr)
 
     def to_bytes(self) -> bytes:
         """
         Return bytes of this TCPHeader instance with some defaults. 
         """
-        hdr = b''
-        hdr += struct.pack('!H', self.sport) 
-        hdr += struct.pack('!H', self.dport)
-        hdr += struct.pack('!I', self.seq) 
-        hdr += struct.pack('!I', self.ack)
-        hdr += struct.pack('!H', 0b0101000000000000 | self.flags) # data offset (always 5), reserved (0), ECN (0), and Control Bits
-        hdr += struct.pack('!H', TCP_RECEIVE_WINDOW) # window
-        hdr += struct.pack('!H', self.checksum) 
-        hdr += struct.pack('!H', 0) 
-
-        return hdr
+        options = pack_tcp_options(self.options)
+        return TCP_HEADER_STRUCT.pack(*self._fields(len(options))) + options
 
 
 class ICMPHeader:
@@ -217,24 +387,259 @@ class ICMPHeader:
         return repr(self)
     
     @classmethod
-    def from_bytes(cls, hdr: bytes) -> ICMPHeader:  
+    def unpack_from(cls, buf: bytes, offset: int=0) -> ICMPHeader:
         """
-        Initialize a ICMPHeader from raw byte instance
+        Initialize a ICMPHeader from the ICMP_HEADER_LEN bytes of buf
+        starting at offset, without slicing buf.
         """
-        type, = struct.unpack('!B', hdr[0:1])
-        code, = struct.unpack('!B', hdr[1:2])
-        checksum, = struct.unpack('!H', hdr[2:4])
+        type, code, checksum, _ = ICMP_HEADER_STRUCT.unpack_from(buf, offset)
 
         return cls(type, code, checksum)
 
+    def pack_into(self, buf: bytearray, offset: int=0) -> None:
+        """
+        Write this ICMPHeader into the caller-supplied buffer buf at offset.
+        """
+        ICMP_HEADER_STRUCT.pack_into(buf, offset,
+                self.type, self.code, self.checksum,
+                0) # Unused
+
+    @classmethod
+    def from_bytes(cls, hdr: bytes) -> ICMPHeader:  
+        """
+        Initialize a ICMPHeader from raw byte instance
+        """
+        return cls.unpack_from(hdr)
+
     def to_bytes(self) -> bytes:
         """
         Return bytes of this ICMPHeader instance with some defaults. 
         """
-        hdr = b''
-        hdr += struct.pack('!B', self.type) 
-        hdr += struct.pack('!B', self.code)
-        hdr += struct.pack('!H', self.checksum) 
-        hdr += struct.pack('!I', 0) # Unused
-        
-        return hdr
\ No newline at end of file
+        return ICMP_HEADER_STRUCT.pack(self.type, self.code, self.checksum,
+                0) # Unused
+
+
+class TCPIPHeaderTemplate:
+    """
+    A precomputed IPv4+TCP header for a single connection.  The addresses,
+    ports, TTL and protocol never change within a connection, so they are
+    encoded once; each segment only patches the length, seq, ack, flags and
+    window.
+
+    Attr:
+        template : bytes
+            the TCPIP_HEADER_LEN-byte header with per-segment fields zeroed
+    """
+    def __init__(self, src: str, sport: int, dst: str, dport: int,
+            ttl: int, protocol: int) -> TCPIPHeaderTemplate:
+        hdr = bytearray(TCPIP_HEADER_LEN)
+        IPv4Header(0, ttl, protocol, 0, src, dst).pack_into(hdr)
+        TCPHeader(sport, dport, 0, 0, 0, 0, window=0).pack_into(hdr,
+                IP_HEADER_LEN)
+        self.template = bytes(hdr)
+
+        # checksum contributions of the fixed fields, so that filling in
+        # the checksums only requires summing the per-segment fields and the
+        # payload
+        self._ip_sum = checksum.ones_complement_sum(hdr[:IP_HEADER_LEN])
+        self._tcp_sum = checksum.ones_complement_sum(hdr[IP_HEADER_LEN:],
+                checksum.pseudo_header_sum(hdr[12:16], hdr[16:20],
+                    protocol, 0))
+
+    def build(self, seq: int, ack: int, flags: int,
+            data: bytes | list[bytes]=b'', options: bytes=b'',
+            window: int=TCP_RECEIVE_WINDOW) -> bytes:
+        """
+        Return a complete IP packet for a segment with the given seq, ack,
+        flags, payload and window.  The payload may be a single buffer or a
+        list of buffers (scatter-gather); either way it is copied exactly
+        once.  options are the encoded TCP options (see pack_tcp_options()),
+        if any.
+        """
+        if isinstance(data, list):
+            pieces = data
+        else:
+            pieces = [data]
+        length = TCPIP_HEADER_LEN + len(options) + sum(map(len, pieces))
+        # the template's data offset is 5; options add to it
+        offset_words = (len(options) // 4) << 12
+        hdr = bytearray(self.template)
+        UINT16_STRUCT.pack_into(hdr, 2, length)
+        TCP_SEQ_ACK_FLAGS_STRUCT.pack_into(hdr, IP_HEADER_LEN + 4,
+                seq, ack, 0b0101000000000000 + offset_words | flags, window)
+        if options:
+            hdr += options
+        if checksum.FILL_ON_SEND:
+            UINT16_STRUCT.pack_into(hdr, IP_HEADER_LEN + 16,
+                    ~checksum.ones_complement_sum_vectors(pieces,
+                        self._tcp_sum + length - IP_HEADER_LEN +
+                        (seq >> 16) + (seq & 0xffff) +
+                        (ack >> 16) + (ack & 0xffff) + flags +
+                        offset_words + window +
+                        checksum.ones_complement_sum(options)) & 0xffff)
+            UINT16_STRUCT.pack_into(hdr, checksum.IPV4_CHECKSUM_OFFSET,
+                    checksum.internet_checksum(b'', self._ip_sum + length))
+        return b''.join([hdr, *pieces])
+
+
+class IPv4View:
+    """
+    A lazy, read-only view of the IPv4 header at the start of a packet.
+    Fields are decoded only when they are read, and nothing is copied out of
+    the underlying packet.
+
+    Attr:
+        buf : memoryview
+            the packet, starting with the IPv4 header
+    """
+    __slots__ = ('buf',)
+
+    def __init__(self, pkt: bytes) -> IPv4View:
+        self.buf = memoryview(pkt)
+
+    def __repr__(self) -> str:
+        return f'IPv4View(length={self.length}, ttl={self.ttl}, protcol={self.protocol}, checksum={self.checksum}, src="{self.src}", dst="{self.dst}")'
+
+    @property
+    def header_len(self) -> int:
+        return (self.buf[0] & 0x0f) * 4
+
+    @property
+    def length(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 2)[0]
+
+    @property
+    def ttl(self) -> int:
+        return self.buf[8]
+
+    @property
+    def protocol(self) -> int:
+        return self.buf[9]
+
+    @property
+    def checksum(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 10)[0]
+
+    @property
+    def src(self) -> str:
+        return ip_binary_to_str(self.buf[12:16])
+
+    @property
+    def dst(self) -> str:
+        return ip_binary_to_str(self.buf[16:20])
+
+    @property
+    def payload(self) -> memoryview:
+        """The IP payload (e.g., a TCP segment), excluding any link-layer
+        padding beyond the IP length."""
+        end = self.length
+        if end > len(self.buf):
+            end = len(self.buf)
+        return self.buf[self.header_len:end]
+
+    def to_header(self) -> IPv4Header:
+        return IPv4Header.unpack_from(self.buf)
+
+
+class UDPView:
+    """
+    A lazy, read-only view of the UDP header at the start of a UDP datagram.
+
+    Attr:
+        buf : memoryview
+            the UDP datagram, starting with the UDP header
+    """
+    __slots__ = ('buf',)
+
+    def __init__(self, segment: bytes) -> UDPView:
+        self.buf = memoryview(segment)
+
+    def __repr__(self) -> str:
+        return f'UDPView(sport={self.sport}, dport={self.dport}, length={self.length}, checksum={self.checksum})'
+
+    @property
+    def sport(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 0)[0]
+
+    @property
+    def dport(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 2)[0]
+
+    @property
+    def length(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 4)[0]
+
+    @property
+    def checksum(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 6)[0]
+
+    @property
+    def payload(self) -> memoryview:
+        return self.buf[UDP_HEADER_LEN:]
+
+    def to_header(self) -> UDPHeader:
+        return UDPHeader.unpack_from(self.buf)
+
+
+class TCPView:
+    """
+    A lazy, read-only view of the TCP header at the start of a TCP segment.
+
+    Attr:
+        buf : memoryview
+            the TCP segment, starting with the TCP header
+    """
+    __slots__ = ('buf',)
+
+    def __init__(self, segment: bytes) -> TCPView:
+        self.buf = memoryview(segment)
+
+    def __repr__(self) -> str:
+        return f'TCPView(sport={self.sport}, dport={self.dport}, seq={self.seq}, ack={self.ack}, flags={self.flags}, checksum={self.checksum})'
+
+    @property
+    def sport(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 0)[0]
+
+    @property
+    def dport(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 2)[0]
+
+    @property
+    def seq(self) -> int:
+        return UINT32_STRUCT.unpack_from(self.buf, 4)[0]
+
+    @property
+    def ack(self) -> int:
+        return UINT32_STRUCT.unpack_from(self.buf, 8)[0]
+
+    @property
+    def header_len(self) -> int:
+        return (self.buf[12] >> 4) * 4
+
+    @property
+    def flags(self) -> int:
+        return self.buf[13] & 0b111111
+
+    @property
+    def window(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 14)[0]
+
+    @property
+    def checksum(self) -> int:
+        return UINT16_STRUCT.unpack_from(self.buf, 16)[0]
+
+    @property
+    def options(self) -> dict:
+        """The TCP options, decoded (see unpack_tcp_options())."""
+        header_len = self.header_len
+        if header_len <= TCP_HEADER_LEN:
+            return {}
+        return unpack_tcp_options(self.buf, TCP_HEADER_LEN, header_len)
+
+    @property
+    def payload(self) -> memoryview:
+        return self.buf[self.header_len:]
+
+    def to_header(self) -> TCPHeader:
+        return TCPHeader.unpack_from(self.buf)
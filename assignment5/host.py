@@ -13,8 +13,10 @@ from cougarnet.util import \
         mac_str_to_binary, mac_binary_to_str, \
         ip_str_to_binary, ip_binary_to_str
 
+import checksum
 from forwarding_table import ForwardingTable
-from scapy.all import Ether, IP, ARP
+from headers import IPv4View
+from scapy.all import Ether, ARP
 
 from prefix import ip_str_to_int, ip_prefix, ip_prefix_last_address, ip_int_to_str
 
@@ -66,15 +68,18 @@ class Host(BaseHost):
             intf : str
                 The interface on which it was received
         """
-        eth = Ether(frame)
-        if eth.dst == 'ff:ff:ff:ff:ff:ff' or \
-                eth.dst == self.int_to_info[intf].mac_addr:
+        eth_dst = mac_binary_to_str(frame[:6])
+        eth_type, = struct.unpack_from('!H', frame, 12)
+        if eth_dst == 'ff:ff:ff:ff:ff:ff' or \
+                eth_dst == self.int_to_info[intf].mac_addr:
         # if the frame's MAC destination is this interface or a broadcast address, then process it
             
-            if eth.type == ETH_P_IP:
-                self.handle_ip(bytes(eth.payload), intf)
-            elif eth.type == ETH_P_ARP:
-                self.handle_arp(bytes(eth.payload), intf)
+            if eth_type == ETH_P_IP:
+                # a view of the IP packet, not a copy: it is parsed (and
+                # its payload buffered by the socket) in place
+                self.handle_ip(memoryview(frame)[ETH_HDR_LEN:], intf)
+            elif eth_type == ETH_P_ARP:
+                self.handle_arp(frame[ETH_HDR_LEN:], intf)
         else:
             self.not_my_frame(frame, intf)
         
@@ -87,7 +92,12 @@ class Host(BaseHost):
             pkt: the IP packet received
             intf: the interface on which it was received
         """
-        ip = IP(pkt)
+        if checksum.VERIFY_ON_RECEIVE and not checksum.verify_ipv4_header(pkt):
+            # drop packets with a corrupted IP header
+            return
+
+        ip = IPv4View(pkt)
+        dst = ip.dst
         all_addrs = []
         all_bcast_addrs = []
 
@@ -99,12 +109,13 @@ class Host(BaseHost):
                 all_bcast_addrs.append(bcast_ip)
         
         # Determine if this host is the final destination for the packet, based on the destination IP address
-        if ip.dst == '255.255.255.255' or ip.dst in all_addrs or ip.dst in all_bcast_addrs:
+        if dst == '255.255.255.255' or dst in all_addrs or dst in all_bcast_addrs:
             #  If the packet is destined for this host, based on the tests in the previous bullet, then call another method to handle the payload, depending on the protocol value in the IP header.
-            if ip.proto == IPPROTO_TCP:
+            protocol = ip.protocol
+            if protocol == IPPROTO_TCP:
                 # For type TCP (IPPROTO_TCP = 6), call handle_tcp(), passing the full IP datagram, including header.
                 self.handle_tcp(pkt)
-            elif ip.proto == IPPROTO_UDP:
+            elif protocol == IPPROTO_UDP:
                 # For type UDP (IPPROTO_UDP = 17), call handle_udp(), passing the full IP datagram, including header. 
                 self.handle_udp(pkt)
             # If the protocol is something other than TCP or UDP, ignore it.
@@ -216,17 +227,57 @@ class Host(BaseHost):
             pkt: an IPv4 packet
         """
         print(f'Attempting to send packet:\n{repr(pkt)}')
-        ip = IP(pkt)
-        intf, next_hop = self.forwarding_table.get_entry(ip.dst)
+        dst = IPv4View(pkt).dst
+        intf, next_hop = self.forwarding_table.get_entry(dst)
         if next_hop is None:
             # the case for subnets to when the host is directly connected
-            next_hop = ip.dst
+            next_hop = dst
         if intf is None:
             # there is no matching route, so it should be dropped
             # and an ICMP "network unreachable" will be returned.
             return
         self.send_packet_on_int(pkt, intf, next_hop)
 
+    def send_packets(self, pkts: list[bytes]) -> None:
+        """
+        Send a burst of IPv4 packets (e.g., a window's worth of TCP segments
+        from one socket).  The route and the Ethernet header are determined
+        once per destination, rather than once per packet.
+
+        Args:
+            pkts: a list of IPv4 packets
+        """
+        print(f'Attempting to send {len(pkts)} packets')
+        # destination IP address -> (interface, next hop, Ethernet header)
+        routes = {}
+        for pkt in pkts:
+            dst = IPv4View(pkt).dst
+            route = routes.get(dst)
+            if route is None:
+                intf, next_hop = self.forwarding_table.get_entry(dst)
+                if next_hop is None:
+                    next_hop = dst
+                eth_hdr = None
+                if intf is not None:
+                    if next_hop == self.bcast_for_int(intf=intf):
+                        dmac = 'ff:ff:ff:ff:ff:ff'
+                    else:
+                        dmac = self._arp_table.get(next_hop)
+                    if dmac is not None:
+                        eth_hdr = mac_str_to_binary(dmac) + \
+                                mac_str_to_binary(self.int_to_info[intf].mac_addr) + \
+                                struct.pack('!H', ETH_P_IP)
+                route = routes[dst] = (intf, next_hop, eth_hdr)
+            intf, next_hop, eth_hdr = route
+            if intf is None:
+                # no matching route
+                continue
+            if eth_hdr is None:
+                # the next hop's MAC address is not known yet (ARP)
+                self.send_packet_on_int(pkt, intf, next_hop)
+            else:
+                self.send_frame(eth_hdr + pkt, intf)
+
 
 
     def forward_packet(self, pkt: bytes) -> None:
@@ -236,11 +287,13 @@ class Host(BaseHost):
         Args:
             pkt: the IP packet received
         """
-        ip = IP(pkt)
-        ip.ttl -= 1
-        if ip.ttl <= 0:
+        if pkt[8] <= 1:
             # expired packets should not be forwarded
             return
+        # decrement the TTL in place, fixing up the header checksum
+        # incrementally instead of re-serializing the packet
+        pkt = bytearray(pkt)
+        checksum.decrement_ttl(pkt)
         self.send_packet(bytes(pkt))
 
     def not_my_frame(self, frame: bytes, intf: str) -> None:
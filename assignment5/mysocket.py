@@ -2,8 +2,13 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import hashlib
+import os
 import random
+import time
 
+TCP_FLAGS_FIN = 0x01
 TCP_FLAGS_SYN = 0x02
 TCP_FLAGS_RST = 0x04
 TCP_FLAGS_ACK = 0x10
@@ -20,9 +25,24 @@ TCP_STATE_LAST_ACK = 8
 TCP_STATE_TIME_WAIT = 9
 TCP_STATE_CLOSED = 10
 
+# The states in which a connection has been established (and not yet
+# closed), so that data, ACKs and FINs are handled
+TCP_STATES_SYNCHRONIZED = frozenset((TCP_STATE_ESTABLISHED,
+    TCP_STATE_FIN_WAIT_1, TCP_STATE_FIN_WAIT_2, TCP_STATE_CLOSE_WAIT,
+    TCP_STATE_CLOSING, TCP_STATE_LAST_ACK, TCP_STATE_TIME_WAIT))
+
+import checksum
+import congestion
 from buffer import TCPSendBuffer, TCPReceiveBuffer
+from congestion import TCP_DUP_THRESH
+from timerwheel import TimerWheel
 
 from headers import IPv4Header, UDPHeader, TCPHeader, \
+        IPv4View, UDPView, TCPView, TCPIPHeaderTemplate, \
+        pack_tcp_options, TCP_OPTION_MSS, TCP_OPTION_WSCALE, \
+        TCP_OPTION_SACK_PERMITTED, TCP_OPTION_SACK, TCP_OPTION_TIMESTAMP, \
+        TCP_OPTION_FASTOPEN, TCP_SACK_MAX_BLOCKS, TCP_SACK_MAX_BLOCKS_WITH_TIMESTAMPS, \
+        TCP_WSCALE_MAX, \
         IP_HEADER_LEN, UDP_HEADER_LEN, TCP_HEADER_LEN, \
         TCPIP_HEADER_LEN, UDPIP_HEADER_LEN
 
@@ -32,6 +52,116 @@ IPPROTO_TCP = 6 # Transmission Control Protocol
 IPPROTO_UDP = 17 # User Datagram Protocol
 IPV4_TTL_DEFAULT = 64 # as instructed
 
+# Retransmission timeout (RTO) parameters (RFC 6298).  Times are in seconds.
+TCP_RTO_INITIAL = 1
+TCP_RTO_MIN = 0.2
+TCP_RTO_MAX = 60
+TCP_RTT_ALPHA = 1/8 # gain of the smoothed RTT
+TCP_RTT_BETA = 1/4 # gain of the RTT variation
+TCP_RTO_K = 4 # weight of the RTT variation in the RTO
+
+# With delayed ACKs, an ACK is sent once this many full segments have been
+# received, or TCP_DELAYED_ACK_TIMEOUT seconds after the first of them
+TCP_DELAYED_ACK_SEGMENTS = 2
+TCP_DELAYED_ACK_TIMEOUT = 0.04
+
+# Maximum number of RTT samples kept by each socket
+TCP_RTT_SAMPLES_MAX = 10000
+
+# The largest window a TCP header can hold, before window scaling
+TCP_WINDOW_MAX = 65535
+
+# The default size of the receive buffer: the most data received but not yet
+# read by the application, which bounds the window advertised.  A larger
+# buffer is advertised with window scaling.
+TCP_RECEIVE_BUFFER_SIZE = TCP_WINDOW_MAX
+
+# The default time (in seconds) that a connection closed actively stays in
+# TIME_WAIT (2 * MSL, as in Linux)
+TCP_TIME_WAIT = 60
+
+# The default number of half-open connections (SYN received and SYNACK sent,
+# but no final ACK yet) that a listener keeps in its SYN queue, and the time
+# (in seconds) after which one may be dropped to make room for another.  The
+# SYNACK is not retransmitted, so this is the time the client has to answer.
+TCP_SYN_BACKLOG = 128
+TCP_SYN_RECEIVED_TIMEOUT = 3
+
+# SYN cookies.  A cookie is an ISN of 31 bits (sequence numbers do not wrap
+# around here, so the top bit is left clear): a 5-bit counter that advances
+# every TCP_SYN_COOKIE_PERIOD seconds, a 3-bit index in TCP_SYN_COOKIE_MSS,
+# and a 23-bit keyed hash of the connection's addresses and ports, the
+# client's ISN, the index and the full count of periods (not just the
+# counter, so that a cookie does not become valid again when the counter
+# wraps around).  A cookie is valid for TCP_SYN_COOKIE_MAX_AGE periods.
+TCP_SYN_COOKIE_PERIOD = 64
+TCP_SYN_COOKIE_MAX_AGE = 2
+TCP_SYN_COOKIE_MSS = (536, 1000, 1220, 1300, 1380, 1440, 1460, 8960)
+
+# A half-open connection in a listener's SYN queue:
+#   isn: our ISN, sent in the SYNACK
+#   seq: the ISN of the remote side
+#   window: the window advertised in the SYN
+#   options: the options of the SYN (a dict, see TCPView.options)
+#   time: when the SYN was received (time.monotonic())
+SynRequest = collections.namedtuple('SynRequest',
+        ('isn', 'seq', 'window', 'options', 'time'))
+
+# With pacing, the maximum number of segments sent back to back to make up
+# for timer lateness
+TCP_PACING_BURST = 2
+
+# With pacing= (and a congestion control that sets no pacing rate of its
+# own), segments are paced at cwnd / srtt times a gain: that of slow start
+# while cwnd is below half ssthresh, and that of congestion avoidance after
+# (as in Linux), so that cwnd can still grow
+TCP_PACING_GAIN_SLOW_START = 2
+TCP_PACING_GAIN_CONGESTION_AVOIDANCE = 1.2
+
+# The MSS assumed for a remote side that does not advertise one (RFC 9293)
+TCP_MSS_DEFAULT = 536
+
+# The length of a TCP Fast Open cookie (RFC 7413), in bytes
+TCP_FAST_OPEN_COOKIE_LEN = 8
+
+# A snapshot of a connection (see TCPSocket.get_info()), like Linux's
+# struct tcp_info.  Sizes are in bytes, times in seconds, and rates in
+# bytes/second:
+#   state: TCP_STATE_LISTEN, TCP_STATE_CLOSED, etc.
+#   mss, cwnd, ssthresh: the MSS, congestion window and slow start threshold
+#   rwnd: the window last advertised by the remote side
+#   srtt, rttvar: the smoothed RTT and RTT variation (None before the first
+#       RTT sample)
+#   rto: the retransmission timeout, backoff included
+#   bytes_in_flight: the bytes sent and presumed still in the network
+#   bytes_sacked, bytes_lost: the bytes outstanding that have been
+#       selectively acknowledged, and that are presumed lost (and not yet
+#       retransmitted)
+#   retransmits, bytes_retransmitted: the segments (FINs included) and bytes
+#       retransmitted in all
+#   timeouts: the number of times the retransmission timer has expired
+#   dup_acks: the number of duplicate ACKs in a row just received
+#   dup_acks_received: the number of duplicate ACKs received in all
+#   in_recovery: whether the congestion control is in fast recovery
+#   delivery_rate: the delivery rate of the last rate sample (None before
+#       the first)
+#   app_limited: whether that sample was application-limited
+#   delivered: the bytes delivered (acknowledged cumulatively or
+#       selectively) in all
+#   send_buffer_bytes: the bytes in the send buffer (not yet acknowledged)
+#   send_buffer_unsent: the bytes of those not yet sent
+#   receive_buffer_bytes: the bytes received out of order, waiting for a
+#       hole to be filled
+#   ready_buffer_bytes: the bytes received that the application has not read
+#   pacing_rate: the pacing rate last used (None if unpaced)
+TCPInfo = collections.namedtuple('TCPInfo',
+        ('state', 'mss', 'cwnd', 'ssthresh', 'rwnd', 'srtt', 'rttvar', 'rto',
+            'bytes_in_flight', 'bytes_sacked', 'bytes_lost', 'retransmits',
+            'bytes_retransmitted', 'timeouts', 'dup_acks',
+            'dup_acks_received', 'in_recovery', 'delivery_rate',
+            'app_limited', 'delivered', 'send_buffer_bytes',
+            'send_buffer_unsent', 'receive_buffer_bytes',
+            'ready_buffer_bytes', 'pacing_rate'))
 
 
 class UDPSocket:
@@ -57,10 +187,10 @@ class UDPSocket:
         IP address and port it came from, and notifies the application that 
         there's data to be read.
         """
-        # parse the packet
-        ipv4_header = IPv4Header.from_bytes(pkt[:IP_HEADER_LEN])
-        udp_header = UDPHeader.from_bytes(pkt[IP_HEADER_LEN:UDPIP_HEADER_LEN])
-        data = pkt[UDPIP_HEADER_LEN:]
+        # parse the packet without copying it
+        ipv4_header = IPv4View(pkt)
+        udp_header = UDPView(ipv4_header.payload)
+        data = udp_header.payload
 
         # (data, address, port) address and port should be where it came from
         self.buffer.append((data, ipv4_header.src, udp_header.sport))
@@ -85,7 +215,10 @@ class UDPSocket:
             length=UDP_HEADER_LEN+len(data), 
             checksum=0
         )
-        return ip_header.to_bytes() + udp_header.to_bytes() + data
+        pkt = ip_header.to_bytes() + udp_header.to_bytes() + data
+        if checksum.FILL_ON_SEND:
+            pkt = checksum.fill_packet(pkt)
+        return pkt
 
     def send_packet(self, remote_addr: str, remote_port: int,
             data: bytes) -> None:
@@ -104,7 +237,8 @@ class UDPSocket:
         Called by the application to receieve data. Returns the
         contents of the earliest recieved UDP datagram that has not been read
         """
-        return self.buffer.pop(0)
+        data, addr, port = self.buffer.pop(0)
+        return bytes(data), addr, port
 
     def sendto(self, data: bytes, remote_addr: str, remote_port: int) -> None:
         """Called by the application to send data."""
@@ -123,7 +257,16 @@ class TCPListenerSocket(TCPSocketBase):
             socket_cls: type=None,
             fast_retransmit: bool=False, initial_cwnd: int=1000,
             mss: int=1000,
-            congestion_control: str='none') -> TCPListenerSocket:
+            congestion_control: str='none',
+            scatter_gather: bool=False, sack: bool=False,
+            delayed_ack: bool=False, nagle: bool=False,
+            receive_buffer_size: int=TCP_RECEIVE_BUFFER_SIZE,
+            timestamps: bool=False, timer_wheel: TimerWheel=None,
+            time_wait: float=TCP_TIME_WAIT,
+            remove_socket_func: callable=None, pacing: bool=False,
+            fast_open: bool=False, fast_open_cookies: dict=None,
+            syn_backlog: int=TCP_SYN_BACKLOG, syn_cookies: bool=False,
+            send_ip_packets_func: callable=None) -> TCPListenerSocket:
 
         # These are all vars that are saved away for instantiation of TCPSocket
         # objects when new connections are created.
@@ -141,45 +284,319 @@ class TCPListenerSocket(TCPSocketBase):
         self._initial_cwnd = initial_cwnd
         self._mss = mss
         self._congestion_control = congestion_control
+        self._scatter_gather = scatter_gather
+        self._sack = sack
+        self._delayed_ack = delayed_ack
+        self._nagle = nagle
+        self._receive_buffer_size = receive_buffer_size
+        self._timestamps = timestamps
+        self._timer_wheel = timer_wheel
+        self._time_wait = time_wait
+        self._remove_socket_func = remove_socket_func
+        self._pacing = pacing
+        self._fast_open = fast_open
+        self._fast_open_cookies = fast_open_cookies
+        self._send_ip_packets_func = send_ip_packets_func
+
+        # The SYN queue: the half-open connections (SynRequest instances),
+        # by remote address and port, oldest first.  No socket is created
+        # until the final ACK of the handshake arrives.  Once syn_backlog
+        # connections are half-open, further SYNs are dropped or, if
+        # syn_cookies is set, answered with a SYN cookie as our ISN, which
+        # keeps no state at all: the final ACK brings it back.
+        self._syn_queue = collections.OrderedDict()
+        self._syn_backlog = syn_backlog
+        self._syn_cookies = syn_cookies
+        self._syn_cookie_secret = os.urandom(16)
+        self._wscale_offer = TCPSocket.window_scale(receive_buffer_size)
+
+        # TCP Fast Open (RFC 7413): with fast_open set, a SYN asking for a
+        # cookie gets one in the SYNACK, and a SYN with a valid cookie gets
+        # a socket right away, which takes the data in the SYN and may
+        # answer before the handshake completes.  A SYN with an invalid
+        # cookie is handled as if it had none: its data is left to be
+        # retransmitted, and the SYNACK carries a valid cookie.
+        self._fast_open_secret = os.urandom(16)
+
+        # The number of SYNs dropped with the SYN queue full, and the number
+        # of SYN cookies sent and accepted; the number of SYNs accepted with
+        # a Fast Open cookie, and with an invalid one
+        self.syn_dropped = 0
+        self.syn_cookies_sent = 0
+        self.syn_cookies_accepted = 0
+        self.fast_open_accepted = 0
+        self.fast_open_rejected = 0
 
     def handle_packet(self, pkt: bytes) -> None:
         """
-        On new TCP connection request, instantiate new TCPSocket with a tuple
-        that uniquely maps to its own TCPSocket instance and has state of LISTEN.
-        Then, call handle_packet() on that newly created socket.
+        On new TCP connection request, answer with a SYNACK, keeping the
+        half-open connection in the SYN queue (or in a SYN cookie).  When
+        the final ACK arrives, instantiate new TCPSocket with a tuple that
+        uniquely maps to its own TCPSocket instance, and call handle_packet()
+        on that newly created socket with the ACK.
         """
-        ip_hdr = IPv4Header.from_bytes(pkt[:IP_HEADER_LEN])
-        tcp_hdr = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
-        data = pkt[TCPIP_HEADER_LEN:]
+        ip_hdr = IPv4View(pkt)
+        tcp_hdr = TCPView(ip_hdr.payload)
 
         if tcp_hdr.flags & TCP_FLAGS_SYN:
-            sock = self._socket_cls(self._local_addr, self._local_port,
-                    ip_hdr.src, tcp_hdr.sport,
-                    TCP_STATE_LISTEN,
-                    send_ip_packet_func=self._send_ip_packet_func,
-                    notify_on_data_func=self._notify_on_data_func,
-                    fast_retransmit=self._fast_retransmit,
-                    initial_cwnd=self._initial_cwnd, mss=self._mss,
-                    congestion_control=self._congestion_control)
-
-            self._handle_new_client(self._local_addr, self._local_port,
-                    ip_hdr.src, tcp_hdr.sport, sock)
-
-            sock.handle_packet(pkt)
-        else:
+            if not tcp_hdr.flags & TCP_FLAGS_ACK:
+                self.handle_syn(ip_hdr, tcp_hdr)
+        elif tcp_hdr.flags & TCP_FLAGS_RST:
+            # the remote side has aborted a half-open connection
+            self._syn_queue.pop((ip_hdr.src, tcp_hdr.sport), None)
+        elif not (tcp_hdr.flags & TCP_FLAGS_ACK and
+                self.handle_ack(pkt, ip_hdr, tcp_hdr)):
             # when a TCP packet reaches a socket in the LISTEN state,
-            # but the packet does not have the SYN flag set, 
-            # return a TCP packet with only the RST flag set.
-            sock.send_reset_packet(pkt)
+            # but the packet does not have the SYN flag set (or is not the
+            # final ACK of a handshake), return a TCP packet with only the
+            # RST flag set (such as for a connection that has since been
+            # closed).
+            self._send_ip_packet_func(TCPSocket.create_packet(
+                self._local_addr, self._local_port, ip_hdr.src, tcp_hdr.sport,
+                seq=tcp_hdr.ack, ack=0, flags=TCP_FLAGS_RST))
+
+    def handle_syn(self, ip_hdr: IPv4View, tcp_hdr: TCPView) -> None:
+        """
+        Answer a SYN with a SYNACK, adding the half-open connection to the
+        SYN queue (unless it is a retransmission of a SYN already queued).
+        If the queue is full, even once expired entries are dropped, send a
+        SYN cookie instead, or drop the SYN.
+        """
+        key = (ip_hdr.src, tcp_hdr.sport)
+        now = time.monotonic()
+        if self._fast_open and \
+                (cookie := tcp_hdr.options.get(TCP_OPTION_FASTOPEN)):
+            if cookie == self.fast_open_cookie(ip_hdr.src):
+                self._syn_queue.pop(key, None)
+                self.fast_open_accepted += 1
+                self.accept_fast_open(ip_hdr, tcp_hdr)
+                return
+            self.fast_open_rejected += 1
+        request = self._syn_queue.get(key)
+        if request is None or request.seq != tcp_hdr.seq:
+            self._syn_queue.pop(key, None)
+            while self._syn_queue and len(self._syn_queue) >= \
+                    self._syn_backlog:
+                oldest = next(iter(self._syn_queue.values()))
+                if now - oldest.time < TCP_SYN_RECEIVED_TIMEOUT:
+                    break
+                self._syn_queue.popitem(last=False)
+            if len(self._syn_queue) < self._syn_backlog:
+                request = SynRequest(random.randint(0, 65535), tcp_hdr.seq,
+                        tcp_hdr.window, tcp_hdr.options, now)
+                self._syn_queue[key] = request
+            elif self._syn_cookies:
+                self.syn_cookies_sent += 1
+                self.send_synack(ip_hdr.src, tcp_hdr.sport,
+                        self.syn_cookie(ip_hdr.src, tcp_hdr.sport,
+                            tcp_hdr.seq, tcp_hdr.options), tcp_hdr.seq,
+                        {TCP_OPTION_MSS: self._mss})
+                return
+            else:
+                self.syn_dropped += 1
+                return
+        self.send_synack(ip_hdr.src, tcp_hdr.sport, request.isn, request.seq,
+                self.synack_options(request.options, ip_hdr.src))
+
+    def handle_ack(self, pkt: bytes, ip_hdr: IPv4View,
+            tcp_hdr: TCPView) -> bool:
+        """
+        Handle what may be the final ACK of a handshake: if it acknowledges
+        the SYNACK of a half-open connection in the SYN queue, or a valid
+        SYN cookie, create the socket for the connection, and pass it the
+        ACK.  Return whether it did.
+
+        The final ACK itself may be lost, and data sent after it too, so for
+        a connection in the SYN queue, any segment within the window that
+        the SYNACK offered will do.  A SYN cookie only checks out with the
+        sequence number of the final ACK.
+        """
+        key = (ip_hdr.src, tcp_hdr.sport)
+        request = self._syn_queue.get(key)
+        if request is not None and tcp_hdr.ack == request.isn + 1 and \
+                request.seq < tcp_hdr.seq <= request.seq + \
+                    min(self._receive_buffer_size, TCP_WINDOW_MAX):
+            del self._syn_queue[key]
+        elif self._syn_cookies and (mss := self.check_syn_cookie(ip_hdr.src,
+                tcp_hdr.sport, tcp_hdr.ack - 1, tcp_hdr.seq - 1)) is not None:
+            # the cookie holds the MSS; without the rest of the options, the
+            # connection does without them
+            self.syn_cookies_accepted += 1
+            request = SynRequest(tcp_hdr.ack - 1, tcp_hdr.seq - 1,
+                    tcp_hdr.window, {TCP_OPTION_MSS: mss}, None)
+        else:
+            return False
+
+        sock = self.create_socket(ip_hdr.src, tcp_hdr.sport, request)
+        self._handle_new_client(self._local_addr, self._local_port,
+                ip_hdr.src, tcp_hdr.sport, sock)
+
+        sock.handle_packet(pkt)
+        return True
+
+    def accept_fast_open(self, ip_hdr: IPv4View, tcp_hdr: TCPView) -> None:
+        """
+        Accept a SYN with a valid Fast Open cookie: create the socket for
+        the connection, give it the data in the SYN, and answer with a
+        SYNACK that acknowledges the data.  The application is told of the
+        data once it has the socket.
+        """
+        request = SynRequest(random.randint(0, 65535), tcp_hdr.seq,
+                tcp_hdr.window, tcp_hdr.options, time.monotonic())
+        sock = self.create_socket(ip_hdr.src, tcp_hdr.sport, request)
+        sock.accept_syn_data(tcp_hdr.payload)
+        sock.send_packet(seq=sock.base_seq_self, ack=sock.ack,
+                flags=TCP_FLAGS_SYN | TCP_FLAGS_ACK,
+                options=self.synack_options(request.options, ip_hdr.src))
+        self._handle_new_client(self._local_addr, self._local_port,
+                ip_hdr.src, tcp_hdr.sport, sock)
+        if sock.ready_buffer_size:
+            sock._notify_on_data()
+
+    def create_socket(self, remote_addr: str, remote_port: int,
+            request: SynRequest) -> TCPSocket:
+        """
+        Create the socket for a connection whose SYN (request) has been
+        answered, in SYN_RECEIVED.
+        """
+        sock = self._socket_cls(self._local_addr, self._local_port,
+                remote_addr, remote_port,
+                TCP_STATE_LISTEN,
+                send_ip_packet_func=self._send_ip_packet_func,
+                notify_on_data_func=self._notify_on_data_func,
+                fast_retransmit=self._fast_retransmit,
+                initial_cwnd=self._initial_cwnd, mss=self._mss,
+                congestion_control=self._congestion_control,
+                scatter_gather=self._scatter_gather, sack=self._sack,
+                delayed_ack=self._delayed_ack, nagle=self._nagle,
+                receive_buffer_size=self._receive_buffer_size,
+                timestamps=self._timestamps,
+                timer_wheel=self._timer_wheel,
+                time_wait=self._time_wait,
+                remove_socket_func=self._remove_socket_func,
+                pacing=self._pacing, fast_open=self._fast_open,
+                fast_open_cookies=self._fast_open_cookies,
+                send_ip_packets_func=self._send_ip_packets_func)
+        sock.accept_syn(request.isn, request.seq, request.window,
+                request.options)
+        return sock
+
+    def synack_options(self, options: dict, remote_addr: str) -> bytes:
+        """
+        Return the encoded options for a SYNACK answering a SYN from
+        remote_addr with the given options: the same as the socket for the
+        connection would send (see TCPSocket.syn_options()), and a Fast Open
+        cookie if the SYN asked for one (or had one).
+        """
+        synack = {TCP_OPTION_MSS: self._mss}
+        if TCP_OPTION_WSCALE in options:
+            synack[TCP_OPTION_WSCALE] = self._wscale_offer
+        if self._sack and TCP_OPTION_SACK_PERMITTED in options:
+            synack[TCP_OPTION_SACK_PERMITTED] = True
+        if self._timestamps and TCP_OPTION_TIMESTAMP in options:
+            synack[TCP_OPTION_TIMESTAMP] = (TCPSocket.tsval(),
+                    options[TCP_OPTION_TIMESTAMP][0])
+        if self._fast_open and TCP_OPTION_FASTOPEN in options:
+            # a new cookie, or the same one again
+            synack[TCP_OPTION_FASTOPEN] = self.fast_open_cookie(remote_addr)
+        return pack_tcp_options(synack)
+
+    def send_synack(self, remote_addr: str, remote_port: int, isn: int,
+            seq: int, options: bytes | dict) -> None:
+        """
+        Send a SYNACK with our ISN isn, acknowledging the SYN of the remote
+        side, whose ISN is seq.  options are the encoded TCP options, or a
+        dict of them.
+        """
+        if isinstance(options, dict):
+            options = pack_tcp_options(options)
+        template = TCPIPHeaderTemplate(src=self._local_addr,
+                sport=self._local_port, dst=remote_addr, dport=remote_port,
+                ttl=IPV4_TTL_DEFAULT, protocol=IPPROTO_TCP)
+        self._send_ip_packet_func(template.build(isn, seq + 1,
+            TCP_FLAGS_SYN | TCP_FLAGS_ACK, b'', options,
+            min(self._receive_buffer_size, TCP_WINDOW_MAX)))
+
+    def fast_open_cookie(self, remote_addr: str) -> bytes:
+        """
+        Return the Fast Open cookie for remote_addr: a keyed hash of the
+        address, which only we can compute.
+        """
+        return hashlib.blake2b(remote_addr.encode(),
+                digest_size=TCP_FAST_OPEN_COOKIE_LEN,
+                key=self._fast_open_secret).digest()
+
+    def syn_cookie_hash(self, remote_addr: str, remote_port: int, seq: int,
+            period: int, index: int) -> int:
+        """
+        Return the 23-bit hash of a SYN cookie for a connection from the
+        given remote address and port, whose ISN is seq, made in the given
+        period and encoding the given MSS index, keyed with our secret.
+        """
+        data = f'{self._local_addr}:{self._local_port}:' + \
+                f'{remote_addr}:{remote_port}:{seq}:{period}:{index}'
+        digest = hashlib.blake2b(data.encode(), digest_size=3,
+                key=self._syn_cookie_secret).digest()
+        return int.from_bytes(digest, 'big') & 0x7fffff
+
+    def syn_cookie(self, remote_addr: str, remote_port: int, seq: int,
+            options: dict) -> int:
+        """
+        Return a SYN cookie (our ISN) for a SYN from the given remote address
+        and port, whose ISN is seq, encoding the largest MSS in
+        TCP_SYN_COOKIE_MSS that its options allow.
+        """
+        mss = options.get(TCP_OPTION_MSS, TCP_SYN_COOKIE_MSS[0])
+        index = 0
+        while index + 1 < len(TCP_SYN_COOKIE_MSS) and \
+                TCP_SYN_COOKIE_MSS[index + 1] <= mss:
+            index += 1
+        period = int(time.monotonic() / TCP_SYN_COOKIE_PERIOD)
+        return (period & 0x1f) << 26 | index << 23 | \
+                self.syn_cookie_hash(remote_addr, remote_port, seq, period,
+                        index)
+
+    def check_syn_cookie(self, remote_addr: str, remote_port: int,
+            cookie: int, seq: int) -> int:
+        """
+        Check a SYN cookie acknowledged by a connection from the given
+        remote address and port, whose ISN is seq.  Return the MSS it
+        encodes, or None if it is not valid (forged, or too old).
+        """
+        period = int(time.monotonic() / TCP_SYN_COOKIE_PERIOD)
+        age = (period - (cookie >> 26)) & 0x1f
+        index = cookie >> 23 & 0x7
+        if cookie >> 31 or age >= TCP_SYN_COOKIE_MAX_AGE or \
+                cookie & 0x7fffff != self.syn_cookie_hash(remote_addr,
+                    remote_port, seq, period - age, index):
+            return None
+        return TCP_SYN_COOKIE_MSS[index]
 
 class TCPSocket(TCPSocketBase):
+    """
+    One end of a TCP connection.
+
+    fast_retransmit sets whether the third duplicate ACK triggers a fast
+    retransmit; without it, loss is only found by a timeout (or, with sack,
+    by the SACK scoreboard).  Fast recovery comes after a fast retransmit,
+    so a congestion_control algorithm with fast recovery ('reno',
+    'newreno' and 'cubic') turns fast_retransmit on.
+    """
     def __init__(self, local_addr: str, local_port: int,
             remote_addr: str, remote_port: int, state: int,
             send_ip_packet_func: callable,
             notify_on_data_func: callable,
             fast_retransmit: bool=False, initial_cwnd: int=1000,
             mss: int=1000,
-            congestion_control: str='none') -> TCPSocket:
+            congestion_control: str='none',
+            scatter_gather: bool=False, sack: bool=False,
+            delayed_ack: bool=False, nagle: bool=False,
+            receive_buffer_size: int=TCP_RECEIVE_BUFFER_SIZE,
+            timestamps: bool=False, timer_wheel: TimerWheel=None,
+            time_wait: float=TCP_TIME_WAIT,
+            remove_socket_func: callable=None, pacing: bool=False,
+            fast_open: bool=False, fast_open_cookies: dict=None,
+            send_ip_packets_func: callable=None) -> TCPSocket:
 
         # The local/remote address/port information associated with this
         # TCPConnection
@@ -193,8 +610,24 @@ class TCPSocket(TCPSocketBase):
 
         # Helpful methods for helping us send IP packets and
         # notifying the application that we have received data.
+        # send_ip_packets_func, if given, sends a list of IP packets (a burst
+        # of segments) in one call.
         self._send_ip_packet = send_ip_packet_func
+        self._send_ip_packets = send_ip_packets_func
         self._notify_on_data = notify_on_data_func
+        # remove_socket_func, if given, is called with the same arguments as
+        # the function that installed the socket (its addresses and ports,
+        # and the socket), once the connection is closed.
+        self._remove_socket = remove_socket_func
+        # _notify_on_send, if set by the application (see streams.py), is
+        # called whenever the sending side changes: when the connection is
+        # established, when data (or our FIN) is acknowledged, making room
+        # in the send buffer, and when the connection is closed (on both
+        # sides, or for good).
+        self._notify_on_send = None
+        # probe, if set by the application (see probe.TCPProbe), records the
+        # state of the connection after every ACK handled.
+        self.probe = None
 
         # Base sequence number
         self.base_seq_self = self.initialize_seq()
@@ -214,36 +647,186 @@ class TCPSocket(TCPSocketBase):
         self.ssthresh = 64000
 
         # The maximum segment size (MSS), which represents the maximum number
-        # of bytes that may be transmitted in a single TCP segment.
+        # of bytes that may be transmitted in a single TCP segment.  It is
+        # advertised in the SYN, and lowered to the remote side's MSS.
         self.mss = mss
 
         # The congestion window (cwnd), which represents the total number of
         # bytes that may be outstanding (unacknowledged) at one time
         self.cwnd = initial_cwnd
-        self.cwnd_inc = self.cwnd
 
+        # The congestion control algorithm (see congestion.py), which adjusts
+        # cwnd and ssthresh
         self.congestion_control = congestion_control
+        self.congestion = congestion.create(congestion_control, self)
+
+        # Whether the send buffer holds references to the application's
+        # buffers instead of copies (scatter-gather).  If so, the application
+        # must not modify a buffer passed to send() until it is acknowledged.
+        self.scatter_gather = scatter_gather
+
+        # Whether selective acknowledgments (SACK) are used: if so, ACKs
+        # advertise the blocks received out of order, and the sender
+        # retransmits only the holes between the blocks it is told about.
+        # SACK is permitted in the SYN, and only used if both sides permit
+        # it.
+        self.sack = sack
+
+        # Whether timestamps (RFC 7323) are used: if so (and the remote side
+        # uses them too), every segment carries the time it was sent (in
+        # milliseconds), and echoes ts_recent, the timestamp of the segment
+        # last acknowledged, from which every ACK yields an RTT sample.
+        # last_ack_sent is the acknowledgment number last sent.
+        self.timestamps = timestamps
+        self.ts_recent = 0
+        self.last_ack_sent = None
+
+        # Whether ACKs for in-order data are delayed, so that one ACK covers
+        # TCP_DELAYED_ACK_SEGMENTS full segments (or is sent when ack_timer
+        # expires).  Either way, an ACK that is pending when the application
+        # sends data is piggybacked on the data.  ack_pending_bytes is the
+        # number of bytes received but not yet acknowledged.
+        self.delayed_ack = delayed_ack
+        self.ack_pending = False
+        self.ack_pending_bytes = 0
+        self.ack_timer = None
+
+        # Whether a segment smaller than the MSS is held back while any data
+        # is outstanding (Nagle's algorithm), or held back until uncork() is
+        # called (corked).
+        self.nagle = nagle
+        self.corked = False
 
         # Send, receive, and ready buffers.  The send buffer is initialized
         # with our base sequence number.  The receive buffer is initialized
         # with the base sequence number of the remote side.  The ready buffer
-        # is what is tapped into when recv() is called on the socket.
-        self.send_buffer = TCPSendBuffer(self.base_seq_self + 1) 
+        # is what is tapped into when recv() is called on the socket; it
+        # holds the received data as a queue of chunks, with
+        # ready_buffer_size bytes in total.
+        self.send_buffer = TCPSendBuffer(self.base_seq_self + 1,
+                copy=not self.scatter_gather)
         self.receive_buffer = None
-        self.ready_buffer = b''
-
-        # The number of duplicate acknowledgments
+        self.ready_buffer = collections.deque()
+        self.ready_buffer_size = 0
+
+        # Flow control.  The window advertised to the remote side is the
+        # free space in receive_buffer_size, less the data in the ready
+        # buffer; _rcv_wnd_edge is the sequence number after the last byte
+        # it allows (None until advertised).  rwnd is the window advertised
+        # by the remote side, and max_rwnd the largest it has advertised.
+        # While rwnd keeps new data from being sent, persist_timer (Event
+        # instance or None) sends window probes, backing off by
+        # persist_backoff.
+        self.receive_buffer_size = receive_buffer_size
+        self._rcv_wnd_edge = None
+        self.rwnd = TCP_WINDOW_MAX
+        self.max_rwnd = self.rwnd
+        self.persist_timer = None
+        self.persist_backoff = 1
+
+        # Window scaling (RFC 7323), which is always offered, and used if
+        # both sides offer it: the windows advertised are then shifted right
+        # by rcv_wscale, and those received shifted left by snd_wscale.  The
+        # shift offered is the least that fits receive_buffer_size in a TCP
+        # header.
+        self.window_scaling = True
+        self.rcv_wscale = 0
+        self.snd_wscale = 0
+        self._wscale_offer = self.window_scale(receive_buffer_size)
+
+        # The number of duplicate acknowledgments in a row, and the last
+        # acknowledgment number received
         self.num_dup_acks = 0
-        self.last_ack = 0
-
-        # Timeout duration in seconds
-        self.timeout = 1
+        self.last_ack = None
+
+        # Counters, for get_info(): the duplicate ACKs received, the
+        # segments (including FINs) and bytes retransmitted, and the number
+        # of times the retransmission timer has expired
+        self.dup_acks_received = 0
+        self.retransmits = 0
+        self.bytes_retransmitted = 0
+        self.timeouts = 0
+
+        # Retransmission timeout (RTO) in seconds.  It is computed from the
+        # smoothed RTT (srtt) and the RTT variation (rttvar), and multiplied
+        # by rto_backoff, which doubles with each consecutive timeout.
+        self.timeout = TCP_RTO_INITIAL
+        self.srtt = None
+        self.rttvar = None
+        self.rto_backoff = 1
+
+        # One segment at a time is timed: the one ending at _rtt_seq, sent at
+        # _rtt_time.  Per Karn's rule, the measurement is abandoned if a
+        # segment is retransmitted before it is acknowledged.
+        self._rtt_seq = None
+        self._rtt_time = None
+
+        # The RTT samples taken, as (time, rtt) tuples, oldest first
+        self.rtt_samples = collections.deque(maxlen=TCP_RTT_SAMPLES_MAX)
+
+        # The delivery rate sample (see buffer.RateSample) taken from the ACK
+        # being handled, or None if it yielded none, and the last one taken
+        self.rate_sample = None
+        self.last_rate_sample = None
+
+        # If the congestion control sets a pacing rate, or pacing is set (see
+        # current_pacing_rate()), segments are sent no earlier than
+        # _pacing_next, and _pacing_timer (Event instance or None) sends the
+        # next one when it is due.  It is always on the event loop, as pacing
+        # needs a finer resolution than a timer wheel's.  pacing_rate is the
+        # rate (bytes/second) last used (None if unpaced), and
+        # pacing_rate_samples the rates used, as (time, rate) tuples, oldest
+        # first, one per change.
+        self.pacing = pacing
+        self._pacing_next = 0
+        self._pacing_timer = None
+        self.pacing_rate = None
+        self.pacing_rate_samples = collections.deque(
+                maxlen=TCP_RTT_SAMPLES_MAX)
 
         # Active time instance (Event instance or None)
         self.timer = None
 
-        # Whether or not we support fast_retransmit (boolean)
-        self.fast_retransmit = fast_retransmit
+        # Connection teardown.  fin_seq is the sequence number of the FIN we
+        # have sent (None until close() is called and all the data buffered
+        # has been sent), and fin_acked whether it has been acknowledged.
+        # fin_received is whether the remote side has closed its side (after
+        # which recv() returns b'' once the ready buffer is empty).  A
+        # connection closed actively stays in TIME_WAIT for time_wait
+        # seconds, timed by time_wait_timer (Event instance or None).
+        # close_pending is whether close() was called in SYN_RECEIVED, to
+        # be carried out once the connection is established.
+        self.fin_seq = None
+        self.fin_acked = False
+        self.fin_received = False
+        self.close_pending = False
+        self.time_wait = time_wait
+        self.time_wait_timer = None
+
+        # The timer wheel (timerwheel.TimerWheel instance) that the
+        # retransmission, delayed ACK, persist and TIME_WAIT timers are
+        # scheduled on, typically shared by all the sockets of a host, or
+        # None to schedule them on the event loop
+        self.timer_wheel = timer_wheel
+
+        # Whether TCP Fast Open (RFC 7413) is used: if so, a client sends
+        # the first data in its SYN, if it has a cookie from the server,
+        # cached in fast_open_cookies (typically shared by the sockets of a
+        # host), which maps the server's address to a (cookie, MSS) tuple;
+        # if not, it asks for a cookie.  A server (see TCPListenerSocket)
+        # that accepts the data may answer before the handshake completes.
+        self.fast_open = fast_open
+        self.fast_open_cookies = fast_open_cookies if fast_open_cookies \
+                is not None else {}
+
+        # Whether or not we support fast_retransmit (boolean); fast recovery
+        # depends on it
+        self.fast_retransmit = fast_retransmit or \
+                self.congestion.fast_recovery
+
+        # Precomputed IPv4+TCP header for this connection (created on first
+        # use)
+        self._header_template = None
 
 
     @classmethod
@@ -253,16 +836,37 @@ class TCPSocket(TCPSocketBase):
             notify_on_data_func: callable,
             fast_retransmit: bool=False, initial_cwnd: int=1000,
             mss: int=1000,
-            congestion_control: str='none') -> TCPSocketBase:
+            congestion_control: str='none',
+            scatter_gather: bool=False, sack: bool=False,
+            delayed_ack: bool=False, nagle: bool=False,
+            receive_buffer_size: int=TCP_RECEIVE_BUFFER_SIZE,
+            timestamps: bool=False, timer_wheel: TimerWheel=None,
+            time_wait: float=TCP_TIME_WAIT,
+            remove_socket_func: callable=None, pacing: bool=False,
+            fast_open: bool=False, fast_open_cookies: dict=None,
+            send_ip_packets_func: callable=None) -> TCPSocketBase:
         sock = cls(local_addr, local_port,
                 remote_addr, remote_port,
                 TCP_STATE_CLOSED,
                 send_ip_packet_func, notify_on_data_func,
                 fast_retransmit=fast_retransmit,
                 initial_cwnd=initial_cwnd, mss=mss,
-                congestion_control=congestion_control)
-
-        sock.initiate_connection()
+                congestion_control=congestion_control,
+                scatter_gather=scatter_gather, sack=sack,
+                delayed_ack=delayed_ack, nagle=nagle,
+                receive_buffer_size=receive_buffer_size,
+                timestamps=timestamps, timer_wheel=timer_wheel,
+                time_wait=time_wait, remove_socket_func=remove_socket_func,
+                pacing=pacing, fast_open=fast_open,
+                fast_open_cookies=fast_open_cookies,
+                send_ip_packets_func=send_ip_packets_func)
+
+        if fast_open:
+            # the SYN goes out once the caller has had the chance to send()
+            # the data that it is to carry
+            asyncio.get_event_loop().call_soon(sock.initiate_connection)
+        else:
+            sock.initiate_connection()
 
         return sock
 
@@ -278,28 +882,46 @@ class TCPSocket(TCPSocketBase):
         '''
         self.base_seq_self = base_seq_self
         self.seq = base_seq_self + 1
-        self.send_buffer = TCPSendBuffer(self.base_seq_self + 1)
+        self.send_buffer = TCPSendBuffer(self.base_seq_self + 1,
+                copy=not self.scatter_gather)
 
         self.base_seq_other = base_seq_other
         self.ack = base_seq_other + 1
         self.receive_buffer = TCPReceiveBuffer(self.base_seq_other + 1)
 
     def handle_packet(self, pkt: bytes) -> None:
-        ip_hdr = IPv4Header.from_bytes(pkt[:IP_HEADER_LEN])
-        tcp_hdr = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
-        data = pkt[TCPIP_HEADER_LEN:]
+        tcp_hdr = TCPView(IPv4View(pkt).payload)
+        data = tcp_hdr.payload
 
-        if self.state != TCP_STATE_ESTABLISHED:
+        if self.state not in TCP_STATES_SYNCHRONIZED:
             # establish 3 way handshake
             self.continue_connection(pkt)
 
-        if self.state == TCP_STATE_ESTABLISHED:
-            if data:
+        if self.state in TCP_STATES_SYNCHRONIZED:
+            if tcp_hdr.flags & TCP_FLAGS_RST:
+                # the remote side has aborted the connection (which, in
+                # TIME_WAIT, is already closed; RFC 1337)
+                if self.state != TCP_STATE_TIME_WAIT:
+                    self.terminate()
+                return
+            if self.timestamps and self.last_ack_sent is not None and \
+                    tcp_hdr.header_len > TCP_HEADER_LEN:
+                self.update_ts_recent(tcp_hdr)
+            if data and not self.fin_received:
                 # handle data
                 self.handle_data(pkt)
+            elif self.ack is not None and tcp_hdr.seq < self.ack and \
+                    not tcp_hdr.flags & (TCP_FLAGS_SYN | TCP_FLAGS_FIN):
+                # a window probe (or a retransmission): answer with the
+                # current window
+                self.send_ack()
             if tcp_hdr.flags & TCP_FLAGS_ACK:
                 # handle ACK
                 self.handle_ack(pkt)
+            if tcp_hdr.flags & TCP_FLAGS_FIN and \
+                    self.state in TCP_STATES_SYNCHRONIZED:
+                # handle FIN
+                self.handle_fin(tcp_hdr)
 
 
     def initialize_seq(self) -> int:
@@ -307,13 +929,27 @@ class TCPSocket(TCPSocketBase):
 
 
     def initiate_connection(self) -> None:
-        """Initiate the TCP heandshake."""
-        # send TCP packet with SYN flag set
+        """
+        Initiate the TCP heandshake.  With Fast Open, and a cookie for the
+        server, the SYN carries the first data sent (up to an MSS).
+        """
+        data = b''
+        fast_open_cookie = None
+        if self.fast_open:
+            fast_open_cookie, mss = self.fast_open_cookies.get(
+                    self._remote_addr, (b'', None))
+            if fast_open_cookie and self.send_buffer.bytes_not_yet_sent():
+                data, seq = self.send_buffer.get_vectors(min(self.mss, mss))
+                self.send_buffer.record_send(seq, sum(map(len, data)),
+                        time.monotonic())
+
+        # send TCP packet with SYN flag set, offering our options
         self.send_packet(
             seq=self.base_seq_self, 
             ack=0, # SYN packets don't have an acknolwedgement number
             flags= TCP_FLAGS_SYN,
-            data=b'',
+            data=data,
+            options=self.syn_options(fast_open_cookie),
         )
 
         # transition state to SYN_SENT
@@ -321,69 +957,203 @@ class TCPSocket(TCPSocketBase):
 
     def handle_syn(self, pkt: bytes) -> None:
         """Handle SYN packet"""
-        tcp_header = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
+        tcp_header = TCPView(IPv4View(pkt).payload)
         
         if (tcp_header.flags & TCP_FLAGS_SYN) == TCP_FLAGS_SYN:
-            # save base sequence of remote side
-            self.base_seq_other = tcp_header.seq
-            
-            # initialize the buffers
-            self.seq = self.base_seq_self + 1
-            self.send_buffer = TCPSendBuffer(self.base_seq_self + 1)
-
-            self.ack = self.base_seq_other + 1
-            self.receive_buffer = TCPReceiveBuffer(self.base_seq_other + 1)            
+            self.accept_syn(self.base_seq_self, tcp_header.seq,
+                    tcp_header.window, tcp_header.options)
 
             # send corresponding SYNACK packet
             self.send_packet(
                 seq=self.base_seq_self, 
                 ack=self.base_seq_other + 1,
                 flags= TCP_FLAGS_SYN | TCP_FLAGS_ACK,
-                data=pkt[TCPIP_HEADER_LEN:],
+                data=tcp_header.payload,
+                options=self.syn_options(),
             )
-
-            # transition state
-            self.state = TCP_STATE_SYN_RECEIVED
         else:
             # if flag is not SYN, return a TCP packet with only the RST flag set
             self.send_reset_packet(pkt)
 
+    def accept_syn(self, base_seq_self: int, base_seq_other: int,
+            window: int, options: dict) -> None:
+        """
+        Take up a connection whose SYN has been received: save the base
+        sequence numbers (ours being the ISN of our SYNACK), and the window
+        and options of the SYN, and initialize the buffers.  The socket is
+        then in SYN_RECEIVED, waiting for the ACK of its SYNACK (which a
+        TCPListenerSocket has already sent).
+        """
+        # save base sequence of remote side, and its window
+        self.base_seq_self = base_seq_self
+        self.base_seq_other = base_seq_other
+        self.update_rwnd(window)
+
+        # agree on the options the remote side offered
+        self.negotiate_options(options)
+
+        # initialize the buffers
+        self.seq = self.base_seq_self + 1
+        self.send_buffer = TCPSendBuffer(self.base_seq_self + 1,
+                copy=not self.scatter_gather)
+
+        self.ack = self.base_seq_other + 1
+        self.last_ack_sent = self.ack
+        self.receive_buffer = TCPReceiveBuffer(self.base_seq_other + 1)
+
+        # transition state
+        self.state = TCP_STATE_SYN_RECEIVED
+
+    def accept_syn_data(self, data: bytes) -> None:
+        """
+        Take the data carried by a SYN accepted with a Fast Open cookie,
+        after accept_syn(): it is ready for the application, and
+        acknowledged by the SYNACK.
+        """
+        if not data:
+            return
+        self.receive_buffer.put(bytes(data), self.base_seq_other + 1)
+        chunks, _ = self.receive_buffer.get_chunks()
+        self.ready_buffer.extend(chunks)
+        self.ready_buffer_size += len(data)
+        self.ack = self.receive_buffer.base_seq
+        self.last_ack_sent = self.ack
+
     def handle_synack(self, pkt: bytes) -> None:
         """Handle TCP SYNACK packet"""
 
-        tcp_header = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
+        tcp_header = TCPView(IPv4View(pkt).payload)
         synack_flag = TCP_FLAGS_SYN | TCP_FLAGS_ACK
         
         # ignore packet if flag is not SYNACK or the ack field is not our current sequence
-        if (tcp_header.flags & synack_flag) == synack_flag and tcp_header.ack == self.base_seq_self + 1:
-            # save base sequence of remote side
+        # (or, with Fast Open, past the data in our SYN)
+        if (tcp_header.flags & synack_flag) == synack_flag and \
+                self.base_seq_self + 1 <= tcp_header.ack <= \
+                self.send_buffer.next_seq:
+            # save base sequence of remote side, and its window
             self.base_seq_other = tcp_header.seq
+            self.update_rwnd(tcp_header.window)
 
-            # initialize the buffers
-            self.seq = self.base_seq_self + 1
-            self.send_buffer = TCPSendBuffer(self.base_seq_self + 1)
+            # agree on the options the remote side answered with
+            options = tcp_header.options
+            self.negotiate_options(options)
+            if self.fast_open:
+                self.handle_fast_open_synack(tcp_header.ack, options)
 
+            # initialize the buffers (the send buffer already holds any
+            # data sent before the connection was established)
+            self.seq = self.base_seq_self + 1
             self.ack = self.base_seq_other + 1
             self.receive_buffer = TCPReceiveBuffer(self.base_seq_other + 1)
             
             # send corresponding ACK packet
             self.send_packet(
-                seq=self.base_seq_self + 1, 
+                seq=tcp_header.ack,
                 ack=self.base_seq_other + 1,
                 flags= TCP_FLAGS_ACK,
-                data=pkt[TCPIP_HEADER_LEN:],
+                data=tcp_header.payload,
             )
 
-            # transition state
+            # transition state, and send any data waiting
             self.state = TCP_STATE_ESTABLISHED
+            self.send_if_possible()
+            if self._notify_on_send is not None:
+                self._notify_on_send()
+
+    def handle_fast_open_synack(self, ack: int, options: dict) -> None:
+        """
+        Handle the Fast Open side of the SYNACK: cache the cookie it carries
+        (with the server's MSS), and if it does not acknowledge the data in
+        our SYN, have the data retransmitted, and forget a cookie that the
+        server did not replace (it is no longer valid, or the server no
+        longer does Fast Open).
+        """
+        cookie = options.get(TCP_OPTION_FASTOPEN)
+        if cookie:
+            self.fast_open_cookies[self._remote_addr] = (cookie,
+                    options.get(TCP_OPTION_MSS, TCP_MSS_DEFAULT))
+        if ack < self.send_buffer.next_seq:
+            if not cookie:
+                self.fast_open_cookies.pop(self._remote_addr, None)
+            self.send_buffer.mark_lost()
+
+    def syn_options(self, fast_open_cookie: bytes=None) -> bytes:
+        """
+        Return the encoded options for our SYN (or SYNACK): the MSS and
+        window scale always, and SACK-permitted and timestamps if they are
+        enabled.  A SYNACK only offers what the SYN offered.  A SYN may also
+        carry fast_open_cookie, or ask for one (b'').
+        """
+        options = {TCP_OPTION_MSS: self.mss}
+        if self.window_scaling:
+            options[TCP_OPTION_WSCALE] = self._wscale_offer
+        if self.sack:
+            options[TCP_OPTION_SACK_PERMITTED] = True
+        if self.timestamps:
+            options[TCP_OPTION_TIMESTAMP] = (self.tsval(), self.ts_recent)
+        if fast_open_cookie is not None:
+            options[TCP_OPTION_FASTOPEN] = fast_open_cookie
+        return pack_tcp_options(options)
+
+    def negotiate_options(self, options: dict) -> None:
+        """
+        Agree on the options given in the SYN (or SYNACK) received: use the
+        smaller MSS, and window scaling, SACK, and timestamps only if both
+        sides offer them.
+        """
+        if TCP_OPTION_MSS in options:
+            self.mss = min(self.mss, options[TCP_OPTION_MSS])
+        self.window_scaling = TCP_OPTION_WSCALE in options
+        if self.window_scaling:
+            self.snd_wscale = options[TCP_OPTION_WSCALE]
+            self.rcv_wscale = self._wscale_offer
+        self.sack = self.sack and TCP_OPTION_SACK_PERMITTED in options
+        self.timestamps = self.timestamps and \
+                TCP_OPTION_TIMESTAMP in options
+        if self.timestamps:
+            self.ts_recent = options[TCP_OPTION_TIMESTAMP][0]
+
+    @staticmethod
+    def window_scale(receive_buffer_size: int) -> int:
+        """
+        Return the window scale to offer for a receive buffer of the given
+        size: the least shift that fits it in a TCP header.
+        """
+        wscale = 0
+        while receive_buffer_size >> wscale > TCP_WINDOW_MAX and \
+                wscale < TCP_WSCALE_MAX:
+            wscale += 1
+        return wscale
+
+    @staticmethod
+    def tsval() -> int:
+        """Return the current timestamp value: the time in milliseconds."""
+        return int(time.monotonic() * 1000) & 0xffffffff
+
+    def update_ts_recent(self, tcp_hdr: TCPView) -> None:
+        """
+        Record the timestamp of a segment received, if it is newer than
+        ts_recent and the segment starts at or before the acknowledgment
+        number last sent, so that a delayed ACK echoes the earliest segment
+        it acknowledges (RFC 7323).
+        """
+        ts = tcp_hdr.options.get(TCP_OPTION_TIMESTAMP)
+        if ts is not None and tcp_hdr.seq <= self.last_ack_sent and \
+                (ts[0] - self.ts_recent) & 0xffffffff < 0x80000000:
+            self.ts_recent = ts[0]
 
     def handle_ack_after_synack(self, pkt: bytes) -> None:
         """Handle incoming TCP ACK packet."""
-        tcp_header = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
+        tcp_header = TCPView(IPv4View(pkt).payload)
         
         # ignore the packet if not ACK flag or if ack field is not our sequence number
-        if (tcp_header.flags & TCP_FLAGS_ACK) == TCP_FLAGS_ACK and tcp_header.ack == self.base_seq_self+1:
+        # (or, with Fast Open, data sent since)
+        if (tcp_header.flags & TCP_FLAGS_ACK) == TCP_FLAGS_ACK and \
+                self.base_seq_self + 1 <= tcp_header.ack <= \
+                self.send_buffer.next_seq:
             self.state = TCP_STATE_ESTABLISHED
+            if self.close_pending:
+                self.close()
 
 
     def continue_connection(self, pkt: bytes) -> None:
@@ -420,23 +1190,69 @@ class TCPSocket(TCPSocketBase):
             checksum=0
         )
 
-        return ip_header.to_bytes() + tcp_header.to_bytes() + data
+        pkt = ip_header.to_bytes() + tcp_header.to_bytes() + data
+        if checksum.FILL_ON_SEND:
+            pkt = checksum.fill_packet(pkt)
+        return pkt
 
     def send_packet(self, seq: int, ack: int, flags: int,
-            data: bytes=b'') -> None:
-        """Creates and sends a TCP packet"""
-        self._send_ip_packet(
-            self.create_packet(
+            data: bytes | list[bytes]=b'', options: bytes=b'') -> None:
+        """
+        Creates and sends a TCP packet.  data may be a list of buffers, which
+        are gathered into the packet.  options are the encoded TCP options.
+        """
+        self._send_ip_packet(self.build_packet(seq, ack, flags, data, options))
+
+    def build_packet(self, seq: int, ack: int, flags: int,
+            data: bytes | list[bytes]=b'', options: bytes=b'') -> bytes:
+        """Creates a TCP packet, like send_packet(), but returns it."""
+        if flags & TCP_FLAGS_ACK:
+            self.last_ack_sent = ack
+        if self.timestamps and not flags & TCP_FLAGS_SYN:
+            options = pack_tcp_options({TCP_OPTION_TIMESTAMP:
+                (self.tsval(), self.ts_recent)}) + options
+        if flags & TCP_FLAGS_ACK and self.ack_pending:
+            # any pending ACK goes with this packet
+            self.ack_pending = False
+            self.ack_pending_bytes = 0
+            if self.ack_timer:
+                self.ack_timer.cancel()
+                self.ack_timer = None
+        if self._header_template is None:
+            self._header_template = TCPIPHeaderTemplate(
                 src=self._local_addr,
                 sport=self._local_port,
                 dst=self._remote_addr,
                 dport=self._remote_port,
-                seq=seq,
-                ack=ack,
-                flags=flags,
-                data=data,
+                ttl=IPV4_TTL_DEFAULT,
+                protocol=IPPROTO_TCP,
             )
-        )
+        window = self.receive_window()
+        if flags & TCP_FLAGS_SYN:
+            # the window in a SYN is never scaled
+            window = min(window, TCP_WINDOW_MAX)
+        else:
+            window >>= self.rcv_wscale
+        return self._header_template.build(seq, ack, flags, data, options,
+                window)
+
+    def receive_window(self) -> int:
+        """
+        Return the receive window to advertise, from self.ack: the space
+        left in receive_buffer_size by the data the application has not yet
+        read.  To avoid the silly window syndrome (RFC 1122), the right edge
+        of the window only moves forward by at least min(receive_buffer_size
+        / 2, mss) at a time.
+        """
+        if self.ack is None:
+            return self.receive_buffer_size
+        edge = self.ack + max(self.receive_buffer_size -
+                self.ready_buffer_size, 0)
+        if self._rcv_wnd_edge is None or edge >= self._rcv_wnd_edge + \
+                min(self.receive_buffer_size // 2, self.mss):
+            self._rcv_wnd_edge = edge
+        return min(max(self._rcv_wnd_edge - self.ack, 0),
+                TCP_WINDOW_MAX << self.rcv_wscale)
 
     def send_reset_packet(self, pkt: bytes) -> None:
         """Creates and sends a reset TCP packet"""
@@ -444,7 +1260,7 @@ class TCPSocket(TCPSocketBase):
             seq=self.base_seq_self,
             ack=0, # no data has been acknolwedged
             flags= TCP_FLAGS_RST,
-            data=pkt[TCPIP_HEADER_LEN:],
+            data=TCPView(IPv4View(pkt).payload).payload,
         )    
         
     def relative_seq_other(self, seq: int) -> int:
@@ -471,25 +1287,327 @@ class TCPSocket(TCPSocketBase):
     def send_if_possible(self) -> int:
         """
         Grabs segments of data from its TCPSendBuffer and sends them 
-        to the TCP peer.
+        to the TCP peer.  If the host can send a burst of packets in one
+        call, the segments are handed to it together.  If they are paced
+        (see current_pacing_rate()), segments are instead spaced out at the
+        pacing rate, and a timer sends each one when it is due.
         """
-        # send segments of data until the number of outstanding bytes exceeds the congestion window.
-        while self.send_buffer.bytes_outstanding() < self.cwnd and self.send_buffer.bytes_not_yet_sent():
-            # Grab data from TCPSendBuffer
-            data, seq = self.send_buffer.get(self.mss)
-            self.send_packet(seq=seq, ack=self.ack, flags=0, data=data)
+        if self.state not in TCP_STATES_SYNCHRONIZED and not \
+                (self.fast_open and self.state == TCP_STATE_SYN_RECEIVED):
+            # data sent before the connection is established waits (but
+            # a Fast Open server may answer the data in the SYN right away)
+            return
+        packets = []
+        now = time.monotonic()
+        pacing_rate = self.current_pacing_rate(now)
+        # send segments of data until the number of bytes in flight exceeds the congestion window.
+        while self.send_buffer.bytes_in_flight() < self.cwnd:
+            if pacing_rate and now < self._pacing_next:
+                if self._pacing_timer is None:
+                    self._pacing_timer = asyncio.get_event_loop().call_later(
+                            self._pacing_next - now, self.pacing_timeout)
+                break
+            # Grab data from TCPSendBuffer, as views of the buffered chunks
+            # that are copied only once, into the outgoing packet.  Holes
+            # that the receiver has reported (with SACK) are filled first.
+            data, seq = self.send_buffer.get_vectors_for_hole(self.mss)
+            retransmit = bool(data)
+            if data:
+                if self._rtt_seq is not None and seq < self._rtt_seq:
+                    # Karn's rule
+                    self._rtt_seq = None
+            elif self.send_buffer.bytes_not_yet_sent():
+                if self.send_buffer.bytes_not_yet_sent() < self.mss and \
+                        (self.corked or (self.nagle and \
+                            self.send_buffer.bytes_outstanding())):
+                    # hold back a small segment until there is more data
+                    # or (with Nagle) everything sent is acknowledged
+                    break
+                # new data must fit in the receiver's window.  To avoid the
+                # silly window syndrome (RFC 1122), a segment smaller than
+                # the MSS (and than the data waiting) is only sent if it is
+                # at least half the largest window advertised.
+                size = min(self.mss, self.send_buffer.base_seq + self.rwnd -
+                        self.send_buffer.next_seq)
+                if size < min(self.mss,
+                        self.send_buffer.bytes_not_yet_sent()) and \
+                        (size <= 0 or size < self.max_rwnd // 2):
+                    if not self.send_buffer.bytes_outstanding():
+                        # no ACK is coming to open the window
+                        self.start_persist_timer()
+                    break
+                data, seq = self.send_buffer.get_vectors(size)
+                if self._rtt_seq is None:
+                    # time this segment
+                    self._rtt_seq = self.send_buffer.next_seq
+                    self._rtt_time = now
+            else:
+                # the application, not cwnd, is limiting the sending rate
+                self.send_buffer.mark_app_limited()
+                break
+            size = sum(map(len, data))
+            if retransmit:
+                self.retransmits += 1
+                self.bytes_retransmitted += size
+            self.send_buffer.record_send(seq, size, now, retransmit)
+            if pacing_rate:
+                # a pacing timer that fired late may catch up, by up to
+                # TCP_PACING_BURST segments at once
+                self._pacing_next = max(self._pacing_next,
+                        now - TCP_PACING_BURST * self.mss / pacing_rate) + \
+                        size / pacing_rate
+            packet = self.build_packet(seq=seq, ack=self.ack,
+                    flags=TCP_FLAGS_ACK, data=data)
+            if self._send_ip_packets is None:
+                self._send_ip_packet(packet)
+            else:
+                packets.append(packet)
             if not self.timer: 
                 # start timer if not already set
                 self.start_timer()
+        if packets:
+            self._send_ip_packets(packets)
+        if self.fin_seq is None and not self.send_buffer.bytes_not_yet_sent() \
+                and self.state in (TCP_STATE_FIN_WAIT_1, TCP_STATE_LAST_ACK):
+            # the application has closed the connection, and all its data
+            # has been sent
+            self.fin_seq = self.send_buffer.next_seq
+            self.send_fin()
+
+    def current_pacing_rate(self, now: float) -> float | None:
+        """
+        Return the rate (bytes/second) at which to pace segments: the
+        congestion control's, if it sets one, or else, with pacing, cwnd /
+        srtt times TCP_PACING_GAIN_SLOW_START or
+        TCP_PACING_GAIN_CONGESTION_AVOIDANCE (once there is an RTT sample).
+        Return None to send segments as soon as cwnd allows.  A new rate is
+        recorded in pacing_rate_samples.
+        """
+        rate = self.congestion.pacing_rate()
+        if rate is None and self.pacing and self.srtt:
+            if self.cwnd < self.ssthresh / 2:
+                gain = TCP_PACING_GAIN_SLOW_START
+            else:
+                gain = TCP_PACING_GAIN_CONGESTION_AVOIDANCE
+            rate = gain * self.cwnd / self.srtt
+        if rate != self.pacing_rate:
+            self.pacing_rate = rate
+            self.pacing_rate_samples.append((now, rate))
+        return rate
+
+    def pacing_timeout(self) -> None:
+        """Send the next segment, when the pacing timer expires."""
+        self._pacing_timer = None
+        self.send_if_possible()
+
+    def cork(self) -> None:
+        """
+        Hold back segments smaller than the MSS until uncork() is called, so
+        that several small send() calls go out as full segments.
+        """
+        self.corked = True
+
+    def uncork(self) -> None:
+        """Stop holding back small segments, and send any that were held."""
+        self.corked = False
+        self.send_if_possible()
 
     def send(self, data: bytes) -> None:
         self.send_buffer.put(data)
         self.send_if_possible()
 
+    def close(self) -> None:
+        """
+        Close our side of the connection: a FIN is sent once all the data
+        buffered has been sent.  Data may still be received until the remote
+        side closes its side too.  In SYN_RECEIVED (a Fast Open server's
+        socket, handed over before the handshake completes), the close waits
+        until the connection is established (RFC 9293, section 3.10.4).
+        """
+        if self.state == TCP_STATE_ESTABLISHED:
+            self.state = TCP_STATE_FIN_WAIT_1
+        elif self.state == TCP_STATE_CLOSE_WAIT:
+            self.state = TCP_STATE_LAST_ACK
+        elif self.state in (TCP_STATE_LISTEN, TCP_STATE_SYN_SENT):
+            self.terminate()
+            return
+        elif self.state == TCP_STATE_SYN_RECEIVED:
+            self.close_pending = True
+            return
+        else:
+            return
+        self.send_if_possible()
+
+    def send_fin(self) -> None:
+        """Send (or resend) our FIN, and time it."""
+        self.send_packet(self.fin_seq, self.ack, TCP_FLAGS_FIN | TCP_FLAGS_ACK)
+        if not self.timer:
+            self.start_timer()
+
+    def handle_fin(self, tcp_hdr: TCPView) -> None:
+        """
+        Handle the FIN of the remote side: once all the data before it has
+        been received, acknowledge it, tell the application (recv() then
+        returns b''), and move on to CLOSE_WAIT, CLOSING, or TIME_WAIT.
+        """
+        fin_seq = tcp_hdr.seq + len(tcp_hdr.payload)
+        if self.fin_received:
+            if fin_seq + 1 == self.ack:
+                # a retransmission: our ACK was lost
+                self.send_ack()
+                if self.state == TCP_STATE_TIME_WAIT:
+                    self.enter_time_wait()
+            return
+        if fin_seq != self.receive_buffer.base_seq:
+            # data before the FIN is missing; it will be retransmitted
+            return
+        self.fin_received = True
+        self.ack = fin_seq + 1
+        self.send_ack()
+        if self.state == TCP_STATE_ESTABLISHED:
+            self.state = TCP_STATE_CLOSE_WAIT
+        elif self.state == TCP_STATE_FIN_WAIT_1:
+            self.state = TCP_STATE_CLOSING
+        elif self.state == TCP_STATE_FIN_WAIT_2:
+            self.enter_time_wait()
+            if self._notify_on_send is not None:
+                self._notify_on_send()
+        self._notify_on_data()
+
+    def handle_fin_acked(self) -> None:
+        """Move on from FIN_WAIT_1, CLOSING, or LAST_ACK once our FIN is ACKed."""
+        self.fin_acked = True
+        self.cancel_timer()
+        if self.state == TCP_STATE_FIN_WAIT_1:
+            self.state = TCP_STATE_FIN_WAIT_2
+        elif self.state == TCP_STATE_CLOSING:
+            self.enter_time_wait()
+        elif self.state == TCP_STATE_LAST_ACK:
+            self.terminate()
+        if self._notify_on_send is not None:
+            self._notify_on_send()
+
+    def enter_time_wait(self) -> None:
+        """
+        Enter (or restart) TIME_WAIT, in which the connection lingers for
+        time_wait seconds to acknowledge a retransmitted FIN, should our ACK
+        of it be lost.
+        """
+        self.state = TCP_STATE_TIME_WAIT
+        if self.time_wait_timer:
+            self.time_wait_timer.cancel()
+        self.time_wait_timer = self.call_later(self.time_wait,
+                self.terminate)
+
+    def terminate(self) -> None:
+        """
+        Close the connection for good: cancel its timers, release its
+        buffers, and remove the socket (see remove_socket_func).
+        """
+        if self.state == TCP_STATE_CLOSED:
+            return
+        self.state = TCP_STATE_CLOSED
+        self.cancel_timer()
+        for timer in (self.ack_timer, self.persist_timer, self._pacing_timer,
+                self.time_wait_timer):
+            if timer:
+                timer.cancel()
+        self.ack_timer = self.persist_timer = self._pacing_timer = \
+                self.time_wait_timer = None
+        self.receive_buffer = None
+        self.ready_buffer.clear()
+        self.ready_buffer_size = 0
+        self.send_buffer = TCPSendBuffer(self.send_buffer.next_seq)
+        if self._notify_on_send is not None:
+            self._notify_on_send()
+        # break the reference cycles through the socket, so that it is
+        # freed as soon as it is removed
+        self.congestion.sock = None
+        self._notify_on_data = None
+        self._notify_on_send = None
+        if self._remove_socket is not None:
+            self._remove_socket(self._local_addr, self._local_port,
+                    self._remote_addr, self._remote_port, self)
+
     def recv(self, num: int) -> bytes:
-        data = self.ready_buffer[:num]
-        self.ready_buffer = self.ready_buffer[num:]
-        return data
+        """
+        Return (at most) the next num bytes of received data.  The data is
+        copied once, when the chunks are joined.
+        """
+        pieces = []
+        remaining = num
+        while remaining and self.ready_buffer:
+            chunk = self.ready_buffer[0]
+            if len(chunk) <= remaining:
+                pieces.append(self.ready_buffer.popleft())
+                remaining -= len(chunk)
+            else:
+                pieces.append(chunk[:remaining])
+                self.ready_buffer[0] = chunk[remaining:]
+                remaining = 0
+        self.ready_buffer_size -= num - remaining
+        self.update_receive_window()
+        return b''.join(pieces)
+
+    def recv_into(self, buffer: bytearray, nbytes: int=0) -> int:
+        """
+        Copy (at most) the next nbytes bytes of received data (or as many as
+        fit, if nbytes is 0) into buffer, and return the number of bytes
+        copied.
+        """
+        view = memoryview(buffer).cast('B')
+        if not nbytes or nbytes > len(view):
+            nbytes = len(view)
+        offset = 0
+        while offset < nbytes and self.ready_buffer:
+            chunk = self.ready_buffer[0]
+            size = min(len(chunk), nbytes - offset)
+            view[offset:offset + size] = chunk[:size]
+            offset += size
+            if size == len(chunk):
+                self.ready_buffer.popleft()
+            else:
+                self.ready_buffer[0] = chunk[size:]
+        self.ready_buffer_size -= offset
+        self.update_receive_window()
+        return offset
+
+    def get_info(self) -> TCPInfo:
+        """
+        Return a snapshot of the connection (see TCPInfo), like the
+        TCP_INFO socket option.
+        """
+        send_buffer = self.send_buffer
+        sample = self.last_rate_sample
+        return TCPInfo(self.state, self.mss, self.cwnd, self.ssthresh,
+                self.rwnd, self.srtt, self.rttvar, self.timeout,
+                send_buffer.bytes_in_flight(), send_buffer.bytes_sacked(),
+                send_buffer.bytes_lost(), self.retransmits,
+                self.bytes_retransmitted, self.timeouts, self.num_dup_acks,
+                self.dup_acks_received, self.congestion.in_recovery,
+                None if sample is None else sample.delivery_rate,
+                sample is not None and sample.app_limited,
+                send_buffer.delivered,
+                send_buffer.last_seq - send_buffer.base_seq,
+                send_buffer.bytes_not_yet_sent(),
+                0 if self.receive_buffer is None else
+                    self.receive_buffer.size,
+                self.ready_buffer_size, self.pacing_rate)
+
+    def update_receive_window(self) -> None:
+        """
+        After the application has read data, tell the remote side that the
+        receive window has opened, if it has grown to at least twice the
+        window last advertised (and by at least min(receive_buffer_size /
+        2, mss)), so that the sender is not left waiting for it.
+        """
+        if self._rcv_wnd_edge is None:
+            return
+        advertised = max(self._rcv_wnd_edge - self.ack, 0)
+        free = self.receive_buffer_size - self.ready_buffer_size
+        if free >= 2 * advertised and free - advertised >= \
+                min(self.receive_buffer_size // 2, self.mss):
+            self.send_ack()
 
     def handle_data(self, pkt: bytes) -> None:
         """
@@ -499,22 +1617,56 @@ class TCPSocket(TCPSocketBase):
             pkt : byte
                 an IP packet with IP header.
         """
-        tcp_hdr = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
-        data = pkt[TCPIP_HEADER_LEN:]
+        tcp_hdr = TCPView(IPv4View(pkt).payload)
+        data = tcp_hdr.payload
+
+        # drop any data beyond the receive window
+        beyond_window = self._rcv_wnd_edge is not None and \
+                tcp_hdr.seq + len(data) > self._rcv_wnd_edge
+        if beyond_window:
+            data = data[:max(self._rcv_wnd_edge - tcp_hdr.seq, 0)]
+
+        # whether the segment is the one expected, and arrived with no
+        # segments waiting beyond a hole
+        in_order = tcp_hdr.seq == self.receive_buffer.base_seq and \
+                not self.receive_buffer.buffer
 
         # put the longest contiguous set of bytes and store in ready buffer
         self.receive_buffer.put(data, tcp_hdr.seq)
-        receive_data, receive_seq = self.receive_buffer.get()
+        receive_chunks, receive_seq = self.receive_buffer.get_chunks()
 
-        # send ack with next expected in-order byte
-        self.ack = receive_seq + len(receive_data)
-        self.send_ack()
+        # ack with next expected in-order byte
+        self.ack = self.receive_buffer.base_seq
+        self.ack_pending = True
+        self.ack_pending_bytes += self.ack - receive_seq
 
-        if len(receive_data):
+        # ACK immediately, unless delaying ACKs for in-order data that
+        # leaves no hole, and fewer than TCP_DELAYED_ACK_SEGMENTS full
+        # segments are unacknowledged
+        ack_now = not self.delayed_ack or not in_order or beyond_window or \
+                not receive_chunks or self.receive_buffer.buffer or \
+                self.ack_pending_bytes >= TCP_DELAYED_ACK_SEGMENTS * self.mss
+
+        if receive_chunks:
             # if new data was recieved, add to ready_buffer and notify application
-            self.ready_buffer += receive_data
+            self.ready_buffer.extend(receive_chunks)
+            self.ready_buffer_size += self.ack - receive_seq
             self._notify_on_data()
-        
+
+        # unless the application has replied with data (carrying the ACK),
+        # send the ACK, now or later
+        if self.ack_pending:
+            if ack_now:
+                self.send_ack()
+            elif not self.ack_timer:
+                self.ack_timer = self.call_later(TCP_DELAYED_ACK_TIMEOUT,
+                        self.delayed_ack_timeout)
+
+    def delayed_ack_timeout(self) -> None:
+        """Send the pending ACK, when the delayed ACK timer expires."""
+        self.ack_timer = None
+        if self.ack_pending:
+            self.send_ack()
 
     def handle_ack(self, pkt: bytes) -> None:
         """
@@ -526,62 +1678,248 @@ class TCPSocket(TCPSocketBase):
                 an IP packet with IP header.
         """
         # check acknowledgement number in the TCP header and slide the window
-        tcp_hdr = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
-        self.send_buffer.slide(tcp_hdr.ack)
-
-        if self.fast_retransmit:
-            # track the number of duplicate ACKs. 
-            if self.seq == tcp_hdr.ack:
-                self.num_dup_acks += 1
+        tcp_hdr = TCPView(IPv4View(pkt).payload)
+        ack = tcp_hdr.ack
+        if self.fin_seq is not None and ack > self.fin_seq:
+            # our FIN is acknowledged (along with all the data)
+            ack = self.fin_seq
+            if not self.fin_acked:
+                self.handle_fin_acked()
+                if self.state == TCP_STATE_CLOSED:
+                    return
+        bytes_acked = ack - self.send_buffer.base_seq
+        rwnd = self.rwnd
+        if bytes_acked >= 0:
+            # not an old ACK, so its window is current (and scaled, unless
+            # this is the SYNACK)
+            self.update_rwnd(tcp_hdr.window if tcp_hdr.flags & TCP_FLAGS_SYN
+                    else tcp_hdr.window << self.snd_wscale)
+        if bytes_acked <= 0 and tcp_hdr.payload:
+            # a data segment that acknowledges nothing new is not a
+            # duplicate ACK (RFC 5681), just an ACK piggybacked on data.  It
+            # may still open the window, which stops the persist timer, so
+            # what was waiting on the window is sent now.
+            if self.rwnd > rwnd:
+                self.send_if_possible()
+            if self.probe is not None:
+                self.probe.record(self)
+            return
+        # a duplicate ACK repeats the last acknowledgment number, and the
+        # window, while data is outstanding (RFC 5681); an ACK that only
+        # updates the window is not a sign of loss
+        dup_ack = ack == self.last_ack and self.rwnd == rwnd and \
+                self.send_buffer.bytes_outstanding() > 0
+        self.last_ack = ack
+
+        now = time.monotonic()
+        self.send_buffer.slide(ack, now)
+        options = tcp_hdr.options if tcp_hdr.header_len > TCP_HEADER_LEN \
+                else {}
+        sack_loss = False
+        if self.sack:
+            blocks = options.get(TCP_OPTION_SACK)
+            if blocks:
+                in_loss = self.send_buffer.in_loss()
+                self.send_buffer.sack(blocks, TCP_DUP_THRESH * self.mss, now)
+                sack_loss = not in_loss and self.send_buffer.in_loss()
+        self.rate_sample = self.send_buffer.rate_sample(now)
+        if self.rate_sample is not None:
+            self.last_rate_sample = self.rate_sample
+            self.congestion.on_rate_sample(self.rate_sample)
+
+        ts = options.get(TCP_OPTION_TIMESTAMP) if self.timestamps else None
+        if ts is not None and ts[1] and bytes_acked > 0:
+            # every ACK of new data echoes the time that the segment it
+            # acknowledges was sent
+            self.update_rtt(((self.tsval() - ts[1]) & 0xffffffff) / 1000)
+            self._rtt_seq = None
+        elif self._rtt_seq is not None and ack >= self._rtt_seq:
+            # the timed segment has been acknowledged
+            self.update_rtt(now - self._rtt_time)
+            self._rtt_seq = None
+
+        if bytes_acked > 0:
+            self.num_dup_acks = 0
+            self.seq = ack # the byte the client is expecting
+
+            # Adjust congestion window
+            cc = self.congestion
+            if not cc.in_recovery:
+                cc.on_ack(bytes_acked)
+            elif ack >= cc.recover:
+                cc.on_recovery_exit()
+            elif cc.on_partial_ack(bytes_acked):
+                self.retransmit(timeout=False)
+
+            # restart the timer if we're still waiting for acks
+            if self.send_buffer.bytes_outstanding() or \
+                    (self.fin_seq is not None and not self.fin_acked):
+                self.restart_timer()
             else:
-                self.num_dup_acks = 0
+                self.cancel_timer()
+
+        elif dup_ack:
+            # track the number of duplicate ACKs
+            self.num_dup_acks += 1
+            self.dup_acks_received += 1
+            if self.fast_retransmit:
+                if self.num_dup_acks == TCP_DUP_THRESH:
+                    # the congestion control responds to the loss now
+                    sack_loss = False
+                if self.congestion.on_dupack(self.num_dup_acks):
+                    self.retransmit(timeout=False)
+
+        if sack_loss and not self.congestion.in_recovery:
+            # the scoreboard has just presumed data lost (RFC 6675), which
+            # is as good as DupThresh duplicate ACKs, with or without
+            # fast_retransmit: the holes are resent either way, so the
+            # congestion control must respond to the loss
+            self.num_dup_acks = max(self.num_dup_acks, TCP_DUP_THRESH)
+            if self.congestion.on_dupack(TCP_DUP_THRESH):
+                self.retransmit(timeout=False)
 
-            if self.num_dup_acks == 3:
-                # ignore addutional acks
-                self.retransmit()
-                # don't do anything with the timer
-                return
-            
-        # Adjust congestion window
-        if self.congestion_control == 'tahoe':
-            bytes_acked = tcp_hdr.ack - self.seq
-            if self.cwnd < self.ssthresh:
-                # slow start: increment cwnd by the number of new bytes received
-                self.set_cwnd(self.cwnd + self.cwnd_inc + bytes_acked)            
-            else:
-                # congestion avoidance (additive increase)
-                prev_cwd = self.cwnd + self.cwnd_inc
-                self.set_cwnd(prev_cwd + int(bytes_acked * self.mss / prev_cwd))
-            
-        
-        self.cancel_timer()
+        self.send_if_possible()
+        if self.probe is not None:
+            self.probe.record(self)
+        if bytes_acked > 0 and self._notify_on_send is not None:
+            self._notify_on_send()
 
-        if self.send_buffer.bytes_outstanding():
-            # restart timer if we're still waiting for acks. 
-            if not self.timer: 
-                self.start_timer()
 
-        self.send_if_possible()
-        self.seq = tcp_hdr.ack # the byte the client is expecting
-                
+    def update_rwnd(self, window: int) -> None:
+        """
+        Record the window advertised by the remote side.  Once it is open,
+        stop probing it.
+        """
+        self.rwnd = window
+        self.max_rwnd = max(self.max_rwnd, window)
+        if window and self.persist_timer:
+            self.persist_timer.cancel()
+            self.persist_timer = None
+            self.persist_backoff = 1
+
+    def start_persist_timer(self) -> None:
+        """
+        Start the persist timer (unless it is running), which sends a window
+        probe when it expires: one RTO at first, doubling with each probe up
+        to TCP_RTO_MAX.
+        """
+        if self.persist_timer is None:
+            self.persist_timer = self.call_later(
+                    min(self.timeout * self.persist_backoff, TCP_RTO_MAX),
+                    self.persist_timeout)
 
-    def retransmit(self) -> None:
+    def persist_timeout(self) -> None:
+        """
+        Probe the remote side's window, when the persist timer expires, with
+        a segment it has already received (so that it answers with an ACK),
+        and keep probing until data can be sent.
+        """
+        self.persist_timer = None
+        self.send_if_possible()
+        if self.persist_timer is None and not \
+                self.send_buffer.bytes_outstanding() and \
+                self.send_buffer.bytes_not_yet_sent():
+            self.send_packet(self.send_buffer.base_seq - 1, self.ack,
+                    TCP_FLAGS_ACK)
+            self.persist_backoff *= 2
+            self.start_persist_timer()
+
+    def retransmit(self, timeout: bool=True) -> None:
         """
         Grab the oldest unacknowledged segment from the buffer and retransmit it 
+
+        Args:
+            timeout : bool
+                whether the retransmission timer expired, in which case the
+                congestion control is told and the RTO is doubled (as
+                opposed to a fast retransmit).
         """
-        # adjust congestion window
-        if self.congestion_control == 'tahoe':
-            self.multiplicative_decrease()
-            
-        data, seq = self.send_buffer.get_for_resend(self.mss)
+        if timeout:
+            # after a timeout, everything outstanding that has not been
+            # SACKed is presumed lost (as in Linux's tcp_enter_loss()), and
+            # resent: the first segment now and the rest as cwnd allows
+            # (go-back-N)
+            self.timeouts += 1
+            self.send_buffer.mark_lost()
+        data, seq = self.send_buffer.get_vectors_for_resend(self.mss)
         if len(data):
-            self.cancel_timer()
-            self.send_packet(seq=seq, ack=self.ack, flags=0, data=data)
-            self.start_timer()
+            # Karn's rule: an ACK may now be for either transmission, so it
+            # cannot be used to measure the RTT
+            self._rtt_seq = None
+            if timeout:
+                # adjust congestion window
+                self.congestion.on_timeout()
+            if timeout and self.timeout < TCP_RTO_MAX:
+                self.rto_backoff *= 2
+                self.set_rto()
+            size = sum(map(len, data))
+            self.retransmits += 1
+            self.bytes_retransmitted += size
+            self.send_buffer.record_send(seq, size, time.monotonic(),
+                    retransmit=True)
+            self.send_packet(seq=seq, ack=self.ack, flags=TCP_FLAGS_ACK,
+                    data=data)
+            self.restart_timer()
+        elif timeout and self.fin_seq is not None and not self.fin_acked:
+            # only our FIN is outstanding
+            if self.timeout < TCP_RTO_MAX:
+                self.rto_backoff *= 2
+                self.set_rto()
+            self.retransmits += 1
+            self.send_fin()
+            self.restart_timer()
+
+    def update_rtt(self, rtt: float) -> None:
+        """
+        Record a new RTT sample (in seconds), update srtt and rttvar with it,
+        and recompute the RTO, which is no longer backed off (RFC 6298).
+        """
+        self.rtt_samples.append((time.monotonic(), rtt))
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - TCP_RTT_BETA) * self.rttvar + \
+                    TCP_RTT_BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - TCP_RTT_ALPHA) * self.srtt + TCP_RTT_ALPHA * rtt
+        self.rto_backoff = 1
+        self.set_rto()
+
+    def set_rto(self) -> None:
+        """
+        Set the RTO (self.timeout) to srtt + K * rttvar (or the initial RTO,
+        if there are no RTT samples yet), times the backoff, clamped to
+        [TCP_RTO_MIN, TCP_RTO_MAX].
+        """
+        if self.srtt is None:
+            rto = TCP_RTO_INITIAL
+        else:
+            rto = self.srtt + TCP_RTO_K * self.rttvar
+        self.timeout = min(max(rto * self.rto_backoff, TCP_RTO_MIN),
+                TCP_RTO_MAX)
+
+    def call_later(self, delay: float, callback: callable, *args):
+        """
+        Arrange for callback(*args) to be called delay seconds from now, on
+        the timer wheel if the socket has one, and return the handle.
+        """
+        if self.timer_wheel is not None:
+            return self.timer_wheel.call_later(delay, callback, *args)
+        return asyncio.get_event_loop().call_later(delay, callback, *args)
 
     def start_timer(self) -> None:
-        loop = asyncio.get_event_loop()
-        self.timer = loop.call_later(self.timeout, self.retransmit)
+        self.timer = self.call_later(self.timeout, self.retransmit)
+
+    def restart_timer(self) -> None:
+        """
+        Restart the retransmission timer.  A timer on a timer wheel is
+        re-armed in place, rather than cancelled and scheduled anew.
+        """
+        if self.timer is not None and self.timer_wheel is not None:
+            self.timer.rearm(self.timeout)
+        else:
+            self.cancel_timer()
+            self.start_timer()
 
     def cancel_timer(self):
         if not self.timer:
@@ -590,14 +1928,17 @@ class TCPSocket(TCPSocketBase):
         self.timer = None
 
     def send_ack(self):
-        self.send_packet(self.seq, self.ack, TCP_FLAGS_ACK)
-
-    def set_cwnd(self, cwnd: int) -> None:
-        """Sets the cwnd such that self.cwnd is always a multiple of self.mss and the remainder in self.cwnd_inc"""
-        self.cwnd = int(cwnd / self.mss) * self.mss
-        self.cwnd_inc = cwnd % self.mss
-
-    def multiplicative_decrease(self) -> None:
-        """When a loss event occurs, decrease ssthresh to half of cwnd (minimum of mss) and cwnd should be 1 mss."""
-        self.ssthresh = max(self.cwnd/2, self.mss) 
-        self.set_cwnd(self.mss)
\ No newline at end of file
+        options = b''
+        if self.sack and self.receive_buffer is not None and \
+                self.receive_buffer.buffer:
+            # report the data received beyond the first hole
+            options = pack_tcp_options({TCP_OPTION_SACK:
+                self.receive_buffer.sack_blocks(
+                    TCP_SACK_MAX_BLOCKS_WITH_TIMESTAMPS if self.timestamps
+                    else TCP_SACK_MAX_BLOCKS)})
+        # the sequence number is the next one to be sent (after our FIN, if
+        # we have sent it), so that the remote side does not take the ACK
+        # for a window probe
+        seq = self.send_buffer.next_seq if self.fin_seq is None \
+                else self.fin_seq + 1
+        self.send_packet(seq, self.ack, TCP_FLAGS_ACK, options=options)
@@ -12,7 +12,7 @@ class NetcatTCP:
         self.output = output
         self.sock = socket_cls.connect(local_addr, local_port,
                 remote_addr, remote_port,
-                send_ip_packet_func, self.handle_data)
+                send_ip_packet_func, self.handle_data, **socket_args)
 
     def send(self, msg):
         msg = msg.encode('utf-8')
@@ -0,0 +1,123 @@
+"""
+A time-series probe for TCPSocket, like Linux's tcp_probe.
+
+A TCPProbe attached to a socket records the state of the connection (the
+fields of mysocket.TCPInfo, and the time) after every ACK that the socket
+handles.  The records go into a ring buffer allocated up front, with one
+array of capacity numbers per field, so recording a snapshot only stores
+numbers into it, and the last capacity records are kept.  They can then be
+written out as CSV, or handed over as NumPy arrays (if NumPy is installed).
+"""
+from __future__ import annotations
+
+import array
+import csv
+import math
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mysocket import TCPSocket, TCPInfo
+
+
+# The default number of records that a probe keeps
+TCP_PROBE_CAPACITY = 65536
+
+# The fields recorded: the time (in seconds since the probe was created), and
+# those of TCPInfo.  All are stored as floats: booleans as 0 or 1, and None
+# as NaN.
+TCP_PROBE_FIELDS = ('time',) + TCPInfo._fields
+
+
+class TCPProbe:
+    """
+    Records the state of a TCPSocket after every ACK, in a ring buffer.
+
+    Attr:
+        capacity : int
+            the number of records kept
+        count : int
+            the number of records taken, including those overwritten
+        start_time : float
+            when the probe was created (time.monotonic()), from which the
+            time of each record is counted
+    """
+    def __init__(self, capacity: int=TCP_PROBE_CAPACITY) -> TCPProbe:
+        self.capacity = capacity
+        self.count = 0
+        self.start_time = time.monotonic()
+        # one column per field of TCP_PROBE_FIELDS (those of TCPInfo from
+        # the second on)
+        self._columns = [array.array('d', bytes(8 * capacity))
+                for _ in TCP_PROBE_FIELDS]
+        self._info_columns = self._columns[1:]
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """The number of records overwritten."""
+        return max(self.count - self.capacity, 0)
+
+    def attach(self, sock: TCPSocket) -> None:
+        """Start recording the state of sock after every ACK."""
+        sock.probe = self
+
+    def detach(self, sock: TCPSocket) -> None:
+        """Stop recording the state of sock."""
+        if sock.probe is self:
+            sock.probe = None
+
+    def clear(self) -> None:
+        """Drop all the records (the arrays are kept, to be reused)."""
+        self.count = 0
+
+    def record(self, sock: TCPSocket) -> None:
+        """Record the current state of sock, overwriting the oldest record."""
+        i = self.count % self.capacity
+        self._columns[0][i] = time.monotonic() - self.start_time
+        for column, value in zip(self._info_columns, sock.get_info()):
+            column[i] = math.nan if value is None else value
+        self.count += 1
+
+    def columns(self) -> dict[str, array.array]:
+        """
+        Return the records as a dict that maps each field of
+        TCP_PROBE_FIELDS to an array of its values, oldest first.
+        """
+        if self.count <= self.capacity:
+            return {name: column[:self.count]
+                    for name, column in zip(TCP_PROBE_FIELDS, self._columns)}
+        # the oldest record is the next one to be overwritten
+        i = self.count % self.capacity
+        return {name: column[i:] + column[:i]
+                for name, column in zip(TCP_PROBE_FIELDS, self._columns)}
+
+    def to_numpy(self) -> dict[str, numpy.ndarray]:
+        """
+        Return the records as a dict that maps each field of
+        TCP_PROBE_FIELDS to a NumPy array (of float64) of its values, oldest
+        first.
+        """
+        if numpy is None:
+            raise ImportError('TCPProbe.to_numpy() requires NumPy')
+        return {name: numpy.frombuffer(column, dtype=numpy.float64)
+                for name, column in self.columns().items()}
+
+    def to_csv(self, file) -> None:
+        """
+        Write the records to file (a text file object), oldest first, as CSV
+        with a header row of TCP_PROBE_FIELDS.  Integral values are written
+        without a fractional part, and NaN (None) as an empty field.
+        """
+        writer = csv.writer(file)
+        writer.writerow(TCP_PROBE_FIELDS)
+        columns = self.columns().values()
+        for row in zip(*columns):
+            writer.writerow(['' if math.isnan(value) else
+                    int(value) if value.is_integer() else value
+                    for value in row])
@@ -56,7 +56,9 @@ class SimHost(TransportHost):
 
         nc = NetcatTCP(local_addr, local_port,
                 remote_addr, remote_port,
-                self.send_packet)
+                self.send_packet, send_ip_packets_func=self.send_packets,
+                timer_wheel=self.timer_wheel,
+                remove_socket_func=self.uninstall_socket_tcp)
         self.install_socket_tcp(local_addr, local_port, remote_addr, remote_port, nc.sock)
         self.nc = nc
 
@@ -66,7 +68,9 @@ class SimHost(TransportHost):
 
         echo = EchoServerTCP(local_addr, local_port,
                 self.install_socket_tcp,
-                self.send_packet)
+                self.send_packet, send_ip_packets_func=self.send_packets,
+                timer_wheel=self.timer_wheel,
+                remove_socket_func=self.uninstall_socket_tcp)
         self.install_listener_tcp(local_addr, local_port, echo.sock)
         self.echo = echo
 
@@ -0,0 +1,388 @@
+"""
+asyncio-style streams over TCPSocket.
+
+open_connection() and start_server() hand the application a
+(TCPStreamReader, TCPStreamWriter) pair per connection, like their asyncio
+namesakes, instead of a socket with a callback to poll.  A reader waits
+until data is present, and reads it straight from the socket, so data the
+application has not read keeps the receive window (and thus the remote
+side) in check.  A writer's drain() waits while the data in the send buffer
+not yet sent is above a high-water mark, until it falls to the low-water
+mark.  The data sent but not yet acknowledged is already bounded by the
+congestion and receive windows, so a fast writer does not buffer without
+bound, yet keeps the windows full.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from mysocket import TCPSocket, TCPListenerSocket, \
+        TCP_STATE_SYN_SENT, TCP_STATE_SYN_RECEIVED, TCP_STATE_ESTABLISHED, \
+        TCP_STATE_CLOSE_WAIT, TCP_STATE_TIME_WAIT, TCP_STATE_CLOSED
+
+
+# The default limit on the data a reader buffers while looking for a
+# separator (see TCPStreamReader.readuntil()), in bytes, as in asyncio
+STREAM_LIMIT = 2 ** 16
+
+# The default high- and low-water marks of the send buffer, in bytes, as for
+# asyncio transports
+STREAM_HIGH_WATER = 2 ** 16
+STREAM_LOW_WATER = STREAM_HIGH_WATER // 4
+
+
+class TCPStreamReader:
+    """
+    Reads the data received by a TCPSocket, like asyncio.StreamReader.
+
+    Attr:
+        sock : TCPSocket
+            the socket read from
+    """
+    def __init__(self, sock: TCPSocket,
+            limit: int=STREAM_LIMIT) -> TCPStreamReader:
+        self.sock = sock
+        self._limit = limit
+        # data taken from the socket by readuntil() but not yet returned
+        self._buffer = bytearray()
+        # the future that a read waits on (asyncio.Future instance or None)
+        self._waiter = None
+
+    def _wakeup(self) -> None:
+        """Wake up a read waiting for data."""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _eof(self) -> bool:
+        """
+        Return whether the socket will receive no more data, raising
+        ConnectionResetError if the connection was aborted before the remote
+        side closed it.
+        """
+        if self.sock.fin_received:
+            return True
+        if self.sock.state == TCP_STATE_CLOSED:
+            raise ConnectionResetError('Connection reset')
+        return False
+
+    async def _wait_for_data(self) -> bool:
+        """
+        Wait until the socket has data to read, and return True, or until it
+        will receive no more, and return False.
+        """
+        while not self.sock.ready_buffer_size:
+            if self._eof():
+                return False
+            self._waiter = asyncio.get_event_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return True
+
+    def at_eof(self) -> bool:
+        """Return whether all the data has been read, up to the remote FIN."""
+        return not self._buffer and not self.sock.ready_buffer_size and \
+                self.sock.fin_received
+
+    async def read(self, n: int=-1) -> bytes:
+        """
+        Read up to n bytes, waiting until some are available.  If n is -1,
+        read until EOF.  Return b'' at EOF.
+        """
+        if n < 0:
+            pieces = [bytes(self._buffer)]
+            self._buffer.clear()
+            while await self._wait_for_data():
+                pieces.append(self.sock.recv(self.sock.ready_buffer_size))
+            return b''.join(pieces)
+        if self._buffer:
+            data = bytes(self._buffer[:n])
+            del self._buffer[:n]
+            return data
+        if not n or not await self._wait_for_data():
+            return b''
+        return self.sock.recv(n)
+
+    async def readexactly(self, n: int) -> bytes:
+        """
+        Read exactly n bytes, raising asyncio.IncompleteReadError (with the
+        bytes read) if EOF comes first.
+        """
+        pieces = []
+        remaining = n
+        while remaining:
+            data = await self.read(remaining)
+            if not data:
+                raise asyncio.IncompleteReadError(b''.join(pieces), n)
+            pieces.append(data)
+            remaining -= len(data)
+        return b''.join(pieces)
+
+    async def readuntil(self, separator: bytes=b'\n') -> bytes:
+        """
+        Read up to and including separator.  Raise
+        asyncio.IncompleteReadError (with the bytes read) if EOF comes first,
+        or asyncio.LimitOverrunError (leaving the data to be read) if the
+        separator is not found within the reader's limit.
+        """
+        start = 0
+        while (index := self._buffer.find(separator, start)) < 0:
+            if len(self._buffer) > self._limit:
+                raise asyncio.LimitOverrunError(
+                        'Separator is not found, and chunk exceed the limit',
+                        len(self._buffer))
+            start = max(len(self._buffer) - len(separator) + 1, 0)
+            if not await self._wait_for_data():
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                raise asyncio.IncompleteReadError(data, None)
+            self._buffer += self.sock.recv(min(self.sock.ready_buffer_size,
+                self._limit + 1 - len(self._buffer) + len(separator)))
+        end = index + len(separator)
+        data = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return data
+
+    async def readline(self) -> bytes:
+        """
+        Read a line, ending in b'\\n' (or not, at EOF), like
+        asyncio.StreamReader.readline().
+        """
+        try:
+            return await self.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    def __aiter__(self) -> TCPStreamReader:
+        return self
+
+    async def __anext__(self) -> bytes:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+
+class TCPStreamWriter:
+    """
+    Writes data to a TCPSocket, like asyncio.StreamWriter.
+
+    Attr:
+        sock : TCPSocket
+            the socket written to
+    """
+    def __init__(self, sock: TCPSocket) -> TCPStreamWriter:
+        self.sock = sock
+        self._high_water = STREAM_HIGH_WATER
+        self._low_water = STREAM_LOW_WATER
+        # the futures that drain(), wait_closed() and open_connection() wait
+        # on (asyncio.Future instances)
+        self._waiters = []
+
+    def _wakeup(self) -> None:
+        """Wake up everything waiting on the writer."""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def _wait(self) -> None:
+        """Wait for the socket to notify the writer."""
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    def get_extra_info(self, name: str, default=None):
+        """
+        Return 'peername' or 'sockname' (an (address, port) tuple), or
+        'socket' (the TCPSocket), like asyncio.BaseTransport.get_extra_info().
+        """
+        if name == 'peername':
+            return (self.sock._remote_addr, self.sock._remote_port)
+        if name == 'sockname':
+            return (self.sock._local_addr, self.sock._local_port)
+        if name == 'socket':
+            return self.sock
+        return default
+
+    def get_write_buffer_size(self) -> int:
+        """Return the bytes in the send buffer not yet sent."""
+        return self.sock.send_buffer.bytes_not_yet_sent()
+
+    def set_write_buffer_limits(self, high: int=None,
+            low: int=None) -> None:
+        """
+        Set the high- and low-water marks for drain().  As for asyncio
+        transports, low defaults to high / 4, and high to 4 * low.
+        """
+        if high is None:
+            high = STREAM_HIGH_WATER if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError(f'high ({high}) must be >= low ({low}) ' + \
+                    'must be >= 0')
+        self._high_water = high
+        self._low_water = low
+
+    def write(self, data: bytes) -> None:
+        """
+        Queue data to be sent; it is sent as the windows allow.  Follow with
+        drain() to keep the send buffer in check.
+        """
+        if self.is_closing():
+            raise ConnectionResetError('Connection is closing')
+        if data:
+            self.sock.send(data)
+
+    def writelines(self, data: list[bytes]) -> None:
+        for line in data:
+            self.write(line)
+
+    async def drain(self) -> None:
+        """
+        Wait while the send buffer is above the high-water mark, until it
+        is at the low-water mark.  Raise ConnectionResetError if the
+        connection was aborted.
+        """
+        if self.get_write_buffer_size() <= self._high_water:
+            return
+        while self.get_write_buffer_size() > self._low_water:
+            if self.sock.state == TCP_STATE_CLOSED:
+                raise ConnectionResetError('Connection reset')
+            await self._wait()
+
+    def can_write_eof(self) -> bool:
+        return True
+
+    def write_eof(self) -> None:
+        """
+        Close our side of the connection once the data buffered is sent;
+        the reader still reads until the remote side closes its side.
+        """
+        self.sock.close()
+
+    def close(self) -> None:
+        """Close the connection (see write_eof())."""
+        self.sock.close()
+
+    def is_closing(self) -> bool:
+        """Return whether our side of the connection is closed (or closing)."""
+        return self.sock.state not in (TCP_STATE_SYN_SENT,
+                TCP_STATE_SYN_RECEIVED, TCP_STATE_ESTABLISHED,
+                TCP_STATE_CLOSE_WAIT)
+
+    async def wait_closed(self) -> None:
+        """
+        Wait until the connection is closed, on both sides (and possibly in
+        TIME_WAIT).
+        """
+        while self.sock.state not in (TCP_STATE_TIME_WAIT, TCP_STATE_CLOSED):
+            await self._wait()
+
+
+def attach(sock: TCPSocket,
+        limit: int=STREAM_LIMIT) -> tuple[TCPStreamReader, TCPStreamWriter]:
+    """
+    Return a reader and a writer for sock, which take over its
+    notifications: data (and the remote FIN) wakes up the reader, and
+    changes on the sending side wake up the writer.  The end of the
+    connection wakes up both.
+    """
+    reader = TCPStreamReader(sock, limit)
+    writer = TCPStreamWriter(sock)
+
+    def on_send():
+        writer._wakeup()
+        if sock.state == TCP_STATE_CLOSED:
+            # a read waiting for data that will never come
+            reader._wakeup()
+    sock._notify_on_data = reader._wakeup
+    sock._notify_on_send = on_send
+    return reader, writer
+
+
+async def open_connection(local_addr: str, local_port: int,
+        remote_addr: str, remote_port: int,
+        install_socket_func: callable, send_ip_packet_func: callable,
+        limit: int=STREAM_LIMIT,
+        **socket_args) -> tuple[TCPStreamReader, TCPStreamWriter]:
+    """
+    Open a connection to remote_addr:remote_port, and return a reader and a
+    writer for it once it is established.
+
+    Args:
+        install_socket_func : callable
+            called with the addresses and ports of the connection and the
+            socket, to install it (such as
+            TransportHost.install_socket_tcp())
+        send_ip_packet_func : callable
+            sends an IP packet (such as Host.send_packet())
+        limit : int
+            the limit on the data the reader buffers (see
+            TCPStreamReader.readuntil())
+        socket_args
+            passed to TCPSocket.connect()
+    """
+    sock = TCPSocket.connect(local_addr, local_port, remote_addr, remote_port,
+            send_ip_packet_func, lambda: None, **socket_args)
+    reader, writer = attach(sock, limit)
+    install_socket_func(local_addr, local_port, remote_addr, remote_port,
+            sock)
+    while sock.state != TCP_STATE_ESTABLISHED:
+        if sock.state == TCP_STATE_CLOSED:
+            raise ConnectionRefusedError(
+                    f'Connection to {remote_addr}:{remote_port} failed')
+        await writer._wait()
+    return reader, writer
+
+
+class TCPStreamServer:
+    """
+    A server that calls client_connected_cb(reader, writer) for each new
+    connection to its TCPListenerSocket, like asyncio.Server.  If
+    client_connected_cb is a coroutine function, it is run as a task.
+
+    Attr:
+        sock : TCPListenerSocket
+            the listener, to be installed with the host (such as with
+            TransportHost.install_listener_tcp())
+    """
+    def __init__(self, local_addr: str, local_port: int,
+            client_connected_cb: callable, install_socket_func: callable,
+            send_ip_packet_func: callable, limit: int=STREAM_LIMIT,
+            **socket_args) -> TCPStreamServer:
+        self.sock = TCPListenerSocket(local_addr, local_port,
+                self.handle_new_client, send_ip_packet_func, lambda: None,
+                **socket_args)
+        self._client_connected_cb = client_connected_cb
+        self._install_socket = install_socket_func
+        self._limit = limit
+        # the tasks running client_connected_cb
+        self._tasks = set()
+
+    def handle_new_client(self, local_addr: str, local_port: int,
+            remote_addr: str, remote_port: int, sock: TCPSocket) -> None:
+        self._install_socket(local_addr, local_port, remote_addr,
+                remote_port, sock)
+        result = self._client_connected_cb(*attach(sock, self._limit))
+        if asyncio.iscoroutine(result):
+            task = asyncio.ensure_future(result)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+async def start_server(client_connected_cb: callable,
+        local_addr: str, local_port: int,
+        install_socket_func: callable, send_ip_packet_func: callable,
+        limit: int=STREAM_LIMIT, **socket_args) -> TCPStreamServer:
+    """
+    Start a server listening on local_addr:local_port, which calls
+    client_connected_cb(reader, writer) for each new connection, and return
+    it.  Its listener (the server's sock) is to be installed with the host.
+    The other arguments are as for open_connection(), with socket_args
+    passed to TCPListenerSocket.
+    """
+    return TCPStreamServer(local_addr, local_port, client_connected_cb,
+            install_socket_func, send_ip_packet_func, limit, **socket_args)
@@ -0,0 +1,149 @@
+"""Unit Tests for the SACK scoreboard of the TCP buffers"""
+import random
+import unittest
+
+from buffer import TCPSendBuffer, TCPReceiveBuffer
+
+
+def join(vectors: list) -> bytes:
+    return b''.join(vectors)
+
+
+class TestSackScoreboard(unittest.TestCase):
+
+    def setUp(self):
+        # ten 1000-byte segments, all sent, starting at sequence number 1000
+        self.data = bytes(i % 251 for i in range(10000))
+        self.buf = TCPSendBuffer(1000)
+        self.buf.put(self.data)
+        for _ in range(10):
+            self.buf.get_vectors(1000)
+
+    def segment(self, seq: int, size: int=1000) -> bytes:
+        return self.data[seq - 1000:seq - 1000 + size]
+
+    def test_sack_merges_blocks(self):
+        buf = self.buf
+        buf.sack([(4000, 5000)], 3000)
+        buf.sack([(5000, 6000)], 3000)
+        buf.sack([(7000, 8000), (4500, 5500)], 3000)
+        self.assertEqual(buf.bytes_sacked(), 3000)
+
+        # blocks outside the outstanding bytes are ignored, and a block
+        # straddling the edge is clipped
+        buf.sack([(100, 900), (11000, 12000), (10500, 11500)], 3000)
+        self.assertEqual(buf.bytes_sacked(), 3500)
+
+    def test_loss_needs_dup_thresh_sacked_above(self):
+        buf = self.buf
+        buf.sack([(4000, 6000)], 3000)
+        # 2000 bytes SACKed above the hole is not enough to presume loss
+        self.assertEqual(buf.bytes_sacked(), 2000)
+        self.assertEqual(buf.bytes_lost(), 0)
+        self.assertEqual(buf.bytes_in_flight(), 8000)
+        self.assertEqual(buf.get_vectors_for_hole(1000), ([], 1000))
+
+        buf.sack([(7000, 9000)], 3000)
+        # the hole below 4000 has 4000 bytes SACKed above it, but the one
+        # between 6000 and 7000 only 2000
+        self.assertEqual(buf.bytes_sacked(), 4000)
+        self.assertEqual(buf.bytes_lost(), 3000)
+        self.assertEqual(buf.bytes_in_flight(), 3000)
+
+    def test_holes_are_retransmitted_once(self):
+        buf = self.buf
+        buf.sack([(4000, 6000), (7000, 9000)], 3000)
+        for seq in (1000, 2000, 3000):
+            data, start = buf.get_vectors_for_hole(1000)
+            self.assertEqual(start, seq)
+            self.assertEqual(join(data), self.segment(seq))
+        self.assertEqual(buf.resend_seq, 4000)
+        self.assertEqual(buf.bytes_lost(), 0)
+        # nothing else is presumed lost
+        data, _ = buf.get_vectors_for_hole(1000)
+        self.assertEqual(data, [])
+
+    def test_mark_lost_goes_back_to_base(self):
+        buf = self.buf
+        buf.sack([(4000, 6000), (7000, 9000)], 3000)
+        buf.get_vectors_for_hole(1000)
+        buf.mark_lost()
+        # everything not SACKed is presumed lost, from base_seq on
+        self.assertEqual(buf.bytes_lost(), 6000)
+        self.assertEqual(buf.bytes_in_flight(), 0)
+        holes = []
+        while True:
+            data, seq = buf.get_vectors_for_hole(1000)
+            if not data:
+                break
+            self.assertEqual(join(data), self.segment(seq, len(join(data))))
+            holes.append((seq, len(join(data))))
+        self.assertEqual(holes, [(1000, 1000), (2000, 1000), (3000, 1000),
+            (6000, 1000), (9000, 1000), (10000, 1000)])
+
+    def test_resend_stops_at_sacked_range(self):
+        buf = self.buf
+        buf.sack([(3000, 4000)], 3000)
+        data, seq = buf.get_vectors_for_resend(5000)
+        self.assertEqual(seq, 1000)
+        self.assertEqual(join(data), self.segment(1000, 2000))
+
+    def test_slide_trims_scoreboard(self):
+        buf = self.buf
+        buf.sack([(4000, 6000), (7000, 9000)], 3000)
+        buf.slide(5000)
+        self.assertEqual(buf.base_seq, 5000)
+        self.assertEqual(buf.bytes_sacked(), 3000)
+        buf.slide(9000)
+        self.assertEqual(buf.bytes_sacked(), 0)
+        self.assertEqual(buf.bytes_lost(), 0)
+        self.assertEqual(buf.bytes_in_flight(), 2000)
+
+
+class TestSackBlocks(unittest.TestCase):
+
+    def test_sack_blocks(self):
+        buf = TCPReceiveBuffer(0)
+        self.assertEqual(buf.sack_blocks(4), [])
+
+        buf.put(b'a' * 100, 100)
+        buf.put(b'b' * 100, 300)
+        buf.put(b'c' * 100, 200)
+        self.assertEqual(buf.sack_blocks(4), [(100, 400)])
+
+        # the block holding the segment received last comes first
+        buf.put(b'd' * 100, 600)
+        buf.put(b'e' * 100, 800)
+        buf.put(b'f' * 50, 150)
+        self.assertEqual(buf.sack_blocks(4),
+                [(100, 400), (600, 700), (800, 900)])
+        buf.put(b'g' * 100, 600)
+        self.assertEqual(buf.sack_blocks(4),
+                [(600, 700), (100, 400), (800, 900)])
+        self.assertEqual(buf.sack_blocks(2), [(600, 700), (100, 400)])
+
+        # once the hole is filled, the first block is delivered
+        buf.put(b'h' * 100, 0)
+        data, seq = buf.get()
+        self.assertEqual((len(data), seq), (400, 0))
+        self.assertEqual(buf.sack_blocks(4), [(600, 700), (800, 900)])
+
+    def test_size(self):
+        # the running count of bytes held matches the segments held, through
+        # overlapping, duplicate and old segments
+        rand = random.Random(0)
+        buf = TCPReceiveBuffer(0)
+        received = 0
+        for _ in range(2000):
+            seq = received + rand.randrange(-500, 5000)
+            buf.put(b'x' * rand.randrange(1, 1500), seq)
+            self.assertEqual(buf.size, sum(map(len, buf.buffer.values())))
+            if rand.random() < 0.2:
+                data, _ = buf.get()
+                received += len(data)
+                self.assertEqual(buf.size,
+                        sum(map(len, buf.buffer.values())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Unit Tests for the Internet checksum"""
+import random
+import struct
+import unittest
+
+import checksum
+from checksum import IPPROTO_TCP, IPPROTO_UDP
+
+
+def reference_sum(data: bytes) -> int:
+    """The ones' complement sum of data, one 16-bit word at a time."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = 0
+    for word, in struct.iter_unpack('!H', data):
+        total += word
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+
+def random_ipv4_header(rand: random.Random) -> bytearray:
+    """A random 20-byte IPv4 header with its checksum filled in."""
+    hdr = bytearray(rand.randbytes(20))
+    hdr[0] = 0x45
+    hdr[8] = rand.randrange(2, 256) # a TTL that can be decremented
+    hdr[10:12] = b'\x00\x00'
+    hdr[10:12] = checksum.internet_checksum(hdr).to_bytes(2, 'big')
+    return hdr
+
+
+class TestChecksum(unittest.TestCase):
+
+    def test_ones_complement_sum(self):
+        # RFC 1071, section 3
+        data = bytes.fromhex('0001f203f4f5f6f7')
+        self.assertEqual(checksum.ones_complement_sum(data), 0xddf2)
+        self.assertEqual(checksum.internet_checksum(data), 0x220d)
+
+        # an odd length is padded with a zero byte
+        self.assertEqual(checksum.ones_complement_sum(b'\x01'), 0x0100)
+
+        rand = random.Random(0)
+        for size in (0, 1, 2, 3, 511, 512, 513, 1500, 65535):
+            data = rand.randbytes(size)
+            self.assertEqual(checksum.ones_complement_sum(data),
+                    reference_sum(data))
+
+
+    def test_ones_complement_sum_vectors(self):
+        rand = random.Random(1)
+        for _ in range(200):
+            pieces = [rand.randbytes(rand.randrange(0, 40))
+                    for _ in range(rand.randrange(1, 6))]
+            self.assertEqual(checksum.ones_complement_sum_vectors(pieces),
+                    checksum.ones_complement_sum(b''.join(pieces)))
+
+
+    def test_ipv4_header(self):
+        hdr = bytes.fromhex('450000730000400040110000c0a80001c0a800c7')
+        self.assertEqual(checksum.internet_checksum(hdr), 0xb861)
+
+        hdr = hdr[:10] + b'\xb8\x61' + hdr[12:]
+        self.assertTrue(checksum.verify_ipv4_header(hdr))
+        self.assertFalse(checksum.verify_ipv4_header(
+            hdr[:10] + b'\xb8\x62' + hdr[12:]))
+
+
+    def test_checksum_update16(self):
+        # RFC 1624, section 4
+        self.assertEqual(checksum.checksum_update16(0xdd2f, 0x5555, 0x3285),
+                0x0000)
+
+        rand = random.Random(2)
+        for _ in range(1000):
+            hdr = random_ipv4_header(rand)
+            cksum = int.from_bytes(hdr[10:12], 'big')
+            offset = rand.choice((0, 2, 4, 6, 8, 12, 14, 16, 18))
+            old = int.from_bytes(hdr[offset:offset + 2], 'big')
+            new = rand.randrange(0x10000)
+            hdr[offset:offset + 2] = new.to_bytes(2, 'big')
+            hdr[10:12] = b'\x00\x00'
+            self.assertEqual(checksum.checksum_update16(cksum, old, new),
+                    checksum.internet_checksum(hdr))
+
+
+    def test_decrement_ttl(self):
+        rand = random.Random(3)
+        for _ in range(20000):
+            hdr = random_ipv4_header(rand)
+            ttl = hdr[8]
+            self.assertEqual(checksum.decrement_ttl(hdr), ttl - 1)
+            self.assertTrue(checksum.verify_ipv4_header(hdr))
+            cksum = hdr[10:12]
+            hdr[10:12] = b'\x00\x00'
+            self.assertEqual(bytes(cksum),
+                    checksum.internet_checksum(hdr).to_bytes(2, 'big'))
+
+
+    def test_decrement_ttl_zero_checksum(self):
+        # 0x0000 is a valid header checksum, and must be updated too
+        hdr = random_ipv4_header(random.Random(4))
+        for ident in range(0x10000):
+            hdr[4:6] = ident.to_bytes(2, 'big')
+            hdr[10:12] = b'\x00\x00'
+            if checksum.internet_checksum(hdr) == 0:
+                break
+        self.assertTrue(checksum.verify_ipv4_header(hdr))
+        checksum.decrement_ttl(hdr)
+        self.assertTrue(checksum.verify_ipv4_header(hdr))
+
+
+    def test_fill_packet(self):
+        rand = random.Random(5)
+        for protocol in (IPPROTO_TCP, IPPROTO_UDP):
+            for size in (0, 1, 100, 1001):
+                hdr_len = 20 if protocol == IPPROTO_TCP else 8
+                pkt = bytearray(20 + hdr_len + size)
+                pkt[0] = 0x45
+                pkt[2:4] = len(pkt).to_bytes(2, 'big')
+                pkt[8] = 64
+                pkt[9] = protocol
+                pkt[12:20] = rand.randbytes(8)
+                pkt[20:] = rand.randbytes(hdr_len + size)
+                pkt = checksum.fill_packet(pkt)
+                self.assertTrue(checksum.verify_ipv4_header(pkt))
+                self.assertTrue(checksum.verify_transport(pkt))
+
+                # a flipped bit in the payload is caught
+                corrupted = bytearray(pkt)
+                corrupted[-1] ^= 0x01
+                self.assertFalse(checksum.verify_transport(corrupted))
+
+
+if __name__ == '__main__':
+    unittest.main()
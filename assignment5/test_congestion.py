@@ -0,0 +1,106 @@
+"""Unit Tests for the congestion control algorithms"""
+import types
+import unittest
+
+import congestion
+from buffer import TCPSendBuffer
+
+MSS = 1000
+
+
+def make_socket(outstanding: int, cwnd: int, ssthresh: int=1 << 30,
+        sack: bool=False) -> types.SimpleNamespace:
+    """
+    Return the parts of a TCPSocket that congestion control uses, with
+    outstanding bytes sent and not yet acknowledged.
+    """
+    send_buffer = TCPSendBuffer(0)
+    send_buffer.put(bytes(outstanding))
+    for _ in range(0, outstanding, MSS):
+        send_buffer.get_vectors(MSS)
+    return types.SimpleNamespace(mss=MSS, cwnd=cwnd, ssthresh=ssthresh,
+            sack=sack, send_buffer=send_buffer, srtt=None)
+
+
+class TestSlowStart(unittest.TestCase):
+
+    def test_growth_per_ack_is_limited(self):
+        for name in ('tahoe', 'reno', 'newreno', 'cubic'):
+            sock = make_socket(0, 10 * MSS, ssthresh=100 * MSS)
+            cc = congestion.create(name, sock)
+            cc.on_ack(MSS // 2)
+            self.assertEqual(sock.cwnd, 10 * MSS + MSS // 2, name)
+            # an ACK that covers much more (say, after holes are filled)
+            # grows cwnd by no more than TCP_ABC_LIMIT segments
+            cc.on_ack(50 * MSS)
+            self.assertEqual(sock.cwnd,
+                    10 * MSS + MSS // 2 + congestion.TCP_ABC_LIMIT * MSS,
+                    name)
+
+
+class TestSsthresh(unittest.TestCase):
+
+    def test_flight_size_is_capped_at_cwnd(self):
+        # with SACK, far more than cwnd may be outstanding, most of it
+        # already SACKed; ssthresh comes from no more than cwnd
+        for name, ssthresh in (('tahoe', 5 * MSS), ('reno', 5 * MSS),
+                ('newreno', 5 * MSS), ('cubic', 7 * MSS)):
+            sock = make_socket(40 * MSS, 10 * MSS, sack=True)
+            cc = congestion.create(name, sock)
+            cc.on_timeout()
+            self.assertEqual(sock.ssthresh, ssthresh, name)
+
+            sock = make_socket(40 * MSS, 10 * MSS, sack=True)
+            cc = congestion.create(name, sock)
+            for num_dup_acks in range(1, 4):
+                cc.on_dupack(num_dup_acks)
+            self.assertEqual(sock.ssthresh, ssthresh, name)
+
+    def test_flight_size_below_cwnd(self):
+        sock = make_socket(6 * MSS, 10 * MSS)
+        congestion.create('reno', sock).on_timeout()
+        self.assertEqual(sock.ssthresh, 3 * MSS)
+
+
+class TestFastRecovery(unittest.TestCase):
+
+    def enter_recovery(self, name: str, sack: bool):
+        sock = make_socket(10 * MSS, 10 * MSS, sack=sack)
+        cc = congestion.create(name, sock)
+        self.assertFalse(cc.on_dupack(1))
+        self.assertFalse(cc.on_dupack(2))
+        self.assertTrue(cc.on_dupack(3))
+        self.assertTrue(cc.in_recovery)
+        self.assertEqual(sock.ssthresh, 5 * MSS)
+        return sock, cc
+
+    def test_reno_inflates_cwnd(self):
+        sock, cc = self.enter_recovery('reno', sack=False)
+        # each duplicate ACK is a segment that has left the network
+        self.assertEqual(sock.cwnd, 8 * MSS)
+        cc.on_dupack(4)
+        self.assertEqual(sock.cwnd, 9 * MSS)
+        cc.on_recovery_exit()
+        self.assertEqual(sock.cwnd, 5 * MSS)
+
+    def test_reno_sack_does_not_inflate_cwnd(self):
+        # the bytes SACKed are already out of the pipe
+        sock, cc = self.enter_recovery('reno', sack=True)
+        self.assertEqual(sock.cwnd, 5 * MSS)
+        cc.on_dupack(4)
+        self.assertEqual(sock.cwnd, 5 * MSS)
+        cc.on_recovery_exit()
+        self.assertEqual(sock.cwnd, 5 * MSS)
+
+    def test_newreno_partial_ack(self):
+        sock, cc = self.enter_recovery('newreno', sack=False)
+        self.assertTrue(cc.on_partial_ack(2 * MSS))
+        self.assertEqual(sock.cwnd, 7 * MSS)
+
+        sock, cc = self.enter_recovery('newreno', sack=True)
+        self.assertTrue(cc.on_partial_ack(2 * MSS))
+        self.assertEqual(sock.cwnd, 5 * MSS)
+
+
+if __name__ == '__main__':
+    unittest.main()
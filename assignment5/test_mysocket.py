@@ -0,0 +1,667 @@
+"""Unit Tests for TCPSocket and TCPListenerSocket"""
+import asyncio
+import unittest
+from unittest import mock
+
+from probe import TCPProbe
+from headers import IPv4Header, TCPHeader, IPv4View, TCPView, \
+        IP_HEADER_LEN, TCP_OPTION_MSS
+from mysocket import TCPSocket, TCPListenerSocket, IPPROTO_TCP, \
+        TCP_FLAGS_SYN, TCP_FLAGS_ACK, TCP_FLAGS_FIN, TCP_FLAGS_RST, \
+        TCP_STATE_ESTABLISHED, TCP_STATE_FIN_WAIT_1, TCP_STATE_FIN_WAIT_2, \
+        TCP_STATE_CLOSE_WAIT, TCP_STATE_CLOSING, TCP_STATE_LAST_ACK, \
+        TCP_STATE_SYN_RECEIVED, TCP_STATE_TIME_WAIT, TCP_STATE_CLOSED, \
+        TCP_SYN_COOKIE_PERIOD, TCP_FAST_OPEN_COOKIE_LEN
+
+CLIENT_ADDR = '10.0.0.1'
+CLIENT_PORT = 34567
+SERVER_ADDR = '10.0.0.2'
+SERVER_PORT = 4567
+
+
+def segment(src: str, sport: int, dst: str, dport: int, seq: int, ack: int,
+        flags: int, window: int=65535, data: bytes=b'',
+        options: dict=None) -> bytes:
+    """Return an IP packet holding a TCP segment."""
+    tcp_hdr = TCPHeader(sport, dport, seq, ack, flags, 0, options,
+            window).to_bytes()
+    ip_hdr = IPv4Header(IP_HEADER_LEN + len(tcp_hdr) + len(data), 64,
+            IPPROTO_TCP, 0, src, dst).to_bytes()
+    return ip_hdr + tcp_hdr + data
+
+
+class Network:
+    """
+    Carries packets between sockets, by hand: the packets sent are queued,
+    until deliver() hands them to the socket of their destination.
+    """
+    def __init__(self):
+        self.sockets = {}
+        self.queue = []
+
+    def send(self, pkt: bytes) -> None:
+        self.queue.append(bytes(pkt))
+
+    def install(self, local_addr, local_port, remote_addr, remote_port,
+            sock):
+        self.sockets[(local_addr, local_port, remote_addr, remote_port)] = \
+                sock
+
+    def remove(self, local_addr, local_port, remote_addr, remote_port,
+            sock):
+        key = (local_addr, local_port, remote_addr, remote_port)
+        if self.sockets.get(key) is sock:
+            del self.sockets[key]
+
+    def deliver_one(self, pkt: bytes) -> None:
+        ip_hdr = IPv4View(pkt)
+        tcp_hdr = TCPView(ip_hdr.payload)
+        sock = self.sockets.get((ip_hdr.dst, tcp_hdr.dport, ip_hdr.src,
+            tcp_hdr.sport))
+        if sock is None:
+            sock = self.sockets.get((ip_hdr.dst, tcp_hdr.dport, None, None))
+        if sock is not None:
+            sock.handle_packet(pkt)
+
+    def deliver(self, drop: callable=None) -> list[bytes]:
+        """
+        Deliver the packets queued, and those sent in answer, until there
+        are none left, except those for which drop(pkt) is true.  Return
+        the packets delivered.
+        """
+        delivered = []
+        while self.queue:
+            pkt = self.queue.pop(0)
+            if drop is not None and drop(pkt):
+                continue
+            delivered.append(pkt)
+            self.deliver_one(pkt)
+        return delivered
+
+
+def payload(pkt: bytes) -> bytes:
+    return bytes(TCPView(IPv4View(pkt).payload).payload)
+
+def flags(pkt: bytes) -> int:
+    return TCPView(IPv4View(pkt).payload).flags
+
+def from_client(pkt: bytes) -> bool:
+    return IPv4View(pkt).src == CLIENT_ADDR
+
+
+class SocketTestCase(unittest.TestCase):
+    """A client and a server on a Network, driven by an event loop."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.net = Network()
+        self.server = None
+        self.received = b''
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_for(self, seconds: float) -> None:
+        """Let the event loop (and the timers) run for seconds."""
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def accept(self, local_addr, local_port, remote_addr, remote_port,
+            sock):
+        self.net.install(local_addr, local_port, remote_addr, remote_port,
+                sock)
+        sock._notify_on_data = self.server_received
+        self.server = sock
+
+    def server_received(self):
+        self.received += self.server.recv(self.server.ready_buffer_size)
+
+    def listen(self, **socket_args) -> TCPListenerSocket:
+        listener = TCPListenerSocket(SERVER_ADDR, SERVER_PORT, self.accept,
+                self.net.send, lambda: None,
+                remove_socket_func=self.net.remove, **socket_args)
+        self.net.install(SERVER_ADDR, SERVER_PORT, None, None, listener)
+        return listener
+
+    def connect(self, port: int=CLIENT_PORT, **socket_args) -> TCPSocket:
+        client = TCPSocket.connect(CLIENT_ADDR, port, SERVER_ADDR,
+                SERVER_PORT, self.net.send, lambda: None,
+                remove_socket_func=self.net.remove, **socket_args)
+        self.net.install(CLIENT_ADDR, port, SERVER_ADDR, SERVER_PORT, client)
+        return client
+
+    def establish(self, **socket_args) -> tuple[TCPSocket, TCPSocket]:
+        """Connect a client to a server, and return both sockets."""
+        self.listen(**socket_args)
+        client = self.connect(**socket_args)
+        self.net.deliver()
+        self.assertIsNotNone(self.server)
+        return client, self.server
+
+    def to_client(self, client: TCPSocket, ack: int, window: int=65535,
+            data: bytes=b'', flags: int=TCP_FLAGS_ACK) -> bytes:
+        """A segment from the server to client, as if the server sent it."""
+        return segment(SERVER_ADDR, SERVER_PORT, CLIENT_ADDR, CLIENT_PORT,
+                client.ack, ack, flags, window, data)
+
+
+class TestDuplicateAcks(SocketTestCase):
+
+    def test_window_update_is_not_a_dup_ack(self):
+        client, _ = self.establish(fast_retransmit=True,
+                congestion_control='reno', initial_cwnd=10000)
+        client.send(b'x' * 5000)
+        # the data is lost
+        self.net.queue.clear()
+        base = client.send_buffer.base_seq
+
+        # ACKs that repeat the acknowledgment number but open the window
+        for window in (30000, 40000, 50000):
+            self.net.deliver_one(self.to_client(client, base, window))
+        self.assertEqual(client.dup_acks_received, 0)
+        self.assertEqual(client.retransmits, 0)
+
+        # three duplicate ACKs trigger a fast retransmit
+        for _ in range(3):
+            self.net.deliver_one(self.to_client(client, base, 50000))
+        self.assertEqual(client.dup_acks_received, 3)
+        self.assertEqual(client.retransmits, 1)
+        retransmitted = [pkt for pkt in self.net.queue if payload(pkt)]
+        self.assertEqual(len(retransmitted), 1)
+        self.assertEqual(TCPView(IPv4View(retransmitted[0]).payload).seq,
+                base)
+
+
+    def test_fast_recovery_implies_fast_retransmit(self):
+        for name in ('reno', 'newreno', 'cubic'):
+            with self.subTest(name):
+                client = TCPSocket(CLIENT_ADDR, CLIENT_PORT, SERVER_ADDR,
+                        SERVER_PORT, TCP_STATE_ESTABLISHED, self.net.send,
+                        lambda: None, congestion_control=name)
+                self.assertTrue(client.fast_retransmit)
+        for name in ('none', 'tahoe', 'bbr'):
+            with self.subTest(name):
+                client = TCPSocket(CLIENT_ADDR, CLIENT_PORT, SERVER_ADDR,
+                        SERVER_PORT, TCP_STATE_ESTABLISHED, self.net.send,
+                        lambda: None, congestion_control=name)
+                self.assertFalse(client.fast_retransmit)
+
+    def test_reno_fast_recovery(self):
+        # with fast_retransmit left unset
+        client, _ = self.establish(congestion_control='reno',
+                initial_cwnd=10000)
+        client.send(b'x' * 10000)
+        self.net.queue.clear()
+        base = client.send_buffer.base_seq
+        for _ in range(3):
+            self.net.deliver_one(self.to_client(client, base))
+        self.assertEqual(client.retransmits, 1)
+        self.assertTrue(client.congestion.in_recovery)
+        self.assertEqual(client.ssthresh, 5000)
+        self.assertEqual(client.cwnd, 8000)
+
+
+class TestSackLoss(SocketTestCase):
+
+    def lose_second_segment(self, **socket_args) -> TCPSocket:
+        """Send 20 segments, losing the second, and return the client."""
+        client, _ = self.establish(sack=True, initial_cwnd=20000,
+                **socket_args)
+        data = bytes(i % 251 for i in range(20000))
+        client.send(data)
+        self.assertEqual(payload(self.net.queue.pop(1)), data[1000:2000])
+        self.net.deliver()
+        self.assertEqual(self.received, data)
+        self.assertEqual(client.timeouts, 0)
+        self.assertEqual(client.retransmits, 1)
+        return client
+
+    # the loss found through the SACK scoreboard is answered by the
+    # congestion control as three duplicate ACKs would be, whether or not
+    # fast_retransmit is set: ssthresh is half the 19000 bytes in flight
+    # when the loss was found
+
+    def test_reno(self):
+        client = self.lose_second_segment(congestion_control='reno')
+        self.assertEqual(client.ssthresh, 9500)
+        self.assertEqual(client.cwnd, 9500)
+
+    def test_tahoe(self):
+        client = self.lose_second_segment(congestion_control='tahoe')
+        self.assertFalse(client.fast_retransmit)
+        self.assertEqual(client.ssthresh, 9500)
+        self.assertLess(client.cwnd, 9500)
+
+    def test_tahoe_fast_retransmit(self):
+        client = self.lose_second_segment(congestion_control='tahoe',
+                fast_retransmit=True)
+        self.assertEqual(client.ssthresh, 9500)
+        self.assertLess(client.cwnd, 9500)
+
+
+class TestZeroWindow(SocketTestCase):
+
+    def close_window(self, client: TCPSocket) -> bytes:
+        """
+        Have client send data, have it all acknowledged with a zero window,
+        then queue more; return what was queued.
+        """
+        client.send(b'x' * 3000)
+        self.net.queue.clear()
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.next_seq, 0))
+        data = b'y' * 2000
+        client.send(data)
+        self.assertEqual(client.send_buffer.bytes_not_yet_sent(), 2000)
+        self.assertIsNotNone(client.persist_timer)
+        return data
+
+    def test_window_update_resumes_sending(self):
+        client, _ = self.establish(initial_cwnd=10000)
+        data = self.close_window(client)
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.next_seq, 65535))
+        self.assertIsNone(client.persist_timer)
+        self.assertEqual(b''.join(map(payload, self.net.queue)), data)
+
+    def test_window_opened_by_data_segment(self):
+        # the window opens on a segment that carries data and acknowledges
+        # nothing new: the persist timer is stopped, so sending resumes now
+        client, _ = self.establish(initial_cwnd=10000)
+        data = self.close_window(client)
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.next_seq, 65535, b'hello'))
+        self.assertIsNone(client.persist_timer)
+        self.assertEqual(client.send_buffer.bytes_not_yet_sent(), 0)
+        self.assertEqual(b''.join(map(payload, self.net.queue)), data)
+
+
+class TestProbe(SocketTestCase):
+
+    def test_records_every_ack(self):
+        client, _ = self.establish(initial_cwnd=10000)
+        probe = TCPProbe(16)
+        probe.attach(client)
+        client.send(b'x' * 3000)
+        self.net.queue.clear()
+        base = client.send_buffer.base_seq
+        self.net.deliver_one(self.to_client(client, base + 1000))
+        # an ACK piggybacked on data, that acknowledges nothing new
+        self.net.deliver_one(self.to_client(client, base + 1000,
+            data=b'hello'))
+        # data out of order, held in the receive buffer
+        self.net.deliver_one(segment(SERVER_ADDR, SERVER_PORT, CLIENT_ADDR,
+            CLIENT_PORT, client.ack + 100, base + 1000, TCP_FLAGS_ACK,
+            data=b'y' * 200))
+        self.assertEqual(probe.count, 3)
+        columns = probe.columns()
+        self.assertEqual(list(columns['receive_buffer_bytes']), [0, 0, 200])
+        self.assertEqual(list(columns['ready_buffer_bytes']), [0, 5, 5])
+        self.assertEqual(client.get_info().receive_buffer_bytes, 200)
+
+
+class TestRetransmissionTimeout(SocketTestCase):
+
+    def test_timeout_resends_all_outstanding(self):
+        client, _ = self.establish(initial_cwnd=10000)
+        data = bytes(i % 251 for i in range(5000))
+        client.send(data)
+        # all five segments are lost
+        self.net.queue.clear()
+        self.run_for(client.timeout + 0.1)
+        self.assertEqual(client.timeouts, 1)
+
+        # after the timeout, everything outstanding is presumed lost, and
+        # each ACK for a retransmission releases more of it, without
+        # waiting for another timeout (go-back-N)
+        self.net.deliver()
+        self.assertEqual(self.received, data)
+        self.assertEqual(client.timeouts, 1)
+        self.assertEqual(client.retransmits, 5)
+        self.assertEqual(client.send_buffer.bytes_outstanding(), 0)
+
+
+class TestTeardown(SocketTestCase):
+
+    TIME_WAIT = 0.05
+
+    def establish(self, **socket_args) -> tuple[TCPSocket, TCPSocket]:
+        socket_args.setdefault('time_wait', self.TIME_WAIT)
+        return super().establish(**socket_args)
+
+    def assertRemoved(self, sock: TCPSocket) -> None:
+        self.assertEqual(sock.state, TCP_STATE_CLOSED)
+        self.assertNotIn(sock, self.net.sockets.values())
+
+    def test_active_close(self):
+        client, server = self.establish(initial_cwnd=10000)
+        data = bytes(i % 251 for i in range(5000))
+        client.send(data)
+        client.close()
+        self.assertEqual(client.state, TCP_STATE_FIN_WAIT_1)
+        # the FIN follows the data
+        fin, = [pkt for pkt in self.net.queue if flags(pkt) & TCP_FLAGS_FIN]
+        self.assertIs(fin, self.net.queue[-1])
+        self.net.deliver()
+        self.assertEqual(self.received, data)
+        self.assertTrue(server.fin_received)
+        self.assertEqual(server.state, TCP_STATE_CLOSE_WAIT)
+        self.assertEqual(client.state, TCP_STATE_FIN_WAIT_2)
+
+        # the server can still send, until it closes its side
+        server.send(b'bye')
+        server.close()
+        self.assertEqual(server.state, TCP_STATE_LAST_ACK)
+        self.net.deliver()
+        self.assertEqual(client.recv(10), b'bye')
+        self.assertRemoved(server)
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+        self.run_for(self.TIME_WAIT + 0.05)
+        self.assertRemoved(client)
+
+    def test_simultaneous_close(self):
+        client, server = self.establish()
+        client.close()
+        server.close()
+        # the FINs cross
+        client_fin, server_fin = self.net.queue
+        self.net.queue.clear()
+        self.net.deliver_one(client_fin)
+        self.net.deliver_one(server_fin)
+        self.assertEqual(client.state, TCP_STATE_CLOSING)
+        self.assertEqual(server.state, TCP_STATE_CLOSING)
+        self.net.deliver()
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+        self.assertEqual(server.state, TCP_STATE_TIME_WAIT)
+        self.run_for(self.TIME_WAIT + 0.05)
+        self.assertRemoved(client)
+        self.assertRemoved(server)
+
+    def test_lost_fin_is_retransmitted(self):
+        client, server = self.establish()
+        client.close()
+        self.net.queue.clear()
+        self.run_for(client.timeout + 0.1)
+        self.assertEqual(client.retransmits, 1)
+        self.net.deliver()
+        self.assertEqual(server.state, TCP_STATE_CLOSE_WAIT)
+        self.assertEqual(client.state, TCP_STATE_FIN_WAIT_2)
+
+    def test_lost_ack_of_fin(self):
+        # TIME_WAIT outlasts the server's RTO
+        client, server = self.establish(time_wait=5)
+        client.close()
+        self.net.deliver()
+        server.close()
+        # the client's ACK of the server's FIN is lost
+        self.net.deliver(drop=from_client)
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+        self.assertEqual(server.state, TCP_STATE_LAST_ACK)
+
+        # the FIN is retransmitted, and acknowledged again from TIME_WAIT,
+        # which starts over
+        self.run_for(server.timeout + 0.1)
+        self.assertTrue(flags(self.net.queue[0]) & TCP_FLAGS_FIN)
+        deadline = self.loop.time() + 5
+        self.net.deliver()
+        self.assertRemoved(server)
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+        self.assertGreaterEqual(client.time_wait_timer.when(), deadline)
+
+    def test_fin_after_missing_data(self):
+        client, server = self.establish(initial_cwnd=10000)
+        client.send(b'x' * 2000)
+        client.close()
+        # the first segment is lost: the FIN is not acknowledged until it
+        # is retransmitted
+        first = self.net.queue.pop(0)
+        self.net.deliver()
+        self.assertFalse(server.fin_received)
+        self.assertEqual(server.state, TCP_STATE_ESTABLISHED)
+        self.net.deliver_one(first)
+        self.assertEqual(self.received, b'x' * 2000)
+        self.net.deliver()
+        self.run_for(client.timeout + 0.1)
+        self.net.deliver()
+        self.assertTrue(server.fin_received)
+        self.assertEqual(server.state, TCP_STATE_CLOSE_WAIT)
+        self.assertEqual(client.state, TCP_STATE_FIN_WAIT_2)
+
+    def test_rst_in_time_wait_is_ignored(self):
+        # RFC 1337
+        client, server = self.establish()
+        client.close()
+        self.net.deliver()
+        server.close()
+        self.net.deliver()
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.next_seq, flags=TCP_FLAGS_RST))
+        self.assertEqual(client.state, TCP_STATE_TIME_WAIT)
+
+    def test_rst_aborts(self):
+        client, server = self.establish()
+        client.send(b'x' * 1000)
+        self.net.queue.clear()
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.base_seq, flags=TCP_FLAGS_RST))
+        self.assertRemoved(client)
+        self.assertIsNone(client.timer)
+
+
+class TestHandshake(SocketTestCase):
+
+    def test_final_ack_lost(self):
+        # the final ACK of the handshake and the first data segment are
+        # lost: the next segment completes the handshake instead
+        listener = self.listen()
+        client = self.connect(initial_cwnd=10000)
+        self.net.deliver_one(self.net.queue.pop(0))
+        self.net.deliver_one(self.net.queue.pop(0))
+        self.assertEqual(client.state, TCP_STATE_ESTABLISHED)
+        data = bytes(i % 251 for i in range(3000))
+        client.send(data)
+        final_ack, first = self.net.queue[:2]
+        self.assertFalse(payload(final_ack))
+        self.assertEqual(payload(first), data[:1000])
+        del self.net.queue[:2]
+
+        self.net.deliver()
+        self.assertIsNotNone(self.server)
+        self.assertEqual(self.server.state, TCP_STATE_ESTABLISHED)
+        self.assertEqual(client.state, TCP_STATE_ESTABLISHED)
+        self.assertFalse(listener._syn_queue)
+        # the lost segment is resent
+        self.run_for(1.5)
+        self.net.deliver()
+        self.assertEqual(self.received, data)
+
+    def test_segment_outside_window(self):
+        listener = self.listen(receive_buffer_size=4000)
+        client = self.connect()
+        self.net.deliver_one(self.net.queue.pop(0))
+        self.net.queue.clear()
+        request = listener._syn_queue[(CLIENT_ADDR, CLIENT_PORT)]
+        self.net.deliver_one(segment(CLIENT_ADDR, CLIENT_PORT, SERVER_ADDR,
+            SERVER_PORT, request.seq + 1 + 4000, request.isn + 1,
+            TCP_FLAGS_ACK, data=b'x'))
+        self.assertIsNone(self.server)
+        self.assertIn((CLIENT_ADDR, CLIENT_PORT), listener._syn_queue)
+
+
+class TestSynCookies(SocketTestCase):
+
+    def test_cookie_encodes_mss(self):
+        listener = self.listen(syn_cookies=True)
+        for mss, expected in ((None, 536), (536, 536), (1000, 1000),
+                (1459, 1440), (1460, 1460), (9000, 8960)):
+            options = {} if mss is None else {TCP_OPTION_MSS: mss}
+            cookie = listener.syn_cookie(CLIENT_ADDR, CLIENT_PORT, 1234,
+                    options)
+            self.assertLess(cookie, 1 << 31)
+            self.assertEqual(listener.check_syn_cookie(CLIENT_ADDR,
+                CLIENT_PORT, cookie, 1234), expected)
+
+    def test_invalid_cookies(self):
+        listener = self.listen(syn_cookies=True)
+        cookie = listener.syn_cookie(CLIENT_ADDR, CLIENT_PORT, 1234, {})
+        check = listener.check_syn_cookie
+        self.assertIsNotNone(check(CLIENT_ADDR, CLIENT_PORT, cookie, 1234))
+        # for another connection, or another ISN
+        self.assertIsNone(check('10.0.0.3', CLIENT_PORT, cookie, 1234))
+        self.assertIsNone(check(CLIENT_ADDR, CLIENT_PORT + 1, cookie, 1234))
+        self.assertIsNone(check(CLIENT_ADDR, CLIENT_PORT, cookie, 1235))
+        # tampered with
+        for bit in (0, 22, 23, 31):
+            self.assertIsNone(check(CLIENT_ADDR, CLIENT_PORT,
+                cookie ^ 1 << bit, 1234), bit)
+        # from a listener with another secret
+        other = TCPListenerSocket(SERVER_ADDR, SERVER_PORT, self.accept,
+                self.net.send, lambda: None, syn_cookies=True)
+        self.assertIsNone(other.check_syn_cookie(CLIENT_ADDR, CLIENT_PORT,
+            cookie, 1234))
+
+    def test_cookie_expires(self):
+        listener = self.listen(syn_cookies=True)
+        start = 1000 * TCP_SYN_COOKIE_PERIOD
+        with mock.patch('mysocket.time.monotonic', return_value=start):
+            cookie = listener.syn_cookie(CLIENT_ADDR, CLIENT_PORT, 1234, {})
+        for periods, valid in ((0.5, True), (1.5, True), (2, False),
+                (31, False), (32, False)):
+            with mock.patch('mysocket.time.monotonic',
+                    return_value=start + periods * TCP_SYN_COOKIE_PERIOD):
+                self.assertEqual(listener.check_syn_cookie(CLIENT_ADDR,
+                    CLIENT_PORT, cookie, 1234) is not None, valid, periods)
+
+    def fill_syn_queue(self):
+        """Leave one connection half-open."""
+        self.connect(port=1111)
+        self.net.deliver_one(self.net.queue.pop())
+        # the SYNACK is lost
+        self.net.queue.clear()
+
+    def test_connection_with_cookie(self):
+        listener = self.listen(syn_backlog=1, syn_cookies=True, sack=True,
+                mss=1460)
+        self.fill_syn_queue()
+        client = self.connect(mss=1300, sack=True)
+        self.net.deliver()
+        self.assertEqual(listener.syn_cookies_sent, 1)
+        self.assertEqual(listener.syn_cookies_accepted, 1)
+        server = self.server
+        self.assertIsNotNone(server)
+        self.assertEqual(server.state, TCP_STATE_ESTABLISHED)
+        self.assertEqual(client.state, TCP_STATE_ESTABLISHED)
+        # the MSS survives in the cookie; the other options do not
+        self.assertEqual(server.mss, 1300)
+        self.assertFalse(server.sack)
+        self.assertFalse(client.sack)
+
+        client.send(b'x' * 5000)
+        self.net.deliver()
+        self.assertEqual(self.received, b'x' * 5000)
+
+    def test_queue_full_without_cookies(self):
+        listener = self.listen(syn_backlog=1)
+        self.fill_syn_queue()
+        self.connect()
+        self.net.deliver()
+        self.assertEqual(listener.syn_dropped, 1)
+        self.assertIsNone(self.server)
+
+    def test_forged_ack(self):
+        listener = self.listen(syn_backlog=1, syn_cookies=True)
+        self.net.deliver_one(segment(CLIENT_ADDR, CLIENT_PORT, SERVER_ADDR,
+            SERVER_PORT, 1235, 98765, TCP_FLAGS_ACK))
+        self.assertEqual(listener.syn_cookies_accepted, 0)
+        self.assertIsNone(self.server)
+        rst, = self.net.queue
+        self.assertTrue(flags(rst) & TCP_FLAGS_RST)
+
+
+class TestFastOpen(SocketTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cookies = {}
+        self.listener = self.listen(fast_open=True, initial_cwnd=10000)
+
+    def connect(self, port: int=CLIENT_PORT, data: bytes=b'') -> TCPSocket:
+        """Connect with Fast Open, sending data, and return the SYN."""
+        client = super().connect(port, fast_open=True,
+                fast_open_cookies=self.cookies)
+        client.send(data)
+        # the SYN goes out once the event loop runs
+        self.assertEqual(self.net.queue, [])
+        self.run_for(0)
+        syn, = self.net.queue
+        self.assertEqual(flags(syn), TCP_FLAGS_SYN)
+        return client, syn
+
+    def get_cookie(self) -> None:
+        """Make a first connection, to get a cookie."""
+        client, syn = self.connect(data=b'first')
+        # no cookie yet: the SYN asks for one, without data
+        self.assertEqual(payload(syn), b'')
+        self.net.deliver()
+        self.assertEqual(self.received, b'first')
+        cookie, _ = self.cookies[SERVER_ADDR]
+        self.assertEqual(len(cookie), TCP_FAST_OPEN_COOKIE_LEN)
+        self.assertEqual(self.listener.fast_open_accepted, 0)
+        self.received = b''
+
+    def test_cookie_accepted(self):
+        self.get_cookie()
+        client, syn = self.connect(2222, b'hello')
+        self.assertEqual(payload(syn), b'hello')
+        self.net.queue.clear()
+        self.net.deliver_one(syn)
+        # the server takes the data before the handshake completes
+        self.assertEqual(self.listener.fast_open_accepted, 1)
+        self.assertEqual(self.server.state, TCP_STATE_SYN_RECEIVED)
+        self.assertEqual(self.received, b'hello')
+        self.server.send(b'answer')
+        self.net.deliver()
+        self.assertEqual(client.state, TCP_STATE_ESTABLISHED)
+        self.assertEqual(self.server.state, TCP_STATE_ESTABLISHED)
+        self.assertEqual(client.recv(100), b'answer')
+        self.assertEqual(client.retransmits, 0)
+        self.assertEqual(self.received, b'hello')
+
+    def test_cookie_rejected(self):
+        self.get_cookie()
+        cookie, mss = self.cookies[SERVER_ADDR]
+        self.cookies[SERVER_ADDR] = (bytes(TCP_FAST_OPEN_COOKIE_LEN), mss)
+        client, syn = self.connect(2222, b'hello')
+        self.assertEqual(payload(syn), b'hello')
+        self.net.deliver()
+        # the data is sent again, once the connection is established, and
+        # the client has the valid cookie
+        self.assertEqual(self.listener.fast_open_rejected, 1)
+        self.assertEqual(self.listener.fast_open_accepted, 0)
+        self.assertEqual(self.received, b'hello')
+        self.assertEqual(client.state, TCP_STATE_ESTABLISHED)
+        self.assertEqual(self.cookies[SERVER_ADDR], (cookie, mss))
+
+    def test_close_in_syn_received(self):
+        self.get_cookie()
+        client, syn = self.connect(2222, b'hello')
+        self.net.queue.clear()
+        self.net.deliver_one(syn)
+        server = self.server
+        server.send(b'bye')
+        server.close()
+        # the close waits for the handshake to complete
+        self.assertEqual(server.state, TCP_STATE_SYN_RECEIVED)
+        self.assertFalse([pkt for pkt in self.net.queue
+            if flags(pkt) & TCP_FLAGS_FIN])
+        self.net.deliver()
+        self.assertEqual(client.recv(100), b'bye')
+        self.assertTrue(client.fin_received)
+        self.assertEqual(client.state, TCP_STATE_CLOSE_WAIT)
+        self.assertEqual(server.state, TCP_STATE_FIN_WAIT_2)
+
+
+if __name__ == '__main__':
+    unittest.main()
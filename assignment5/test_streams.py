@@ -0,0 +1,99 @@
+"""Unit Tests for the streams API over TCPSocket"""
+import asyncio
+import unittest
+
+import streams
+from mysocket import TCP_FLAGS_RST
+from test_mysocket import SocketTestCase
+
+
+class TestStreams(SocketTestCase):
+
+    def attach(self, **socket_args):
+        """Connect, and return the client's reader and writer."""
+        client, server = self.establish(**socket_args)
+        server._notify_on_data = lambda: None
+        return client, server, streams.attach(client)
+
+    def run_soon(self) -> None:
+        """Let the tasks run, until they wait."""
+        for _ in range(3):
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_data_does_not_wake_drain(self):
+        client, server, (reader, writer) = self.attach()
+        writer.set_write_buffer_limits(high=1000)
+        writer.write(b'x' * 10000)
+        # the data sent is lost, so none of it is acknowledged
+        self.net.queue.clear()
+        drain = self.loop.create_task(writer.drain())
+        self.run_soon()
+        waiter, = writer._waiters
+
+        # data that acknowledges nothing wakes the reader only
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.base_seq, data=b'hello'))
+        self.assertFalse(waiter.done())
+        self.loop.run_until_complete(reader.read(5))
+
+        # an ACK that makes room in the send buffer wakes drain()
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.next_seq))
+        self.assertTrue(waiter.done())
+        self.run_soon()
+        # above the low-water mark still
+        self.assertFalse(drain.done())
+        drain.cancel()
+        self.run_soon()
+
+    def test_ack_does_not_wake_reader(self):
+        client, server, (reader, writer) = self.attach()
+        read = self.loop.create_task(reader.read(100))
+        self.run_soon()
+        waiter = reader._waiter
+        writer.write(b'x' * 500)
+        self.net.deliver()
+        self.assertFalse(waiter.done())
+
+        server.send(b'hello')
+        self.net.deliver()
+        self.run_soon()
+        self.assertEqual(read.result(), b'hello')
+
+    def test_reset_wakes_reader(self):
+        client, server, (reader, writer) = self.attach()
+        read = self.loop.create_task(reader.read(100))
+        self.run_soon()
+        self.net.deliver_one(self.to_client(client,
+            client.send_buffer.base_seq, flags=TCP_FLAGS_RST))
+        self.run_soon()
+        self.assertIsInstance(read.exception(), ConnectionResetError)
+
+    def test_eof(self):
+        client, server, (reader, writer) = self.attach(time_wait=0.05)
+        read = self.loop.create_task(reader.read())
+        self.run_soon()
+        server.send(b'bye')
+        server.close()
+        self.net.deliver()
+        self.run_soon()
+        self.assertEqual(read.result(), b'bye')
+        self.assertTrue(reader.at_eof())
+
+    def test_wait_closed(self):
+        # closed actively: the remote FIN moves the socket on from
+        # FIN_WAIT_2 to TIME_WAIT
+        client, server, (reader, writer) = self.attach(time_wait=0.05)
+        writer.close()
+        self.net.deliver()
+        wait_closed = self.loop.create_task(writer.wait_closed())
+        self.run_soon()
+        self.assertFalse(wait_closed.done())
+        server.close()
+        self.net.deliver()
+        self.run_soon()
+        self.assertTrue(wait_closed.done())
+
+
+if __name__ == '__main__':
+    unittest.main()
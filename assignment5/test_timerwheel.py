@@ -0,0 +1,128 @@
+"""Unit Tests for the hashed timer wheel"""
+import asyncio
+import unittest
+
+from timerwheel import TimerWheel
+
+# a short tick, and a small wheel (one revolution is 40 ms), so that the
+# tests also cover timers more than a revolution away
+TICK = 0.005
+SLOTS = 8
+
+
+class TestTimerWheel(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.wheel = TimerWheel(TICK, SLOTS)
+        self.fired = []
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_for(self, seconds: float) -> None:
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def record(self, name: str) -> None:
+        self.fired.append((name, self.loop.time()))
+
+    def assertFiredOnce(self, name: str, deadline: float) -> None:
+        times = [t for n, t in self.fired if n == name]
+        self.assertEqual(len(times), 1, name)
+        # no earlier than the deadline, and within a few ticks of it
+        self.assertGreaterEqual(times[0], deadline)
+        self.assertLess(times[0], deadline + 0.05)
+
+    def assertIdle(self) -> None:
+        self.assertEqual(self.wheel.entries, 0)
+        self.assertIsNone(self.wheel._handle)
+
+    def test_timers_fire_in_order(self):
+        start = self.loop.time()
+        for delay in (0.03, 0.01, 0.02, 0.1):
+            self.wheel.call_later(delay, self.record, delay)
+        self.run_for(0.15)
+        self.assertEqual([name for name, _ in self.fired],
+                [0.01, 0.02, 0.03, 0.1])
+        for delay in (0.01, 0.02, 0.03, 0.1):
+            self.assertFiredOnce(delay, start + delay)
+        self.assertIdle()
+
+    def test_cancel(self):
+        timer = self.wheel.call_later(0.01, self.record, 'a')
+        self.wheel.call_later(0.02, self.record, 'b')
+        timer.cancel()
+        self.assertTrue(timer.cancelled())
+        self.assertIsNone(timer.when())
+        self.run_for(0.05)
+        self.assertEqual([name for name, _ in self.fired], ['b'])
+        # the cancelled entry is dropped when its slot comes up
+        self.assertIdle()
+
+    def test_rearm_later(self):
+        start = self.loop.time()
+        timer = self.wheel.call_later(0.01, self.record, 'a')
+        # re-arming for later keeps the entry already filed
+        for delay in (0.02, 0.03, 0.06):
+            timer.rearm(delay)
+        self.assertEqual(self.wheel.entries, 1)
+        self.run_for(0.1)
+        self.assertFiredOnce('a', start + 0.06)
+        self.assertIdle()
+
+    def test_rearm_earlier(self):
+        start = self.loop.time()
+        timer = self.wheel.call_later(0.08, self.record, 'a')
+        timer.rearm(0.01)
+        self.run_for(0.12)
+        # the timer fires once, at the earlier deadline; the entry of the
+        # later one is dropped
+        self.assertFiredOnce('a', start + 0.01)
+        self.assertIdle()
+
+    def test_rearm_after_firing(self):
+        timer = self.wheel.call_later(0.01, self.record, 'a')
+        self.run_for(0.03)
+        self.assertEqual(len(self.fired), 1)
+        self.assertIsNone(timer.when())
+        self.assertIdle()
+        start = self.loop.time()
+        timer.rearm(0.01)
+        self.run_for(0.03)
+        self.assertEqual(len(self.fired), 2)
+        self.assertGreaterEqual(self.fired[1][1], start + 0.01)
+        self.assertIdle()
+
+    def test_callback_rearms_timer(self):
+        # a callback can re-arm its own timer (as a periodic timer would)
+        count = 0
+        def callback():
+            nonlocal count
+            count += 1
+            if count < 3:
+                timer.rearm(0.01)
+        timer = self.wheel.call_later(0.01, callback)
+        self.run_for(0.1)
+        self.assertEqual(count, 3)
+        self.assertIdle()
+
+    def test_late_advance(self):
+        # the event loop is held up for more than a revolution: every timer
+        # due by then fires when the wheel next advances
+        for delay in (0.01, 0.03, 0.045, 0.2):
+            self.wheel.call_later(delay, self.record, delay)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        start = self.loop.time()
+        while self.loop.time() < start + 0.1:
+            pass
+        self.run_for(0.01)
+        self.assertEqual([name for name, _ in self.fired], [0.01, 0.03, 0.045])
+        self.run_for(0.2)
+        self.assertEqual(len(self.fired), 4)
+        self.assertIdle()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+A hashed timer wheel, shared by the sockets of a host, for timers that are
+armed, re-armed and cancelled far more often than they expire (such as the
+retransmission timer, which is restarted on almost every ACK).
+
+Time is divided into ticks of TIMER_WHEEL_TICK seconds, and a timer due in
+tick t is filed in slot t % TIMER_WHEEL_SLOTS (a timer more than a
+revolution away just waits in its slot for later rounds).  Arming a timer
+and re-arming it for a later time are O(1), and cancelling it only marks
+it: entries are checked, and dropped or refiled, when their slot comes up.
+A single event loop callback advances the wheel once per tick, while any
+timers are filed.
+"""
+from __future__ import annotations
+
+import asyncio
+import operator
+
+
+# The length of a tick, in seconds: the resolution of the timers
+TIMER_WHEEL_TICK = 0.01
+
+# The number of slots in the wheel; one revolution is
+# TIMER_WHEEL_SLOTS * TIMER_WHEEL_TICK seconds
+TIMER_WHEEL_SLOTS = 512
+
+
+class Timer:
+    """
+    A timer on a TimerWheel, which calls callback(*args) once its deadline
+    has passed (within a tick).  Like asyncio.TimerHandle, it can be
+    cancelled, which releases the callback; until then, it can also be
+    re-armed, even after it has fired.
+
+    Attr:
+        deadline : float
+            the event loop time at which the timer is due, or None if it
+            has fired or been cancelled
+    """
+    __slots__ = ('wheel', 'callback', 'args', 'deadline', '_tick')
+
+    def __init__(self, wheel: TimerWheel, callback: callable,
+            args: tuple) -> Timer:
+        self.wheel = wheel
+        self.callback = callback
+        self.args = args
+        self.deadline = None
+        # the tick of the entry this timer is filed under, or None
+        self._tick = None
+
+    def __repr__(self) -> str:
+        return f'Timer({self.callback!r}, deadline={self.deadline})'
+
+    def cancel(self) -> None:
+        """Cancel the timer.  Its entry is dropped when its slot comes up."""
+        self.deadline = None
+        self.callback = None
+        self.args = None
+
+    def cancelled(self) -> bool:
+        return self.callback is None
+
+    def when(self) -> float:
+        return self.deadline
+
+    def rearm(self, delay: float) -> None:
+        """
+        (Re-)arm the timer to fire delay seconds from now.  If it is already
+        filed at or before the new deadline, the entry stays where it is and
+        is refiled when its slot comes up.
+        """
+        self.wheel._arm(self, self.wheel.time() + delay)
+
+
+class TimerWheel:
+    """
+    A hashed timer wheel, driven by the asyncio event loop.
+
+    Attr:
+        tick : float
+            the length of a tick, in seconds
+        slots : list
+            for each slot, a list of (tick, Timer) entries
+    """
+    def __init__(self, tick: float=TIMER_WHEEL_TICK,
+            num_slots: int=TIMER_WHEEL_SLOTS) -> TimerWheel:
+        self.tick = tick
+        self.slots = [[] for _ in range(num_slots)]
+        # the number of entries in the slots, including those of cancelled
+        # and re-armed timers that have not yet been dropped
+        self.entries = 0
+        # the last tick processed
+        self._current_tick = 0
+        # the event loop, and the callback that advances the wheel
+        # (asyncio.TimerHandle instance or None)
+        self._loop = None
+        self._handle = None
+
+    def time(self) -> float:
+        """Return the current event loop time."""
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop.time()
+
+    def call_later(self, delay: float, callback: callable, *args) -> Timer:
+        """
+        Arrange for callback(*args) to be called delay seconds from now, like
+        loop.call_later(), and return the Timer.
+        """
+        timer = Timer(self, callback, args)
+        self._arm(timer, self.time() + delay)
+        return timer
+
+    def _arm(self, timer: Timer, deadline: float) -> None:
+        """Set the deadline of timer, filing a new entry if needed."""
+        if self._handle is None and not self.entries:
+            # the wheel is idle: start it from the current tick
+            self._current_tick = int(self.time() / self.tick)
+        # the first tick that starts at or after the deadline (but not one
+        # already processed)
+        tick = max(int(deadline / self.tick) + 1, self._current_tick + 1)
+        timer.deadline = deadline
+        if timer._tick is not None and timer._tick <= tick:
+            # the entry already filed comes up first
+            return
+        timer._tick = tick
+        self.slots[tick % len(self.slots)].append((tick, timer))
+        self.entries += 1
+        if self._handle is None:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        """Arrange for the wheel to advance at the start of the next tick."""
+        self._handle = self._loop.call_at((self._current_tick + 1) * self.tick,
+                self._advance)
+
+    def _advance(self) -> None:
+        """
+        Process every slot up to the current tick: fire the timers that are
+        due, in the order of their deadlines, refile those re-armed for
+        later, and drop the entries of cancelled and refiled timers.
+        """
+        now = self._loop.time()
+        target = int(now / self.tick)
+        num_slots = len(self.slots)
+        due = []
+        for tick in range(self._current_tick + 1,
+                min(target, self._current_tick + num_slots) + 1):
+            self._current_tick = tick
+            slot = self.slots[tick % num_slots]
+            if not slot:
+                continue
+            self.slots[tick % num_slots] = []
+            for entry in slot:
+                entry_tick, timer = entry
+                if entry_tick > target:
+                    # due in a later round
+                    self.slots[tick % num_slots].append(entry)
+                    continue
+                self.entries -= 1
+                if timer._tick != entry_tick:
+                    # the timer was refiled under another entry
+                    continue
+                timer._tick = None
+                if timer.deadline is None:
+                    # cancelled (or fired, and not re-armed)
+                    continue
+                if timer.deadline > now:
+                    # re-armed for later
+                    self._arm(timer, timer.deadline)
+                    continue
+                due.append((timer.deadline, timer))
+        self._current_tick = max(target, self._current_tick)
+
+        # the timers due may come from several ticks (if the event loop was
+        # held up), and from one tick in the order they were filed
+        if len(due) > 1:
+            due.sort(key=operator.itemgetter(0))
+        for _, timer in due:
+            if timer.deadline is None or timer._tick is not None:
+                # cancelled or re-armed by an earlier callback
+                continue
+            timer.deadline = None
+            timer.callback(*timer.args)
+        self._handle = None
+        if self.entries:
+            self._schedule()
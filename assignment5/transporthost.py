@@ -1,11 +1,11 @@
-from cougarnet.util import \
-        ip_str_to_binary, ip_binary_to_str
-import struct
+import checksum
 from headers import ICMP_HEADER_LEN, IPv4Header, UDPHeader, TCPHeader, ICMPHeader, \
+        IPv4View, UDPView, TCPView, \
         IP_HEADER_LEN, UDP_HEADER_LEN, TCP_HEADER_LEN, \
         TCPIP_HEADER_LEN, UDPIP_HEADER_LEN
 from host import IPPROTO_TCP, Host
 from mysocket import IPV4_TTL_DEFAULT, TCP_FLAGS_RST, UDPSocket, TCPSocketBase
+from timerwheel import TimerWheel
 
 IPPROTO_ICMP = 1 # Internet Control Message Protocol
 
@@ -16,13 +16,27 @@ class TransportHost(Host):
         self.socket_mapping_udp = {}
         self.socket_mapping_tcp = {}
 
+        # The timer wheel shared by the TCP sockets of this host (passed to
+        # them as timer_wheel)
+        self.timer_wheel = TimerWheel()
+
+        # The TCP Fast Open cookies that servers have given this host's TCP
+        # sockets (passed to them as fast_open_cookies)
+        self.fast_open_cookies = {}
+
     def handle_tcp(self, pkt: bytes) -> None:
         """Called by handle_ip() when packet is dtermined to be a TCP packet."""
+        if checksum.VERIFY_ON_RECEIVE and not checksum.verify_transport(pkt):
+            # drop corrupted segments
+            return
+
         # look for open TCP socket corresponding with the 4-tuple of the incoming packet
-        src_address = ip_binary_to_str(pkt[12:16])
-        dst_address = ip_binary_to_str(pkt[16:20])
-        sport, = struct.unpack('!H', pkt[IP_HEADER_LEN:IP_HEADER_LEN+2])
-        dport, = struct.unpack('!H', pkt[IP_HEADER_LEN+2:IP_HEADER_LEN+4])
+        ip_hdr = IPv4View(pkt)
+        tcp_hdr = TCPView(ip_hdr.payload)
+        src_address = ip_hdr.src
+        dst_address = ip_hdr.dst
+        sport = tcp_hdr.sport
+        dport = tcp_hdr.dport
 
         if socket := self.socket_mapping_tcp.get((dst_address, dport, src_address, sport)):
             # if 4-tuple mapping is found, call handle_packet() on socket
@@ -39,9 +53,14 @@ class TransportHost(Host):
         and destination port of the incoming packet, and handle that packet if
         it exists.
         """
+        if checksum.VERIFY_ON_RECEIVE and not checksum.verify_transport(pkt):
+            # drop corrupted datagrams
+            return
+
         # find destination address and destination port
-        dst_address = ip_binary_to_str(pkt[16:20])
-        dport, = struct.unpack('!H', pkt[IP_HEADER_LEN+2:IP_HEADER_LEN+4])
+        ip_hdr = IPv4View(pkt)
+        dst_address = ip_hdr.dst
+        dport = UDPView(ip_hdr.payload).dport
                 
         if socket := self.socket_mapping_udp.get((dst_address, dport)):
             # open UDP socket corresponding to the dst address and port of the incoming packet exists
@@ -64,10 +83,20 @@ class TransportHost(Host):
         self.socket_mapping_tcp[(local_addr, local_port, \
                 remote_addr, remote_port)] = sock
 
+    def uninstall_socket_tcp(self, local_addr: str, local_port: int,
+            remote_addr: str, remote_port: int, sock: TCPSocketBase) -> None:
+        """
+        Remove the mapping of a closed TCP socket (passed to sockets as
+        remove_socket_func), unless a new socket has since taken its place.
+        """
+        key = (local_addr, local_port, remote_addr, remote_port)
+        if self.socket_mapping_tcp.get(key) is sock:
+            del self.socket_mapping_tcp[key]
+
     def no_socket_udp(self, pkt: bytes) -> None:
         """Return an ICMP Port Unreachable message to the sender"""
         # create a new IPv4 header using the pkt's src and dst
-        pkt_ipv4_header = IPv4Header.from_bytes(pkt[:IP_HEADER_LEN])
+        pkt_ipv4_header = IPv4Header.unpack_from(pkt)
         ipv4_header=  IPv4Header(
             length=IP_HEADER_LEN+ICMP_HEADER_LEN+len(pkt), # IP + ICMP + pkt
             ttl=IPV4_TTL_DEFAULT, 
@@ -77,12 +106,15 @@ class TransportHost(Host):
             dst=pkt_ipv4_header.src
         )
         icmp_packet = ICMPHeader(type=3, code=3, checksum=0)
-        self.send_packet(ipv4_header.to_bytes() + icmp_packet.to_bytes() + pkt)
+        icmp_pkt = ipv4_header.to_bytes() + icmp_packet.to_bytes() + pkt
+        if checksum.FILL_ON_SEND:
+            icmp_pkt = checksum.fill_packet(icmp_pkt)
+        self.send_packet(icmp_pkt)
 
     def no_socket_tcp(self, pkt: bytes) -> None:
         """Send TCP packet with only the RST flag set."""
         # create a new IPv4 header using the pkt's src and dst
-        pkt_ipv4_header = IPv4Header.from_bytes(pkt[:IP_HEADER_LEN])
+        pkt_ipv4_header = IPv4Header.unpack_from(pkt)
         ipv4_header=  IPv4Header(
             length=TCPIP_HEADER_LEN+len(pkt), # IP + TCP + pkt
             ttl=IPV4_TTL_DEFAULT, 
@@ -92,9 +124,15 @@ class TransportHost(Host):
             dst=pkt_ipv4_header.src
         )
 
-        # get pkt's tcp, swap the ports, and change flag to RST
-        tcp_hdr = TCPHeader.from_bytes(pkt[IP_HEADER_LEN:TCPIP_HEADER_LEN])
+        # get pkt's tcp, swap the ports, and change flag to RST.  The
+        # segment's options (SACK blocks, timestamps, a Fast Open cookie)
+        # are not echoed back.
+        tcp_hdr = TCPHeader.unpack_from(pkt, IP_HEADER_LEN)
         tcp_hdr.sport, tcp_hdr.dport = tcp_hdr.dport, tcp_hdr.sport
         tcp_hdr.flags = TCP_FLAGS_RST
+        tcp_hdr.options = {}
         
-        self.send_packet(ipv4_header.to_bytes() + tcp_hdr.to_bytes() + pkt)
+        rst_pkt = ipv4_header.to_bytes() + tcp_hdr.to_bytes() + pkt
+        if checksum.FILL_ON_SEND:
+            rst_pkt = checksum.fill_packet(rst_pkt)
+        self.send_packet(rst_pkt)